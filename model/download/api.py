@@ -1,9 +1,20 @@
 import json
+import time
+from io import BytesIO
+from xml.etree import ElementTree
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from urllib.parse import urlsplit
 import requests
+from requests.adapters import HTTPAdapter
 import xmltodict       
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.sql import text
+from manifest import load_manifest, mark_unit, content_hash, recent_months, pending_units
+from dedup import insert_or_ignore, prepare_table, delete_month_rows, row_keys, ROW_KEY, NUMBER_PATTERN
 # load my api keys
 
 #key_dict = {"apt" : 'ebl8Ut%2FJ2dsO84047u5ZUjBH53zpBM3YTtMLdGH0FkE6Ukn1z8Hy9WN45TvTQ%2BbdBRQctFDMT7GBZHqttCA8yg%3D%3D',
@@ -22,6 +33,9 @@ category_url = {
     "mult-family_lease" : "http://openapi.molit.go.kr:8081/OpenAPI_ToolInstallPackage/service/rest/RTMSOBJSvc/getRTMSDataSvcRHTrade"
     }
 
+# 요청 하나의 연결/읽기 제한 시간(초), 서버가 응답하지 않아도 요청(스레드)이 멈춰 있지 않도록
+REQUEST_TIMEOUT = 30
+
 
 def make_url(category, lawd_cd, deal_ymd):
     base_url = category_url[category]
@@ -46,16 +60,13 @@ def create_dataframe(data):
     
     return df
 
-def get_df(cate, lawd_cd, deal_ymd):
-    import requests
-    import json
-    import pandas as pd
-    import xmltodict
-    base_url= make_url(cate, lawd_cd, deal_ymd)
-    
+def parse_items(text, lawd_cd, deal_ymd):
+    """
+    API 응답(XML)에서 item 목록을 데이터프레임으로 변환
+    결과코드도 함께 반환 : (result_code, df)
+    """
     try:
-        res = requests.get(base_url)
-        data = json.loads(json.dumps(xmltodict.parse(res.text)))
+        data = json.loads(json.dumps(xmltodict.parse(text)))
         result_code = data.get('response', {}).get('header').get('resultCode')
         #if result_code == '99':
         #    msg = data.get('response', {}).get('header').get('resultMsg')
@@ -65,26 +76,95 @@ def get_df(cate, lawd_cd, deal_ymd):
         items = data.get('response', {}).get('body', {}).get('items', None)
         if items is None or 'item' not in items:
             # print(f"No data available or incorrect data structure on ({lawd_cd}, {deal_ymd})")
-            return None
+            return result_code, None
         
         df = create_dataframe(items['item'])
-        return df
+        return result_code, df
 
     except KeyError as e:
         print(f"KeyError - reason: {str(e)} on ({lawd_cd}, {deal_ymd})")
-        return None
+        return None, None
     except TypeError as e:
         print(f"TypeError - reason: {str(e)} on ({lawd_cd}, {deal_ymd})")
-        return None
+        return None, None
     except Exception as e:
         print(f"An error occurred: {str(e)} on ({lawd_cd}, {deal_ymd})")
-        return None
+        return None, None
+
+def parse_items_stream(content, lawd_cd, deal_ymd):
+    """
+    parse_items와 같은 (result_code, df)를 반환하되, xmltodict -> json 변환 없이
+    응답 바이트를 iterparse로 읽으면서 <item>을 칼럼별 리스트에 바로 담고 마지막에 한 번만 데이터프레임 생성
+    """
+    columns = {}
+    n_rows = 0
+    result_code = None
+
+    try:
+        for event, elem in ElementTree.iterparse(BytesIO(content), events = ('end',)):
+            if elem.tag == 'resultCode':
+                result_code = (elem.text or '').strip() or None
+            elif elem.tag == 'item':
+                for child in elem:
+                    value = (child.text or '').strip() or None
+                    if child.tag not in columns:
+                        # 앞선 행에 없던 칼럼은 None으로 채움
+                        columns[child.tag] = [None] * n_rows
+                    column = columns[child.tag]
+                    if len(column) == n_rows:
+                        column.append(value)
+                n_rows += 1
+                for column in columns.values():
+                    if len(column) < n_rows:
+                        column.append(None)
+                elem.clear()
+
+    except ElementTree.ParseError as e:
+        print(f"ParseError - reason: {str(e)} on ({lawd_cd}, {deal_ymd})")
+        return None, None
+
+    if n_rows == 0:
+        return result_code, None
+    return result_code, pd.DataFrame(columns)
+
+def unit_status(result_code, df):
+    """
+    매니페스트에 기록할 상태 : done(데이터 있음), empty(데이터 없음), failed(오류, 재시도 대상)
+    """
+    if df is not None:
+        return 'done'
+    if result_code is None or result_code == '99':
+        return 'failed'
+    return 'empty'
+
+def get_unit(cate, lawd_cd, deal_ymd, timeout = REQUEST_TIMEOUT):
+    """
+    get_df와 같지만 (status, df)를 반환
+    timeout초 안에 응답이 없으면 failed (매니페스트에 남아 다음 실행에서 재시도)
+    """
+    base_url= make_url(cate, lawd_cd, deal_ymd)
+    
+    try:
+        res = requests.get(base_url, timeout = timeout)
+    except Exception as e:
+        print(f"An error occurred: {str(e)} on ({lawd_cd}, {deal_ymd})")
+        return 'failed', None
+
+    result_code, df = parse_items_stream(res.content, lawd_cd, deal_ymd)
+    return unit_status(result_code, df), df
+
+def get_df(cate, lawd_cd, deal_ymd, timeout = REQUEST_TIMEOUT):
+    status, df = get_unit(cate, lawd_cd, deal_ymd, timeout)
+    return df
 
 # 데이터 저장하기 
-def save_data(engine, cate, tab_name, loc_code, year_month):
+def save_data(engine, cate, tab_name, loc_code, year_month, writer = None):
     df = get_df(cate, loc_code, year_month)
     if df is not None:
-        df.to_sql(f'{tab_name}', con=engine, if_exists='append', index=False)
+        if writer is not None :
+            writer.append(df)
+        else :
+            df.to_sql(f'{tab_name}', con=engine, if_exists='append', index=False)
         return True
     else : 
         return False
@@ -92,14 +172,441 @@ def save_data(engine, cate, tab_name, loc_code, year_month):
 
 # 지역별, 월별 생성하기
 
-def save_all(engine, cate, tab_name, loc_list, month_list):
-    for month in month_list :
-        no_data_count = 0 
-        for code in loc_list:
-            result = save_data(engine, cate, tab_name, code, month)
-            if not result :
-                no_data_count += 1
-        print(f"{month} data is saved. {no_data_count} locations with no data saved.")
+def save_all(engine, cate, tab_name, loc_list, month_list, max_workers = None, resume = True, refresh_months = None):
+    """
+    max_workers를 지정하면 fetch_all로 동시에 내려받고, DB 저장은 한 스레드에서만 진행
+    resume이면 매니페스트에 완료로 기록된 (지역코드, 연월)은 건너뛰고 실패한 단위만 다시 요청
+    refresh_months = N 이면 최근 N개월은 완료되었더라도 다시 받아서 내용이 바뀐 경우만 교체
+    """
+    set_sqlite_pragmas(engine)
+    source = f"api:{cate}:{tab_name}"
+    with engine.begin() as conn :
+        manifest = load_manifest(conn, source)
+    refresh = recent_months(refresh_months)
+
+    skip = set()
+    if resume :
+        units = [(f"{code}:{month}", month) for month in month_list for code in loc_list]
+        todo = {unit for unit, month in pending_units(manifest, units, refresh)}
+        skip = {(code, month) for month in month_list for code in loc_list if f"{code}:{month}" not in todo}
+
+    # 예외로 중단되어도 버퍼에 남은 행은 close에서 저장
+    with BufferedTableWriter(engine, tab_name, source = source) as writer :
+        if max_workers is not None :
+            for month, results in fetch_all_by_month(cate, loc_list, month_list, max_workers = max_workers, skip = skip):
+                no_data_count = 0
+                for code, status, df in results :
+                    no_data_count += not store_unit(writer, manifest, code, month, status, df)
+                print(f"{month} data is saved. {no_data_count} locations with no data saved.")
+            return
+
+        for month in month_list :
+            no_data_count = 0 
+            for code in loc_list:
+                if (code, month) in skip :
+                    continue
+                status, df = get_unit(cate, code, month)
+                result = store_unit(writer, manifest, code, month, status, df)
+                if not result :
+                    no_data_count += 1
+            print(f"{month} data is saved. {no_data_count} locations with no data saved.")
+
+
+def store_unit(writer, manifest, code, month, status, df):
+    """
+    (지역코드, 연월) 결과를 writer에 넘기고 매니페스트 기록을 예약
+    이전에 저장된 내용과 해시가 같으면 다시 쓰지 않고, 다르면 기존 행을 지우고 교체
+    """
+    unit = f"{code}:{month}"
+    prev_status, prev_rows, prev_hash = manifest.get(unit, (None, None, None))
+    replace = (code, month) if prev_status == 'done' else None
+
+    if status == 'failed' and prev_status == 'done' :
+        # 재수집이 실패하면 기존 행과 기록을 그대로 둠
+        return False
+    if status != 'done' :
+        writer.mark(unit, status, replace = replace)
+        return False
+
+    digest = content_hash(df)
+    if prev_status == 'done' and prev_hash == digest :
+        writer.mark(unit, 'done', row_count = len(df), content_hash = digest)
+    else :
+        writer.append(df, unit = unit, content_hash = digest, replace = replace)
+    return True
+
+
+# DB 쓰기
+SQLITE_PRAGMAS = {
+    'journal_mode' : 'WAL',
+    'synchronous' : 'NORMAL',
+    'cache_size' : -262144,   # 256MB (음수는 KiB 단위)
+    'temp_store' : 'MEMORY',
+}
+
+
+# raw 테이블 칼럼 타입 (없는 칼럼은 TEXT)
+DEAL_DATE = '거래일자'   # yyyymmdd 정수
+RAW_TYPES = {
+    '거래금액' : 'INTEGER',
+    '보증금액' : 'INTEGER',
+    '월세금액' : 'INTEGER',
+    '건축년도' : 'INTEGER',
+    '년' : 'INTEGER',
+    '월' : 'INTEGER',
+    '일' : 'INTEGER',
+    DEAL_DATE : 'INTEGER',
+    '전용면적' : 'REAL',
+    '대지면적' : 'REAL',
+    '연면적' : 'REAL',
+    '대지권면적' : 'REAL',
+    '계약면적' : 'REAL',
+}
+
+
+def typed_frame(df):
+    """
+    get_df 결과(문자열)를 RAW_TYPES 타입으로 변환 (공백, 쉼표 제거 후 NUMBER_PATTERN 형식이면 정수/실수, 아니면 NULL)
+    정수 칼럼은 0.5를 0에서 먼 쪽으로 반올림 (SQLite ROUND와 같음, migrate_typed_table과 같은 결과)
+    년/월/일이 있으면 거래일자(yyyymmdd 정수) 추가
+    """
+    df = df.copy()
+    for col, kind in RAW_TYPES.items() :
+        if col not in df.columns :
+            continue
+        values = df[col].astype('string').str.strip().str.replace(',', '', regex = False)
+        values = pd.to_numeric(values.where(values.str.fullmatch(NUMBER_PATTERN).fillna(False)), errors = 'coerce')
+        if kind == 'INTEGER' :
+            df[col] = (np.sign(values) * np.floor(values.abs() + 0.5)).astype('Int64')
+        else :
+            df[col] = values.astype('float64')
+    if {'년', '월', '일'} <= set(df.columns) :
+        df[DEAL_DATE] = df['년'] * 10000 + df['월'] * 100 + df['일']
+    return df
+
+
+def _cast_sql(col, kind):
+    """
+    TEXT 칼럼 값을 타입으로 바꾸는 SQL 식 (typed_frame과 같은 규칙)
+    앞뒤 공백과 쉼표를 빼고, 숫자 형식(앞의 부호, 소수점 하나)이 아니면 NULL (CAST는 'abc'를 0으로 바꾸므로 먼저 확인)
+    정수는 ROUND로 반올림한 뒤 변환 (CAST만 하면 소수점 아래를 버림)
+    """
+    value = f"""NULLIF(REPLACE(TRIM("{col}", ' ' || char(9) || char(10) || char(13)), ',', ''), '')"""
+    unsigned = f"LTRIM({value}, '+-')"
+    numeric = (f"{unsigned} NOT GLOB '*[^0-9.]*' AND {unsigned} GLOB '*[0-9]*' AND LENGTH({value}) - LENGTH(LTRIM({value}, '+-')) <= 1 "
+               f"AND LENGTH({unsigned}) - LENGTH(REPLACE({unsigned}, '.', '')) <= 1")
+    number = f"CAST({value} AS REAL)"
+    if kind == 'INTEGER' :
+        number = f"CAST(ROUND({number}) AS INTEGER)"
+    return f"CASE WHEN {numeric} THEN {number} END"
+
+
+def migrate_typed_table(conn, tab_name):
+    """
+    TEXT로 저장된 기존 raw 테이블을 RAW_TYPES 타입의 테이블로 옮김 (이미 타입이 있으면 바로 False)
+    새 테이블에 변환한 값을 복사하고 교체한 뒤 인덱스를 다시 만듦
+    ROWID와 row_key는 그대로 유지 (ROWID 기준 증분 갱신과 중복 제거가 계속 동작)
+    BufferedTableWriter.flush와 download_xlsx.save_data_to_db가 저장 전에 호출, 커밋은 호출한 쪽 트랜잭션에서
+    conn에는 sqlite3 연결이나 SQLAlchemy Connection 둘 다 사용 가능
+    """
+    execute = conn.exec_driver_sql if hasattr(conn, 'exec_driver_sql') else conn.execute
+    info = list(execute(f'PRAGMA table_info("{tab_name}")'))
+    if not info :
+        return False
+    declared = {row[1] : (row[2] or '').upper() for row in info}
+    columns = list(declared)
+    # 년/월 칼럼이 없는 테이블(read_excel 원본 칼럼 그대로인 테이블 등)은 건드리지 않음
+    if not {'년', '월'} <= set(columns) :
+        return False
+    if all(declared[col] == kind for col, kind in RAW_TYPES.items() if col in declared) and \
+            (DEAL_DATE in declared or not {'년', '월', '일'} <= set(columns)) :
+        return False
+
+    targets = columns + ([DEAL_DATE] if DEAL_DATE not in declared and {'년', '월', '일'} <= set(columns) else [])
+    ddl = ", ".join(f'"{col}" {"INTEGER" if col == ROW_KEY else RAW_TYPES.get(col, "TEXT")}' for col in targets)
+    select = []
+    for col in targets :
+        if col == DEAL_DATE and col not in declared :
+            select.append(" + ".join(f"{_cast_sql(part, 'INTEGER')} * {scale}" for part, scale in [('년', 10000), ('월', 100), ('일', 1)]))
+        elif col in RAW_TYPES :
+            select.append(_cast_sql(col, RAW_TYPES[col]))
+        else :
+            select.append(f'"{col}"')
+    indexes = [row[0] for row in execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (tab_name,))]
+
+    tmp_name = f"{tab_name}__typed"
+    execute(f'DROP TABLE IF EXISTS "{tmp_name}"')
+    execute(f'CREATE TABLE "{tmp_name}" ({ddl})')
+    target_cols = ", ".join(f'"{col}"' for col in targets)
+    execute(f'INSERT INTO "{tmp_name}" (ROWID, {target_cols}) SELECT ROWID, {", ".join(select)} FROM "{tab_name}" ORDER BY ROWID')
+    execute(f'DROP TABLE "{tab_name}"')
+    execute(f'ALTER TABLE "{tmp_name}" RENAME TO "{tab_name}"')
+    for sql in indexes :
+        execute(sql)
+    print(f"{tab_name} : 칼럼 타입 변환 완료 ({', '.join(col for col in targets if col in RAW_TYPES)})")
+    return True
+
+
+def migrate_typed_tables(engine):
+    """
+    DB의 모든 raw 테이블(년/월 칼럼이 있는 테이블)을 한 번에 타입 변환 (다음 수집을 기다리지 않고 옮길 때)
+    예) migrate_typed_tables(create_db_engine('RealEstate.db'))
+    """
+    with engine.connect() as conn :
+        tables = [row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    migrated = []
+    for tab_name in tables :
+        with engine.begin() as conn :
+            columns = [row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{tab_name}")')]
+            if {'년', '월'} <= set(columns) and migrate_typed_table(conn, tab_name) :
+                migrated.append(tab_name)
+    return migrated
+
+
+def _apply_pragmas(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    for key, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {key} = {value}")
+    cursor.close()
+
+
+def set_sqlite_pragmas(engine):
+    """
+    엔진의 모든 SQLite 연결에 WAL, synchronous, cache_size 설정 적용
+    """
+    if engine.dialect.name != 'sqlite' or event.contains(engine, 'connect', _apply_pragmas):
+        return engine
+    event.listen(engine, 'connect', _apply_pragmas)
+    # 이미 풀에 있는 연결은 설정이 없으므로 버림
+    engine.dispose()
+    return engine
+
+
+def create_db_engine(db_path):
+    return set_sqlite_pragmas(create_engine(f'sqlite:///{db_path}'))
+
+
+class BufferedTableWriter:
+    """
+    get_df 결과를 메모리에 모았다가 한 트랜잭션의 executemany로 저장
+    max_rows 또는 max_bytes를 넘으면 자동으로 flush, with 블록이 끝나면 close에서 남은 행 저장
+    row_key 유니크 인덱스와 INSERT OR IGNORE로 이미 있는 거래는 저장하지 않음
+    저장할 때 typed_frame으로 금액/면적/년월일을 숫자로 바꾸고 새 테이블은 RAW_TYPES 타입으로 생성
+    """
+    def __init__(self, engine, tab_name, max_rows = 200000, max_bytes = 256 * 1024 ** 2, source = None):
+        self.engine = engine
+        self.tab_name = tab_name
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.source = source
+        self.frames = []
+        self.marks = []
+        self.replaces = []
+        self.n_rows = 0
+        self.n_bytes = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def append(self, df, unit = None, content_hash = None, replace = None):
+        """
+        unit을 주면 행이 저장되는 트랜잭션에서 매니페스트에 done으로 기록
+        replace = (지역코드, 연월)이면 저장 전에 해당 단위의 기존 행을 삭제 (지역코드가 None이면 그 달 전체)
+        """
+        if self.closed :
+            raise ValueError(f"writer for {self.tab_name} is closed")
+        if df is None or df.empty :
+            return
+        if unit is not None :
+            self.mark(unit, 'done', row_count = len(df), content_hash = content_hash, replace = replace)
+        self.frames.append(df)
+        self.n_rows += len(df)
+        self.n_bytes += int(df.memory_usage(index = False, deep = True).sum())
+        if self.n_rows >= self.max_rows or self.n_bytes >= self.max_bytes :
+            self.flush()
+
+    def mark(self, unit, status, row_count = None, content_hash = None, replace = None):
+        """
+        매니페스트 기록을 다음 flush까지 보류
+        """
+        if self.source is None :
+            raise ValueError("writer has no manifest source")
+        self.marks.append((unit, status, row_count, content_hash))
+        if replace is not None :
+            self.replaces.append(replace)
+
+    def flush(self):
+        """
+        버퍼의 행을 한 트랜잭션으로 저장하고 저장한 행 수를 반환
+        기존 행 삭제, 새 행 저장, 매니페스트 기록이 같은 트랜잭션에서 처리됨
+        """
+        if not self.frames and not self.marks :
+            return 0
+        df = pd.concat(self.frames, ignore_index = True, sort = False) if self.frames else None
+
+        with self.engine.begin() as conn :
+            # TEXT로 만든 기존 테이블이면 먼저 타입 변환 (타입이 있으면 바로 넘어감)
+            migrate_typed_table(conn, self.tab_name)
+            for code, month in self.replaces :
+                delete_unit_rows(conn, self.tab_name, code, month)
+            if df is not None :
+                # row_key는 기존 행과 같도록 변환 전 문자열로 계산
+                keys = row_keys(df)
+                df = typed_frame(df)
+                prepare_table(conn, self.tab_name, df, types = RAW_TYPES)
+                inserted, ignored = insert_or_ignore(conn, self.tab_name, df, keys = keys)
+                if ignored :
+                    print(f"{self.tab_name} : 중복 {ignored:,}행은 저장하지 않음")
+            for unit, status, row_count, digest in self.marks :
+                mark_unit(conn, self.source, unit, status, row_count = row_count, content_hash = digest)
+
+        n_rows = inserted if df is not None else 0
+        self.frames = []
+        self.marks = []
+        self.replaces = []
+        self.n_rows = 0
+        self.n_bytes = 0
+        return n_rows
+
+    def close(self):
+        if not self.closed :
+            self.flush()
+            self.closed = True
+
+
+def delete_unit_rows(conn, tab_name, code, month):
+    """
+    (지역코드, 연월) 단위로 저장된 행 삭제 (최근 월 재수집 시 교체용)
+    code가 None이면 그 달의 모든 지역 행 삭제 (전국 단위 xlsx 교체용)
+    """
+    if code is None :
+        delete_month_rows(conn, tab_name, month)
+        return
+    columns = [row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{tab_name}")')]
+    code_col = next((col for col in ['지역코드', '법정동시군구코드', '시군구코드'] if col in columns), None)
+    if code_col is None or '년' not in columns or '월' not in columns :
+        print(f"Cannot replace ({code}, {month}) in {tab_name}: no region/year/month columns")
+        return
+    month = str(month)
+    conn.exec_driver_sql(
+        f'DELETE FROM "{tab_name}" WHERE CAST("{code_col}" AS INTEGER) = ? AND CAST("년" AS INTEGER) = ? AND CAST("월" AS INTEGER) = ?',
+        (int(code), int(month[:4]), int(month[4:])))
+
+
+# 동시 다운로드
+class HostRateLimiter:
+    """
+    호스트별 초당 요청 수 제한
+    여러 스레드가 같은 호스트에 요청해도 요청 간격이 1/rate 초 이상이 되도록 대기
+    """
+    def __init__(self, rate = 10):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next_time = {}
+
+    def wait(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time.get(host, now))
+            self.next_time[host] = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def make_session(pool_size = 8):
+    """
+    keep-alive 연결을 재사용하는 세션 (스레드 수만큼 연결 풀 확보)
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections = pool_size, pool_maxsize = pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch_df(session, limiter, cate, lawd_cd, deal_ymd, retries = 5, backoff = 1.0, timeout = REQUEST_TIMEOUT):
+    """
+    get_unit과 같은 (status, df)를 반환하되, 아래 경우는 backoff * 2^n 초 쉬고 재시도
+    결과코드 99, 요청 오류(타임아웃, 연결 끊김, 응답 중간 끊김 등 RequestException), 5xx/429 응답, 잘린 XML
+    """
+    base_url = make_url(cate, lawd_cd, deal_ymd)
+
+    for attempt in range(retries + 1):
+        limiter.wait(base_url)
+        try:
+            res = session.get(base_url, timeout = timeout)
+            if res.status_code >= 500 or res.status_code == 429:
+                raise requests.HTTPError(f"HTTP {res.status_code}", response = res)
+            result_code, df = parse_items_stream(res.content, lawd_cd, deal_ymd)
+        except (requests.RequestException, ElementTree.ParseError) as e:
+            reason = str(e)
+        else:
+            if result_code != '99':
+                return unit_status(result_code, df), df
+            reason = f"result code {result_code}"
+
+        if attempt < retries:
+            time.sleep(backoff * 2 ** attempt)
+
+    print(f"Giving up after {retries} retries - reason: {reason} on ({lawd_cd}, {deal_ymd})")
+    return 'failed', None
+
+
+def fetch_all(cate, loc_list, month_list, max_workers = 8, rate = 10, retries = 5, backoff = 1.0, timeout = REQUEST_TIMEOUT, skip = ()):
+    """
+    (지역코드, 연월) 단위 요청을 스레드 풀로 동시에 처리
+    끝나는 순서대로 (month, code, status, df)를 돌려줌, skip에 있는 (code, month)는 요청하지 않음
+    요청은 max_workers * 2개까지만 미리 넣고 하나가 끝날 때마다 하나씩 추가 (연월 순서 유지, 결과가 쌓이지 않음)
+    소비하는 쪽에서 오류가 나면 대기 중인 요청은 취소하고 실행 중인 요청을 기다리지 않음
+    """
+    limiter = HostRateLimiter(rate)
+    session = make_session(max_workers)
+    units = iter([(month, code) for month in month_list for code in loc_list if (code, month) not in skip])
+    executor = ThreadPoolExecutor(max_workers = max_workers)
+    futures = {}
+
+    def submit(n):
+        for month, code in islice(units, n):
+            futures[executor.submit(fetch_df, session, limiter, cate, code, month, retries, backoff, timeout)] = (month, code)
+
+    try:
+        submit(max_workers * 2)
+        while futures:
+            done, _ = wait(futures, return_when = FIRST_COMPLETED)
+            for future in done:
+                month, code = futures.pop(future)
+                status, df = future.result()
+                submit(1)
+                yield month, code, status, df
+    finally:
+        executor.shutdown(wait = False, cancel_futures = True)
+        session.close()
+
+
+def fetch_all_by_month(cate, loc_list, month_list, skip = (), **kwargs):
+    """
+    fetch_all 결과를 month_list 순서대로 월 단위로 묶어서 반환 : (month, [(code, status, df), ...])
+    """
+    pending = {month : [] for month in month_list}
+    remaining = {month : sum((code, month) not in skip for code in loc_list) for month in month_list}
+    order = list(month_list)
+
+    def ready():
+        while order and remaining[order[0]] == 0:
+            done = order.pop(0)
+            yield done, pending.pop(done)
+
+    yield from ready()
+    for month, code, status, df in fetch_all(cate, loc_list, month_list, skip = skip, **kwargs):
+        pending[month].append((code, status, df))
+        remaining[month] -= 1
+        yield from ready()
 
 
 # 지역구 코드 생성기
@@ -134,9 +641,9 @@ def create_ym_list(start_year, end_year):
 # create_ym_list(2022,2023)
 
 
-def debug_request(cate, loc_code, ym_code):
+def debug_request(cate, loc_code, ym_code, timeout = REQUEST_TIMEOUT):
     base_url= make_url(cate, loc_code, ym_code)
-    res = requests.get(base_url)
+    res = requests.get(base_url, timeout = timeout)
     data = json.loads(json.dumps(xmltodict.parse(res.text)))
     result_code = data.get('response', {}).get('header').get('resultCode')
     items = data.get('response', {}).get('body', {}).get('items', None)
@@ -0,0 +1,156 @@
+"""
+get_unit 순차 요청 vs fetch_all 동시 요청 비교 (로컬 HTTP 대역 서버 사용)
+-----------
+python bench_api.py [latency] [workers]
+(지역코드, 연월)마다 정해진 합성 XML을 응답하고, 요청마다 latency초 지연
+동시 요청은 정상 서버에서 한 번, 단위마다 결과코드 99와 503을 한 번씩 받고 한 단위는 응답 없이 멈추는 서버에서 한 번 실행
+세 결과의 (status, df)가 같은지 확인하고 걸린 시간 출력
+-----------
+"""
+import sys
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import pandas as pd
+import api
+
+
+def unit_response(code, month, result_code = '00'):
+    """
+    (지역코드, 연월)마다 같은 내용의 MOLIT 형식 응답 (행 수 0 ~ 39, 0이면 item 없음)
+    """
+    n_items = (int(code) * 31 + int(month)) % 40
+    item = ("<item><거래금액>{amount:,}</거래금액><건축년도>2004</건축년도><년>{year}</년><도로명>테헤란로</도로명>"
+            "<법정동> 역삼동</법정동><아파트>래미안{i}</아파트><월>{mon}</월><일>{day}</일><전용면적>84.{i}</전용면적>"
+            "<지번>{i}</지번><지역코드>{code}</지역코드><층>{floor}</층><해제여부> </해제여부></item>")
+    items = "".join(item.format(amount = 100000 + i * int(code) % 977, year = str(month)[:4], mon = int(str(month)[4:]),
+                                i = i, day = i % 28 + 1, code = code, floor = i % 30) for i in range(n_items))
+    text = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?><response><header>'
+            f'<resultCode>{result_code}</resultCode><resultMsg>NORMAL SERVICE.</resultMsg></header>'
+            f'<body><items>{items}</items><numOfRows>{n_items}</numOfRows><pageNo>1</pageNo>'
+            f'<totalCount>{n_items}</totalCount></body></response>')
+    return text.encode('utf-8')
+
+
+class ApiStandIn(ThreadingHTTPServer):
+    """
+    RTMS 조회 대역 : GET 쿼리(LAWD_CD, DEAL_YMD)마다 unit_response를 응답
+    fail_first = n 이면 각 단위의 처음 n번은 결과코드 99, error_first = n 이면 그다음 n번은 503
+    stall에 있는 (지역코드, 연월)은 첫 요청에 stall_time초 동안 응답하지 않음 (타임아웃 확인용)
+    """
+    daemon_threads = True
+
+    def __init__(self, latency = 0.05, fail_first = 0, error_first = 0, stall = (), stall_time = 5.0):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.latency = latency
+        self.fail_first = fail_first
+        self.error_first = error_first
+        self.stall = set(stall)
+        self.stall_time = stall_time
+        self.lock = threading.Lock()
+        self.attempts = {}
+        self.requests = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/RTMSOBJSvc/getRTMSDataSvcAptTradeDev"
+
+    def __enter__(self):
+        threading.Thread(target = self.serve_forever, daemon = True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        key = (query.get('LAWD_CD', ['0'])[0], query.get('DEAL_YMD', ['0'])[0])
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            attempt = server.attempts.get(key, 0)
+            server.attempts[key] = attempt + 1
+
+        if attempt == 0 and key in server.stall:
+            time.sleep(server.stall_time)
+        time.sleep(server.latency)
+
+        if attempt < server.fail_first:
+            self.respond(200, unit_response(*key, result_code = '99'))
+        elif attempt < server.fail_first + server.error_first:
+            self.respond(503, b'')
+        else:
+            self.respond(200, unit_response(*key))
+
+    def respond(self, status, body):
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/xml;charset=UTF-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 타임아웃으로 클라이언트가 먼저 끊은 경우
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+def run_serial(cate, loc_list, month_list, timeout = api.REQUEST_TIMEOUT):
+    start = time.perf_counter()
+    results = {(month, code) : api.get_unit(cate, code, month, timeout)
+               for month in month_list for code in loc_list}
+    return time.perf_counter() - start, results
+
+
+def run_concurrent(cate, loc_list, month_list, **kwargs):
+    start = time.perf_counter()
+    results = {(month, code) : (status, df)
+               for month, code, status, df in api.fetch_all(cate, loc_list, month_list, **kwargs)}
+    return time.perf_counter() - start, results
+
+
+def assert_same_results(expected, actual):
+    assert expected.keys() == actual.keys(), "units differ"
+    for unit, (status, df) in expected.items():
+        assert actual[unit][0] == status, f"status differs on {unit}"
+        if df is not None:
+            pd.testing.assert_frame_equal(actual[unit][1], df)
+
+
+if __name__ == "__main__":
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.2
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    cate = 'apt'
+    loc_list = [11110, 11140, 11170, 11200, 11215, 11230, 11260, 11290, 11305, 11320]
+    month_list = ['202401', '202402', '202403']
+    url = api.category_url[cate]
+
+    try:
+        with ApiStandIn(latency) as server:
+            api.category_url[cate] = server.url
+            seq_time, seq_results = run_serial(cate, loc_list, month_list)
+        with ApiStandIn(latency) as server:
+            api.category_url[cate] = server.url
+            con_time, con_results = run_concurrent(cate, loc_list, month_list, max_workers = workers, rate = 50)
+        with ApiStandIn(latency, fail_first = 1, error_first = 1, stall = [('11110', '202402')], stall_time = 3.0) as server:
+            api.category_url[cate] = server.url
+            retry_time, retry_results = run_concurrent(cate, loc_list, month_list, max_workers = workers, rate = 50,
+                                                       backoff = 0.05, timeout = 1.0)
+            retried = server.requests
+    finally:
+        api.category_url[cate] = url
+
+    assert_same_results(seq_results, con_results)
+    assert_same_results(seq_results, retry_results)
+    n_rows = sum(0 if df is None else len(df) for _, df in seq_results.values())
+    print(f"{len(seq_results)} units ({n_rows} rows), latency {latency}s : "
+          f"sequential {seq_time:.2f}s, concurrent({workers}) {con_time:.2f}s ({seq_time / con_time:.1f}x), "
+          f"with one 99 and one 503 per unit and one stalled unit {retry_time:.2f}s ({retried} requests)")
@@ -0,0 +1,131 @@
+"""
+download_xlsx 순차 다운로드 vs 동시 다운로드 비교 (로컬 HTTP 대역 서버 사용)
+-----------
+python bench_download.py [fixture_dir] [latency] [workers]
+fixture_dir의 *.xlsx를 돌려가며 응답으로 사용하고(없으면 합성 바이트), 요청마다 latency초 지연
+두 방식으로 받은 파일이 같은지 확인하고 걸린 시간 출력
+-----------
+"""
+import os
+import sys
+import glob
+import time
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from download_xlsx import RealEstateDataDownloader
+
+
+class XlsxStandIn(ThreadingHTTPServer):
+    """
+    ptXlsExcelDown.do 대역 : POST 양식(srhThingNo, srhDelngSecd, srhFromDt)마다 정해진 xlsx 바이트를 응답
+    fail_first = n 이면 각 양식의 처음 n번은 503 (재시도 확인용)
+    """
+    daemon_threads = True
+
+    def __init__(self, payloads, latency = 0.05, fail_first = 0):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.payloads = payloads
+        self.latency = latency
+        self.fail_first = fail_first
+        self.lock = threading.Lock()
+        self.attempts = {}
+        self.requests = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/pt/xls/ptXlsExcelDown.do"
+
+    def payload(self, form):
+        key = (form.get('srhThingNo', [''])[0], form.get('srhDelngSecd', [''])[0], form.get('srhFromDt', [''])[0])
+        return key, self.payloads[hash(key) % len(self.payloads)]
+
+    def __enter__(self):
+        threading.Thread(target = self.serve_forever, daemon = True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+        key, body = self.server.payload(form)
+        with self.server.lock:
+            self.server.requests += 1
+            attempt = self.server.attempts.get(key, 0)
+            self.server.attempts[key] = attempt + 1
+        time.sleep(self.server.latency)
+
+        if attempt < self.server.fail_first:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        for start in range(0, len(body), 64 * 1024):
+            self.wfile.write(body[start:start + 64 * 1024])
+
+    def log_message(self, *args):
+        pass
+
+
+def load_payloads(fixture_dir, limit = 4):
+    paths = sorted(glob.glob(os.path.join(fixture_dir, '**', '*.xlsx'), recursive = True))[:limit]
+    if paths:
+        return [open(path, 'rb').read() for path in paths]
+    return [os.urandom(256 * 1024) for _ in range(limit)]
+
+
+def downloaded_files(root):
+    files = {}
+    for path in glob.glob(os.path.join(root, '**', '*.xlsx'), recursive = True):
+        with open(path, 'rb') as file:
+            files[os.path.relpath(path, root)] = file.read()
+    return files
+
+
+def run(server, mode, workdir, months = (2024, 1, 2024, 3), **kwargs):
+    base_path = os.path.join(workdir, mode)
+    downloader = RealEstateDataDownloader(*months, base_url = server.url, base_path = base_path,
+                                          db_path = os.path.join(workdir, f"{mode}.db"))
+    start = time.perf_counter()
+    if mode == 'sequential':
+        downloader.download_and_save_all_data()
+    else:
+        downloader.download_all_concurrent(**kwargs)
+    elapsed = time.perf_counter() - start
+    downloader.conn.close()
+    return elapsed, downloaded_files(base_path)
+
+
+if __name__ == "__main__":
+    fixture_dir = sys.argv[1] if len(sys.argv) > 1 else '연립다세대'
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    payloads = load_payloads(fixture_dir)
+    workdir = tempfile.mkdtemp()
+
+    try:
+        with XlsxStandIn(payloads, latency) as server:
+            seq_time, seq_files = run(server, 'sequential', workdir)
+        with XlsxStandIn(payloads, latency, fail_first = 1) as server:
+            con_time, con_files = run(server, 'concurrent', workdir, max_workers = workers, rate = 50, backoff = 0.05)
+            retried = server.requests
+
+        assert seq_files == con_files, "downloaded files differ"
+        print(f"{len(seq_files)} files ({sum(map(len, seq_files.values())) / 1024 ** 2:.1f} MB), latency {latency}s : "
+              f"sequential {seq_time:.2f}s, concurrent({workers}) {con_time:.2f}s ({seq_time / con_time:.1f}x), "
+              f"{retried} requests with one 503 per unit")
+    finally:
+        shutil.rmtree(workdir)
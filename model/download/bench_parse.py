@@ -0,0 +1,82 @@
+"""
+get_df 파싱 경로 비교 : xmltodict -> json 왕복(parse_items) vs iterparse(parse_items_stream)
+-----------
+python bench_parse.py [fixture_dir]
+fixture_dir의 *.xml (record_fixtures로 저장한 실제 응답)을 사용하고, 없으면 합성 응답으로 비교
+-----------
+"""
+import os
+import sys
+import time
+import glob
+import tracemalloc
+import requests
+import pandas as pd
+from api import make_url, parse_items, parse_items_stream
+
+
+def record_fixtures(cate, loc_list, month_list, out_dir = 'fixtures'):
+    """
+    API 응답 원문을 {cate}_{지역코드}_{연월}.xml로 저장
+    """
+    os.makedirs(out_dir, exist_ok = True)
+    for month in month_list:
+        for code in loc_list:
+            res = requests.get(make_url(cate, code, month))
+            with open(os.path.join(out_dir, f"{cate}_{code}_{month}.xml"), 'wb') as file:
+                file.write(res.content)
+
+
+def synthetic_fixture(n_items):
+    item = ("<item><거래금액>{amount:,}</거래금액><건축년도>2004</건축년도><년>2024</년><도로명>테헤란로</도로명>"
+            "<법정동> 역삼동</법정동><아파트>래미안{i}</아파트><월>5</월><일>{day}</일><전용면적>84.{i}</전용면적>"
+            "<지번>{i}</지번><지역코드>11680</지역코드><층>{floor}</층><해제여부> </해제여부></item>")
+    items = "".join(item.format(amount = 100000 + i, i = i % 100, day = i % 28 + 1, floor = i % 30) for i in range(n_items))
+    text = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?><response><header><resultCode>00</resultCode>'
+            f'<resultMsg>NORMAL SERVICE.</resultMsg></header><body><items>{items}</items>'
+            f'<numOfRows>{n_items}</numOfRows><pageNo>1</pageNo><totalCount>{n_items}</totalCount></body></response>')
+    return text.encode('utf-8')
+
+
+def measure(func, arg, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(arg, 0, 0)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    func(arg, 0, 0)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def benchmark(fixtures, repeat = 5):
+    rows = []
+    for name, content in fixtures:
+        (_, old_df), old_time, old_peak = measure(parse_items, content.decode('utf-8'), repeat)
+        (_, new_df), new_time, new_peak = measure(parse_items_stream, content, repeat)
+
+        if old_df is not None or new_df is not None:
+            pd.testing.assert_frame_equal(old_df, new_df)
+        rows.append({
+            'fixture' : name,
+            'rows' : 0 if new_df is None else len(new_df),
+            'xmltodict_ms' : round(old_time * 1000, 2),
+            'iterparse_ms' : round(new_time * 1000, 2),
+            'speedup' : round(old_time / new_time, 2),
+            'xmltodict_peak_kb' : old_peak // 1024,
+            'iterparse_peak_kb' : new_peak // 1024,
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    fixture_dir = sys.argv[1] if len(sys.argv) > 1 else 'fixtures'
+    paths = sorted(glob.glob(os.path.join(fixture_dir, '*.xml')))
+    if paths:
+        fixtures = [(os.path.basename(path), open(path, 'rb').read()) for path in paths]
+    else:
+        print(f"No fixtures in {fixture_dir}, using synthetic responses")
+        fixtures = [(f"synthetic_{n}", synthetic_fixture(n)) for n in [1, 100, 1000, 5000]]
+    print(benchmark(fixtures).to_string(index = False))
@@ -0,0 +1,222 @@
+"""
+수집 단계 중복 제거 (row_key 유니크 인덱스 + INSERT OR IGNORE)
+-----------
+row_key : NON_KEY_COLUMNS를 뺀 모든 칼럼 값을 정규화(앞뒤 공백, 쉼표 제거, 숫자는 같은 표기로)해서 만든 64비트 해시
+          대지권면적, 도로명, 주택유형만 다른 행도 다른 거래로 남음 (원본 행 전체가 같을 때만 중복)
+          결측인 칼럼과 없는 칼럼은 같은 키 (나중에 칼럼이 추가된 테이블의 기존 행과 새 행이 맞음)
+          TEXT 테이블의 '75.7400', '4,000'과 타입 변환한 테이블의 75.74, 4000이 같은 키가 됨
+          한 테이블 안에서만 비교하는 키 : API 테이블과 xlsx 테이블 사이의 중복은 제거하지 않음
+          (DB, 칼럼 구성, 값 표기가 달라 같은 거래도 키가 다름 - 두 출처를 함께 쓰는 쪽에서 처리)
+          REQUIRED_KEY_COLUMNS가 없는 프레임/테이블(read_excel 결과를 그대로 저장한 테이블 등)은 키를 만들지 않고 ValueError
+raw 테이블마다 row_key 칼럼과 UNIQUE 인덱스를 두고, 다운로더는 INSERT OR IGNORE로 저장
+기존 테이블에 인덱스를 만들 때 이미 있는 중복 행은 지우지 않고 row_key를 NULL로 둠 (remove_duplicates = True일 때만 삭제)
+-----------
+conn에는 sqlite3 연결이나 SQLAlchemy Connection 둘 다 사용 가능
+"""
+import numpy as np
+import pandas as pd
+
+
+ROW_KEY = 'row_key'
+
+# 키에서 빼는 칼럼 : 거래 뒤에 채워지거나 바뀌는 값(해제, 등기)과 년/월/일에서 만든 거래일자
+NON_KEY_COLUMNS = [ROW_KEY, '해제여부', '해제사유발생일', '등기일자', '거래일자']
+
+# 키 정의가 바뀌면 올림 (이전 버전 인덱스가 있는 테이블은 row_key를 다시 계산)
+KEY_VERSION = 2
+
+# 이 칼럼이 없으면 다른 거래가 같은 키가 되므로 키를 만들지 않음
+REQUIRED_KEY_COLUMNS = ['년', '월', '일']
+
+# 숫자로 보는 값의 형식 (앞의 부호, 소수점 하나, 지수 표기 없음 - api._cast_sql의 조건과 같음)
+NUMBER_PATTERN = r'[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)'
+
+# 년월 키 식 인덱스 (my_func/window_load.py의 PERIOD_EXPR, period_index_name과 같아야 기간 조회에 쓰임)
+PERIOD_EXPR = 'CAST("년" AS INTEGER) * 100 + CAST("월" AS INTEGER)'
+
+
+def _execute(conn, query, params = ()):
+    if hasattr(conn, 'exec_driver_sql'):
+        return conn.exec_driver_sql(query, params)
+    return conn.execute(query, params)
+
+
+def _executemany(conn, query, rows):
+    if hasattr(conn, 'exec_driver_sql'):
+        return conn.exec_driver_sql(query, rows)
+    return conn.executemany(query, rows)
+
+
+def check_key_columns(columns, name = 'frame'):
+    missing = [col for col in REQUIRED_KEY_COLUMNS if col not in columns]
+    if missing:
+        raise ValueError(f"{name} : 키 칼럼 {missing} 없음 (칼럼명을 정규화한 load_xlsx.parse_content 결과만 저장 가능)")
+
+
+def key_values(s):
+    """
+    키 칼럼 값 정규화 : 앞뒤 공백과 쉼표를 빼고, 숫자 형식이면 정수는 '165', 실수는 '75.74'처럼 같은 표기로
+    저장 타입(TEXT, INTEGER, REAL)이나 청크의 dtype(결측이 섞인 정수 칼럼은 float)과 관계없이 같은 문자열
+    """
+    values = s.astype('string').str.strip().str.replace(',', '', regex = False).replace('', pd.NA)
+    number = values.str.fullmatch(NUMBER_PATTERN).fillna(False).to_numpy(dtype = bool)
+    if number.any():
+        num = pd.to_numeric(values[number]).astype('float64')
+        whole = (np.floor(num) == num) & (num.abs() < 1e15)
+        text = num.map(repr).astype('string')
+        text[whole] = num[whole].astype('int64').astype('string')
+        values = values.copy()
+        values[number] = text
+    return values
+
+
+def key_columns(columns):
+    return [col for col in columns if col not in NON_KEY_COLUMNS]
+
+
+def row_keys(df):
+    """
+    행마다 key_columns 기준 int64 해시 (SQLite INTEGER로 저장)
+    (칼럼명, 값) 해시의 합이라 칼럼 순서와 관계없고, 결측인 칼럼은 더하지 않음
+    """
+    check_key_columns(df.columns)
+    total = np.zeros(len(df), dtype = np.uint64)
+    for col in key_columns(df.columns):
+        values = key_values(df[col])
+        present = values.notna().to_numpy()
+        if present.any():
+            tagged = (col + '\x1f' + values[present]).to_numpy(dtype = object)
+            total[present] += pd.util.hash_array(tagged)
+    return total.view(np.int64)
+
+
+def table_columns(conn, tab_name):
+    return [row[1] for row in _execute(conn, f'PRAGMA table_info("{tab_name}")')]
+
+
+def unique_key_index(tab_name):
+    """
+    row_key 유니크 인덱스 이름 (my_func/gini.py의 RealEstateAnalyzer.has_row_key와 같아야 함)
+    """
+    return f"ux_{tab_name}_{ROW_KEY}_v{KEY_VERSION}"
+
+
+def has_unique_key(conn, tab_name):
+    """
+    tab_name에 현재 버전의 row_key 유니크 인덱스가 있는지
+    """
+    return any(row[1] == unique_key_index(tab_name) for row in _execute(conn, f'PRAGMA index_list("{tab_name}")'))
+
+
+def ensure_unique_key(conn, tab_name, chunksize = 200000, remove_duplicates = False):
+    """
+    row_key 칼럼과 UNIQUE 인덱스 생성
+    기존 행이 있으면 chunksize씩 row_key를 채우고, 같은 키는 ROWID가 가장 작은 행만 키를 가짐
+    나머지 중복 행은 row_key를 NULL로 두고 그대로 남김 (UNIQUE 인덱스는 NULL을 여러 개 허용, 읽는 쪽에서 중복 제거)
+    remove_duplicates = True이면 중복 행을 삭제 (되돌릴 수 없으므로 직접 호출할 때만)
+    이전 버전 키 인덱스가 있으면 지우고 모든 행의 row_key를 다시 계산
+    키가 없는(NULL) 중복 행 수를 반환 (remove_duplicates이면 삭제한 행 수)
+    키 칼럼이 없는 테이블(read_excel 원본 칼럼 그대로인 테이블)은 아무것도 바꾸지 않고 ValueError
+    """
+    if has_unique_key(conn, tab_name):
+        return 0
+
+    columns = table_columns(conn, tab_name)
+    check_key_columns(columns, tab_name)
+    if ROW_KEY not in columns:
+        _execute(conn, f'ALTER TABLE "{tab_name}" ADD COLUMN "{ROW_KEY}" INTEGER')
+    else:
+        old_indexes = [row[1] for row in _execute(conn, f'PRAGMA index_list("{tab_name}")')
+                       if row[1].startswith(f"ux_{tab_name}_{ROW_KEY}")]
+        for name in old_indexes:
+            _execute(conn, f'DROP INDEX "{name}"')
+        _execute(conn, f'UPDATE "{tab_name}" SET "{ROW_KEY}" = NULL')
+    key_cols = key_columns(columns)
+    select = ", ".join(['ROWID'] + [f'"{col}"' for col in key_cols])
+
+    last_rowid = 0
+    while True:
+        rows = _execute(conn, f'SELECT {select} FROM "{tab_name}" WHERE ROWID > ? AND "{ROW_KEY}" IS NULL ORDER BY ROWID LIMIT ?',
+                        (last_rowid, chunksize)).fetchall()
+        if not rows:
+            break
+        rowids = [row[0] for row in rows]
+        chunk = pd.DataFrame([row[1:] for row in rows], columns = key_cols)
+        keys = row_keys(chunk)
+        _executemany(conn, f'UPDATE "{tab_name}" SET "{ROW_KEY}" = ? WHERE ROWID = ?', list(zip(keys.tolist(), rowids)))
+        last_rowid = rowids[-1]
+
+    duplicate = (f'ROWID NOT IN (SELECT MIN(ROWID) FROM "{tab_name}" WHERE "{ROW_KEY}" IS NOT NULL GROUP BY "{ROW_KEY}") '
+                 f'AND "{ROW_KEY}" IS NOT NULL')
+    before = _execute(conn, 'SELECT total_changes()').fetchone()[0]
+    if remove_duplicates:
+        _execute(conn, f'DELETE FROM "{tab_name}" WHERE {duplicate}')
+    else:
+        _execute(conn, f'UPDATE "{tab_name}" SET "{ROW_KEY}" = NULL WHERE {duplicate}')
+    n_duplicates = _execute(conn, 'SELECT total_changes()').fetchone()[0] - before
+    _execute(conn, f'CREATE UNIQUE INDEX IF NOT EXISTS "{unique_key_index(tab_name)}" ON "{tab_name}" ("{ROW_KEY}")')
+    if n_duplicates:
+        action = "제거" if remove_duplicates else "유지 (row_key NULL, 지우려면 ensure_unique_key(..., remove_duplicates = True))"
+        print(f"{tab_name} : 기존 중복 {n_duplicates:,}행 {action}")
+    return n_duplicates
+
+
+def insert_or_ignore(conn, tab_name, df, keys = None):
+    """
+    row_key를 붙여서 INSERT OR IGNORE로 저장하고 (저장한 행 수, 건너뛴 중복 행 수) 반환
+    keys를 주면 그 값을 row_key로 사용 (타입 변환 전 원본 문자열로 계산한 키)
+    테이블 생성, 칼럼 추가와 인덱스는 호출 전에 prepare_table로 준비
+    """
+    if df is None or df.empty:
+        return 0, 0
+    df = df.drop(columns = [ROW_KEY], errors = 'ignore')
+    df = df.assign(**{ROW_KEY : row_keys(df) if keys is None else keys})
+
+    # 무시된 행은 변경 수에 들어가지 않으므로 total_changes() 차이가 저장한 행 수
+    before = _execute(conn, 'SELECT total_changes()').fetchone()[0]
+    columns = ", ".join(f'"{col}"' for col in df.columns)
+    marks = ", ".join("?" for _ in df.columns)
+    rows = df.astype(object).where(df.notna(), None).itertuples(index = False, name = None)
+    _executemany(conn, f'INSERT OR IGNORE INTO "{tab_name}" ({columns}) VALUES ({marks})', list(rows))
+    inserted = _execute(conn, 'SELECT total_changes()').fetchone()[0] - before
+    return inserted, len(df) - inserted
+
+
+def column_ddl(col, types):
+    return f'"{col}" {types.get(col, "TEXT")}' if types is not None else f'"{col}"'
+
+
+def prepare_table(conn, tab_name, df, types = None):
+    """
+    테이블이 없으면 생성, 새로운 칼럼이 있으면 추가, row_key 유니크 인덱스와 년월 식 인덱스 준비
+    types = {칼럼 : 'INTEGER' | 'REAL'}을 주면 칼럼 타입을 명시해서 생성/추가 (없는 칼럼은 TEXT)
+    """
+    existing = table_columns(conn, tab_name)
+    if not existing and types is not None:
+        columns = ", ".join(column_ddl(col, types) for col in df.columns if col != ROW_KEY)
+        _execute(conn, f'CREATE TABLE "{tab_name}" ({columns})')
+    elif not existing:
+        df.drop(columns = [ROW_KEY], errors = 'ignore').head(0).to_sql(tab_name, con = conn, if_exists = 'fail', index = False)
+    else:
+        # 칼럼을 추가하기 전에 확인 (원본 칼럼 테이블에 년/월/일을 추가하면 기존 행이 모두 같은 키가 됨)
+        if not has_unique_key(conn, tab_name):
+            check_key_columns(existing, tab_name)
+        for col in df.columns:
+            if col not in existing and col != ROW_KEY:
+                _execute(conn, f'ALTER TABLE "{tab_name}" ADD COLUMN {column_ddl(col, types)}')
+    ensure_unique_key(conn, tab_name)
+    # 읽는 쪽(window_load)은 인덱스를 만들지 않으므로 쓰는 쪽에서 준비
+    _execute(conn, f'CREATE INDEX IF NOT EXISTS "ix_{tab_name}_period" ON "{tab_name}" ({PERIOD_EXPR})')
+
+
+def delete_month_rows(conn, tab_name, month):
+    """
+    연월('YYYYMM')의 행을 모두 삭제하고 삭제한 행 수 반환 (바뀐 달만 다시 저장할 때 사용)
+    """
+    columns = table_columns(conn, tab_name)
+    if '년' not in columns or '월' not in columns:
+        return 0
+    month = str(month)
+    before = _execute(conn, 'SELECT total_changes()').fetchone()[0]
+    _execute(conn, f'DELETE FROM "{tab_name}" WHERE {PERIOD_EXPR} = ?', (int(month[:4]) * 100 + int(month[4:]),))
+    return _execute(conn, 'SELECT total_changes()').fetchone()[0] - before
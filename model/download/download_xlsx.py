@@ -1,16 +1,25 @@
 import os
+import time
+import hashlib
 import requests
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
 from datetime import datetime
 import sqlite3
 import pandas as pd
 from io import BytesIO
+from manifest import load_manifest, mark_unit, content_hash, recent_months, pending_units, unchanged
+from dedup import insert_or_ignore, prepare_table, delete_month_rows, row_keys
+from api import HostRateLimiter, make_session, typed_frame, migrate_typed_table, RAW_TYPES
+from load_xlsx import PROPERTY_TABLES, TRANS_TABLES, parse_content, file_hash
+
 class RealEstateDataDownloader:
-    def __init__(self, start_year, start_month, end_year, end_month):
+    def __init__(self, start_year, start_month, end_year, end_month, base_url = None, base_path = None, db_path = None):
         self.start_year = start_year
         self.start_month = start_month
         self.end_year = end_year
         self.end_month = end_month
-        self.base_url = "https://rtmobile.molit.go.kr/pt/xls/ptXlsExcelDown.do"
+        self.base_url = base_url or "https://rtmobile.molit.go.kr/pt/xls/ptXlsExcelDown.do"
         self.headers = {
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
             "Accept-Encoding": "gzip, deflate, br, zstd",
@@ -31,13 +40,23 @@ class RealEstateDataDownloader:
             "Upgrade-Insecure-Requests": "1",
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
         }
-        self.db_path = '/Users/hj/Dropbox/real_estate/data/조건별 자료제공/RealEstate_xlsx.db'
+        self.db_path = db_path or '/Users/hj/Dropbox/real_estate/data/조건별 자료제공/RealEstate_xlsx.db'
+        self.base_path = base_path or '/Users/hj/Dropbox/real_estate/data/조건별 자료제공'
         self.conn = sqlite3.connect(self.db_path)
+        self.source = 'xlsx'
+        # DB에 저장한 내용은 파일 다운로드와 따로 기록 (load = False로 받은 달도 나중에 DB를 채울 수 있게)
+        self.db_source = 'xlsx_db'
+        self.loaded = {}
 
     def __del__(self):
         self.conn.close()
 
     def download_data(self, year, month, property_type, trans_type):
+        data = self.request_form(year, month, property_type, trans_type)
+        response = requests.post(self.base_url, headers=self.headers, data=data)
+        return response.content
+
+    def request_form(self, year, month, property_type, trans_type):
         month_str = f"{month:02d}"
         srhFromDt = f"{year}-{month_str}-01"
         srhToDt = f"{year}-{month_str}-{(datetime(year, month + 1, 1) - datetime(year, month, 1)).days:02d}" if month < 12 else f"{year}-12-31"
@@ -80,44 +99,63 @@ class RealEstateDataDownloader:
             "srhFromAmount": "",
             "srhToAmount": ""
         }
-
-        response = requests.post(self.base_url, headers=self.headers, data=data)
-        return response.content
+        return data
 
     def save_data_to_db(self, content, year, month, property_type, trans_type):
-        month_str = f"{month:02d}"
-        property_mapping = {
-            '아파트': 'apt',
-            '연립다세대': 'multi_house',
-            '단독다가구': 'multi_unit',
-            '오피스텔': 'officetel'
-        }
-
-        trans_mapping = {
-            '매매': 'sale',
-            '전월세': 'rent'
-        }
-
-        table_name = f"{property_mapping[property_type]}_{trans_mapping[trans_type]}"
-        xls_df = pd.read_excel(content)
-        xls_df.to_sql(table_name, self.conn, if_exists='append', index=False)
-        print(f"Data saved to database table: {table_name}")
+        """
+        (테이블, 년, 월)의 기존 행을 지우고 다시 저장 (DB에 저장된 내용과 다른 달만 호출됨)
+        커밋은 호출한 쪽에서 매니페스트 기록과 함께 처리
+        """
+        table_name = f"{PROPERTY_TABLES[property_type]}_{TRANS_TABLES[trans_type]}"
+        _, _, xls_df = parse_content(content, property_type)
+        migrate_typed_table(self.conn, table_name)
+        deleted = delete_month_rows(self.conn, table_name, f"{year}{month:02d}")
+        if xls_df is None or xls_df.empty:
+            print(f"No rows in {table_name} for {year}-{month:02d} ({deleted} rows removed)")
+            return
+        # 칼럼명을 정규화한 프레임으로 row_key를 만들어서 이미 저장된 거래는 건너뜀, 금액/면적/년월일은 숫자로 저장
+        keys = row_keys(xls_df)
+        xls_df = typed_frame(xls_df)
+        prepare_table(self.conn, table_name, xls_df, types = RAW_TYPES)
+        inserted, ignored = insert_or_ignore(self.conn, table_name, xls_df, keys = keys)
+        print(f"Data saved to database table: {table_name} ({deleted} rows replaced by {inserted}, {ignored} duplicates skipped)")
 
+    def file_path(self, year, month, property_type, trans_type):
+        directory = os.path.join(self.base_path, str(trans_type), str(property_type), str(year))
+        return os.path.join(directory, f"{property_type}({trans_type})_{year}_{month:02d}.xlsx")
 
     def save_data(self, content, year, month, property_type, trans_type):
-        month_str = f"{month:02d}"
-        base_path = '/Users/hj/Dropbox/real_estate/data/조건별 자료제공'
-        folder_name = os.path.join(str(trans_type), str(property_type))
-        folder_name = os.path.join(base_path, folder_name)
-        directory = os.path.join(folder_name, str(year))
-        os.makedirs(directory, exist_ok=True)
-        filename = os.path.join(directory, f"{property_type}({trans_type})_{year}_{month_str}.xlsx")
+        """
+        같은 내용의 파일이 이미 있으면 다시 쓰지 않음
+        """
+        filename = self.file_path(year, month, property_type, trans_type)
+        if os.path.exists(filename) and file_hash(filename) == content_hash(content):
+            return
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
 
         with open(filename, "wb") as file:
             file.write(content)
         print(f"File saved: {filename}")
 
-    def download_and_save_all_data(self):
+    def download_and_save_all_data(self, resume = True, refresh_months = None, load = False):
+        """
+        resume이면 download_manifest에 완료로 기록된 (연월, 부동산유형, 거래유형)은 건너뜀
+        refresh_months = N 이면 최근 N개월은 다시 받고, 내용이 바뀐 경우에만 파일을 새로 저장
+        load이면 DB에 저장된 내용과 다른 달만 DB에서 지우고 다시 저장 (받아 둔 파일로 DB만 채우는 경우 포함)
+        """
+        manifest, todo = self.pending(resume, refresh_months)
+        if load:
+            self.load_downloaded(manifest, todo)
+        for unit, ym in todo:
+            year, month = int(ym[:4]), int(ym[4:])
+            _, property_type, trans_type = unit.split(':')
+            self.download_unit(unit, year, month, property_type, trans_type, manifest.get(unit), load)
+
+    def units(self):
+        """
+        (연월:부동산유형:거래유형, 연월) 목록
+        """
+        units = []
         for year in range(self.start_year, self.end_year + 1):
             start_month = self.start_month if year == self.start_year else 1
             end_month = self.end_month if year == self.end_year else 12
@@ -125,10 +163,189 @@ class RealEstateDataDownloader:
             for month in range(start_month, end_month + 1):
                 for property_type in ['아파트', '연립다세대', '단독다가구','오피스텔']:
                     for trans_type in ['매매', '전월세']:
-                        content = self.download_data(year, month, property_type, trans_type)
-                        self.save_data(content, year, month, property_type, trans_type)
-                        #self.save_data_to_db(content, year, month, property_type, trans_type)
+                        units.append((f"{year}{month:02d}:{property_type}:{trans_type}", f"{year}{month:02d}"))
+        return units
+
+    def pending(self, resume = True, refresh_months = None):
+        """
+        매니페스트와 받아야 하는 단위 목록
+        """
+        manifest = load_manifest(self.conn, self.source)
+        self.loaded = load_manifest(self.conn, self.db_source)
+        self.conn.commit()
+        units = self.units()
+        todo = pending_units(manifest, units, recent_months(refresh_months)) if resume else units
+        print(f"{len(units) - len(todo)} of {len(units)} units already downloaded")
+        return manifest, todo
+
+    def download_unit(self, unit, year, month, property_type, trans_type, prev = None, load = False):
+        try:
+            content = self.download_data(year, month, property_type, trans_type)
+            if not content:
+                raise ValueError("empty response")
+        except Exception as e:
+            print(f"An error occurred: {str(e)} on ({year}, {month}, {property_type}, {trans_type})")
+            if prev is None or prev[0] != 'done':
+                mark_unit(self.conn, self.source, unit, 'failed', message = str(e))
+                self.conn.commit()
+            return
+
+        # 매니페스트의 해시와 같으면 파일은 그대로 둠
+        digest = content_hash(content)
+        if unchanged(prev, digest) and os.path.exists(self.file_path(year, month, property_type, trans_type)):
+            print(f"Unchanged: {unit}")
+        else:
+            self.save_data(content, year, month, property_type, trans_type)
+        mark_unit(self.conn, self.source, unit, 'done', content_hash = digest)
+        self.conn.commit()
+        if load and not unchanged(self.loaded.get(unit), digest):
+            self.load_unit(unit, content, digest)
+
+    def load_unit(self, unit, content, digest):
+        """
+        한 단위의 DB 저장 : 달 교체와 xlsx_db 매니페스트 기록을 한 트랜잭션으로
+        파싱/저장 중 오류가 나면 롤백(지운 달도 되살림)하고 failed로 기록한 뒤 다음 단위로 넘어감
+        """
+        ym, property_type, trans_type = unit.split(':')
+        year, month = int(ym[:4]), int(ym[4:])
+        try:
+            self.save_data_to_db(content, year, month, property_type, trans_type)
+            mark_unit(self.conn, self.db_source, unit, 'done', content_hash = digest)
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            print(f"An error occurred while loading: {str(e)} on {unit}")
+            mark_unit(self.conn, self.db_source, unit, 'failed', message = str(e))
+            self.conn.commit()
+            return False
+        self.loaded[unit] = ('done', None, digest)
+        return True
+
+    def load_downloaded(self, manifest, todo):
+        """
+        이미 받은 파일 중 DB에 저장된 내용(xlsx_db 매니페스트의 해시)과 다른 단위를 로컬 파일로 저장
+        load = False로 받은 달이나 DB 저장에 실패한 달을 다시 받지 않고 채움 (이번에 받을 todo는 제외)
+        """
+        skip = {unit for unit, _ in todo}
+        for unit, _ in self.units():
+            if unit in skip or manifest.get(unit, (None,))[0] != 'done':
+                continue
+            ym, property_type, trans_type = unit.split(':')
+            path = self.file_path(int(ym[:4]), int(ym[4:]), property_type, trans_type)
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as file:
+                content = file.read()
+            digest = content_hash(content)
+            if not unchanged(self.loaded.get(unit), digest):
+                self.load_unit(unit, content, digest)
+
+    def stream_unit(self, session, limiter, year, month, property_type, trans_type, prev = None,
+                    retries = 3, backoff = 1.0, timeout = 60, chunk_size = 1024 * 1024):
+        """
+        응답을 chunk_size씩 임시 파일(.part)에 쓰면서 해시 계산 (response.content로 전체를 메모리에 올리지 않음)
+        내용이 이전과 같으면 임시 파일을 버리고, 다르면 원래 파일명으로 교체
+        타임아웃/연결 오류/5xx/빈 응답이면 backoff * 2^n 초 쉬고 재시도
+        (status, content_hash, bytes, message) 반환 : status는 done, unchanged, failed
+        """
+        data = self.request_form(year, month, property_type, trans_type)
+        filename = self.file_path(year, month, property_type, trans_type)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        partial = f"{filename}.part"
+
+        for attempt in range(retries + 1):
+            limiter.wait(self.base_url)
+            try:
+                with session.post(self.base_url, headers=self.headers, data=data, stream=True, timeout=timeout) as response:
+                    response.raise_for_status()
+                    digest = hashlib.sha256()
+                    size = 0
+                    with open(partial, "wb") as file:
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            file.write(chunk)
+                            digest.update(chunk)
+                            size += len(chunk)
+                if size == 0:
+                    raise ValueError("empty response")
+            except (requests.RequestException, ValueError) as e:
+                reason = str(e)
+                if attempt < retries:
+                    time.sleep(backoff * 2 ** attempt)
+                continue
+
+            # 같은 내용의 파일이 있으면 다시 쓰지 않고, 매니페스트 해시까지 같으면 unchanged
+            digest = digest.hexdigest()
+            if os.path.exists(filename) and file_hash(filename) == digest:
+                os.remove(partial)
+            else:
+                os.replace(partial, filename)
+            return ('unchanged' if unchanged(prev, digest) else 'done'), digest, size, None
+
+        if os.path.exists(partial):
+            os.remove(partial)
+        return 'failed', None, 0, reason
+
+    def download_all_concurrent(self, max_workers = 4, rate = 2, resume = True, refresh_months = None,
+                                retries = 3, backoff = 1.0, timeout = 60, load = False):
+        """
+        download_and_save_all_data의 동시 다운로드 버전
+        keep-alive 연결 풀을 가진 세션 하나를 max_workers개 스레드가 공유하고, 호스트별 초당 rate회로 요청 제한
+        매니페스트 기록과 DB 저장(load)은 메인 스레드에서만 (sqlite3 연결은 스레드 사이에 공유하지 않음)
+        """
+        manifest, todo = self.pending(resume, refresh_months)
+        if load:
+            self.load_downloaded(manifest, todo)
+        limiter = HostRateLimiter(rate)
+        session = make_session(max_workers)
+        start = time.perf_counter()
+        counts = {'done' : 0, 'unchanged' : 0, 'failed' : 0}
+        n_bytes = 0
+
+        # 요청은 max_workers * 2개까지만 미리 넣고, 메인 스레드에서 오류가 나면 대기 중인 다운로드는 취소
+        units = iter(todo)
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        futures = {}
+
+        def submit(n):
+            for unit, ym in islice(units, n):
+                year, month = int(ym[:4]), int(ym[4:])
+                _, property_type, trans_type = unit.split(':')
+                future = executor.submit(self.stream_unit, session, limiter, year, month, property_type, trans_type,
+                                         manifest.get(unit), retries, backoff, timeout)
+                futures[future] = unit
+
+        try:
+            submit(max_workers * 2)
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    unit = futures.pop(future)
+                    status, digest, size, message = future.result()
+                    submit(1)
+                    counts[status] += 1
+                    n_bytes += size
+                    prev = manifest.get(unit)
+                    if status == 'failed':
+                        print(f"An error occurred: {message} on {unit}")
+                        if prev is None or prev[0] != 'done':
+                            mark_unit(self.conn, self.source, unit, 'failed', message = message)
+                    else:
+                        mark_unit(self.conn, self.source, unit, 'done', content_hash = digest)
+                    self.conn.commit()
+                    # 파일이 그대로(unchanged)여도 DB에 저장된 내용과 다르면 저장
+                    if status != 'failed' and load and not unchanged(self.loaded.get(unit), digest):
+                        ym, property_type, trans_type = unit.split(':')
+                        with open(self.file_path(int(ym[:4]), int(ym[4:]), property_type, trans_type), 'rb') as file:
+                            self.load_unit(unit, file.read(), digest)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            session.close()
+
+        elapsed = time.perf_counter() - start
+        print(f"{sum(counts.values())} units in {elapsed:.1f}s ({n_bytes / 1024 ** 2:.1f} MB) : "
+              f"{counts['done']} saved, {counts['unchanged']} unchanged, {counts['failed']} failed")
+        return counts
 
 if __name__ == "__main__":
     downloader = RealEstateDataDownloader(2007, 5, 2024, 5) 
-    downloader.download_and_save_all_data()
\ No newline at end of file
+    downloader.download_and_save_all_data()
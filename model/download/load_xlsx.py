@@ -0,0 +1,320 @@
+"""
+조건별 자료제공 xlsx 아카이브 → SQLite 일괄 저장
+-----------
+python load_xlsx.py [root_dir] [db_path] [workers]
+root_dir 아래 {부동산유형}/{년}/{년}_{월}.xlsx 를 찾아서 프로세스 풀에서 파싱하고,
+메인 프로세스 하나가 BufferedTableWriter로 {property}_{trans} 테이블에 배치 저장
+-----------
+파싱은 openpyxl/read_excel 대신 시트 XML을 iterparse로 한 행씩 읽음 (셀 객체를 만들지 않음)
+안내 문구와 검색조건 행은 건너뛰고 'NO'로 시작하는 머리글 행부터 읽으며, 칼럼명은 API 칼럼명으로 바꿈
+파일 단위로 매니페스트(source = 'xlsx_archive')에 기록하므로 다시 실행하면 저장된 파일은 건너뜀
+"""
+import os
+import re
+import sys
+import time
+import zipfile
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from xml.etree import ElementTree
+import pandas as pd
+from manifest import load_manifest, mark_unit, content_hash, unchanged
+
+
+SOURCE = 'xlsx_archive'
+
+# 부동산유형, 거래유형 → 테이블명 ({property}_{trans})
+PROPERTY_TABLES = {
+    '아파트': 'apt',
+    '연립다세대': 'multi_house',
+    '단독다가구': 'multi_unit',
+    '오피스텔': 'officetel'
+}
+
+TRANS_TABLES = {
+    '매매': 'sale',
+    '전월세': 'rent'
+}
+NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+# xlsx 머리글 → API 칼럼명 (없는 칼럼은 그대로 사용)
+COLUMN_MAP = {
+    '번지' : '지번',
+    '전용면적(㎡)' : '전용면적',
+    '대지권면적(㎡)' : '대지권면적',
+    '계약면적(㎡)' : '계약면적',
+    '연면적(㎡)' : '연면적',
+    '대지면적(㎡)' : '대지면적',
+    '거래금액(만원)' : '거래금액',
+    '보증금(만원)' : '보증금액',
+    '월세금(만원)' : '월세금액',
+    '계약일' : '일',
+}
+
+# 단지/건물명 칼럼의 API 칼럼명
+NAME_COLUMNS = {
+    '아파트' : '아파트',
+    '연립다세대' : '연립다세대',
+    '오피스텔' : '단지',
+}
+
+# 값이 없음을 뜻하는 문자열
+MISSING = {'', '-'}
+
+
+def column_index(ref):
+    """
+    셀 주소 'AB12' → 0부터 센 칼럼 번호
+    """
+    index = 0
+    for ch in ref:
+        if ch.isdigit():
+            break
+        index = index * 26 + ord(ch) - 64
+    return index - 1
+
+
+def shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as file:
+        for event, elem in ElementTree.iterparse(file):
+            if elem.tag == f"{NS}si":
+                strings.append("".join(t.text or '' for t in elem.iter(f"{NS}t")))
+                elem.clear()
+    return strings
+
+
+def first_sheet(archive):
+    """
+    workbook.xml의 첫 시트 경로
+    """
+    workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    rels = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    sheet = workbook.find(f"{NS}sheets/{NS}sheet")
+    target = next(rel.get('Target') for rel in rels if rel.get('Id') == sheet.get(f"{REL_NS}id"))
+    target = target.lstrip('/')
+    return target if target.startswith('xl/') else f"xl/{target}"
+
+
+def iter_rows(source):
+    """
+    첫 시트의 행을 문자열 리스트로 하나씩 (빈 셀은 None), source는 경로나 파일 객체
+    """
+    with zipfile.ZipFile(source) as archive:
+        strings = shared_strings(archive)
+        with archive.open(first_sheet(archive)) as file:
+            for event, elem in ElementTree.iterparse(file):
+                if elem.tag != f"{NS}row":
+                    continue
+                row = []
+                for cell in elem:
+                    kind = cell.get('t')
+                    if kind == 'inlineStr':
+                        value = "".join(t.text or '' for t in cell.iter(f"{NS}t"))
+                    else:
+                        node = cell.find(f"{NS}v")
+                        value = None if node is None else node.text
+                        if kind == 's' and value is not None:
+                            value = strings[int(value)]
+                    ref = cell.get('r')
+                    index = column_index(ref) if ref else len(row)
+                    row.extend([None] * (index - len(row)))
+                    row.append(value)
+                yield row
+                elem.clear()
+
+
+def parse_condition(text):
+    """
+    '실거래 구분 : 연립다세대(매매)' → ('연립다세대', '매매')
+    """
+    match = re.search(r"실거래 구분\s*:\s*([^(]+)\(([^)]+)\)", text or '')
+    return (match.group(1).strip(), match.group(2).strip()) if match else (None, None)
+
+
+def legal_dong(address):
+    """
+    '충청남도 당진시 합덕읍 운산리' → '합덕읍 운산리' (API 법정동과 같은 형태)
+    시도 다음의 시/군/구 토큰을 건너뛴 나머지
+    """
+    tokens = (address or '').split()
+    i = 1
+    while i < len(tokens) - 1 and tokens[i][-1] in '시군구':
+        i += 1
+    return " ".join(tokens[i:]) or None
+
+
+def normalize(columns, property_type):
+    """
+    머리글과 값 리스트를 API 칼럼명의 데이터프레임으로
+    계약년월은 년, 월로 나누고 일/월은 API처럼 앞의 0을 뺌, 시군구 주소로 법정동 생성, '-'는 결측
+    """
+    df = pd.DataFrame(columns)
+    df = df.drop(columns = ['NO'], errors = 'ignore')
+    name_col = NAME_COLUMNS.get(property_type)
+    renames = {**COLUMN_MAP, '단지명' : name_col, '건물명' : name_col} if name_col else COLUMN_MAP
+    df = df.rename(columns = {col : renames[col] for col in df.columns if renames.get(col)})
+
+    for col in df.columns:
+        values = df[col].astype('string').str.strip()
+        values = values.mask(values.isin(MISSING))
+        df[col] = values.astype(object).where(values.notna(), None)
+
+    if '계약년월' in df.columns:
+        ym = df.pop('계약년월').astype('string')
+        df.insert(0, '년', ym.str[:4].astype(object))
+        df.insert(1, '월', ym.str[4:6].str.lstrip('0').astype(object))
+    if '시군구' in df.columns and '법정동' not in df.columns:
+        df['법정동'] = df['시군구'].map(legal_dong)
+    if '일' in df.columns:
+        df['일'] = df['일'].astype('string').str.lstrip('0').astype(object)
+    return df.where(df.notna(), None)
+
+
+def parse_content(content, property_type = None):
+    """
+    xlsx 바이트 → (부동산유형, 거래유형, 데이터프레임)
+    검색조건 행이 없으면 property_type과 매매로 간주
+    """
+    found_property, trans_type = None, None
+    header = None
+    columns = None
+    for row in iter_rows(BytesIO(content)):
+        if header is None:
+            for value in row:
+                if value and '실거래 구분' in value:
+                    found_property, trans_type = parse_condition(value)
+            if row and row[0] == 'NO':
+                header = [value or f"칼럼{i}" for i, value in enumerate(row)]
+                columns = {col : [] for col in header}
+            continue
+        if not any(row):
+            continue
+        row = row[:len(header)] + [None] * (len(header) - len(row))
+        for col, value in zip(header, row):
+            columns[col].append(value)
+
+    if found_property is not None:
+        property_type = found_property
+    else:
+        trans_type = '매매'
+    df = normalize(columns, property_type) if columns else None
+    return property_type, trans_type, df
+
+
+def parse_workbook(path):
+    """
+    xlsx 파일 하나 → (부동산유형, 거래유형, 데이터프레임, 파일 해시)
+    프로세스 풀에서 실행 (반환값만 메인 프로세스로 전달), 검색조건이 없으면 경로의 부동산유형 폴더 사용
+    """
+    with open(path, 'rb') as file:
+        content = file.read()
+    fallback = os.path.basename(os.path.dirname(os.path.dirname(path)))
+    return (*parse_content(content, fallback), content_hash(content))
+
+
+def file_month(path):
+    """
+    '..._2019_11.xlsx' → '201911' (파일명에 년_월이 없으면 None)
+    """
+    match = re.search(r"(\d{4})_(\d{2})\.xlsx$", os.path.basename(path))
+    return f"{match.group(1)}{match.group(2)}" if match else None
+
+
+def file_hash(path):
+    with open(path, 'rb') as file:
+        return content_hash(file.read())
+
+
+def find_workbooks(root):
+    """
+    root/{부동산유형}/{년}/*.xlsx (또는 root가 부동산유형 폴더) 경로 목록
+    """
+    paths = []
+    for dirpath, _, filenames in os.walk(root, followlinks = True):
+        paths.extend(os.path.join(dirpath, name) for name in filenames if name.endswith('.xlsx') and not name.startswith('~$'))
+    return sorted(paths)
+
+
+def unit_name(path):
+    """
+    매니페스트 단위 : '{부동산유형}/{년}/{파일명}' (root 위치와 관계없이 같은 이름)
+    """
+    return "/".join(os.path.abspath(path).split(os.sep)[-3:])
+
+
+def load_archive(root, engine, workers = None, resume = True, max_rows = 200000):
+    """
+    root 아래 xlsx를 workers개 프로세스에서 파싱하고 메인 프로세스에서만 저장
+    테이블별 BufferedTableWriter가 max_rows행마다 한 트랜잭션으로 INSERT OR IGNORE
+    resume이면 매니페스트의 해시와 파일 해시가 같은 파일은 건너뛰고, 해시가 바뀐 파일은 그 (테이블, 년, 월)의 행을 지우고 다시 저장
+    파싱에 실패하거나 알 수 없는 부동산유형/거래유형 폴더의 파일은 매니페스트에 failed로 기록하고 다음 파일로 넘어감 (다음 실행에서 재시도)
+    처리량(행/초, 파일/초)을 출력하고 요약 데이터프레임(file, table, rows, status) 반환
+    """
+    from api import BufferedTableWriter
+
+    manifest = {}
+    if resume:
+        with engine.begin() as conn:
+            manifest = load_manifest(conn, SOURCE)
+    paths = []
+    for path in find_workbooks(root):
+        prev = manifest.get(unit_name(path))
+        if prev is None or not unchanged(prev, file_hash(path)):
+            paths.append(path)
+    print(f"{len(paths)} workbooks to load under {root}")
+
+    writers = {}
+    summary = []
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            futures = {executor.submit(parse_workbook, path) : path for path in paths}
+            for future in as_completed(futures):
+                # 저장이 끝난 결과는 참조를 버려서 메모리에 쌓이지 않게 함
+                path = futures.pop(future)
+                unit = unit_name(path)
+                try:
+                    property_type, trans_type, df, digest = future.result()
+                    table = f"{PROPERTY_TABLES[property_type]}_{TRANS_TABLES[trans_type]}"
+                except Exception as e:
+                    message = f"{type(e).__name__}: {e}"
+                    print(f"An error occurred: {message} on {unit}")
+                    with engine.begin() as conn:
+                        mark_unit(conn, SOURCE, unit, 'failed', message = message)
+                    summary.append({'file' : unit, 'table' : None, 'rows' : 0, 'status' : 'failed'})
+                    continue
+                if table not in writers:
+                    writers[table] = BufferedTableWriter(engine, table, max_rows = max_rows, source = SOURCE)
+                writer = writers[table]
+                # 이전에 저장한 파일이 바뀌었으면 그 달의 행을 교체
+                replace = (None, file_month(path)) if unit in manifest and file_month(path) else None
+                if df is None or df.empty:
+                    writer.mark(unit, 'empty', row_count = 0, content_hash = digest, replace = replace)
+                else:
+                    writer.append(df, unit = unit, content_hash = digest, replace = replace)
+                summary.append({'file' : unit, 'table' : table, 'rows' : 0 if df is None else len(df),
+                                'status' : 'empty' if df is None or df.empty else 'done'})
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    elapsed = time.perf_counter() - start
+    summary = pd.DataFrame(summary, columns = ['file', 'table', 'rows', 'status'])
+    n_rows = int(summary['rows'].sum())
+    n_failed = int((summary['status'] == 'failed').sum())
+    print(f"{len(summary)} files ({n_failed} failed), {n_rows:,} rows in {elapsed:.1f}s "
+          f"({n_rows / max(elapsed, 1e-9):,.0f} rows/s, {len(summary) / max(elapsed, 1e-9):.2f} files/s)")
+    return summary
+
+
+if __name__ == "__main__":
+    from api import create_db_engine
+
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), '연립다세대')
+    db_path = sys.argv[2] if len(sys.argv) > 2 else '/Users/hj/Dropbox/real_estate/data/조건별 자료제공/RealEstate_xlsx.db'
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    print(load_archive(root, create_db_engine(db_path), workers).groupby('table')['rows'].sum())
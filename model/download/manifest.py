@@ -0,0 +1,104 @@
+"""
+다운로드 단위별 진행 상황 기록 (download_manifest 테이블)
+-----------
+source : 'api:apt:apt_raw', 'xlsx' 처럼 다운로더와 대상 테이블 구분
+unit : api는 '{지역코드}:{연월}', xlsx는 '{연월}:{부동산유형}:{거래유형}'
+status : done(저장 완료), empty(데이터 없음), failed(실패, 다음 실행에서 재시도)
+-----------
+conn에는 sqlite3 연결이나 SQLAlchemy Connection 둘 다 사용 가능
+"""
+import hashlib
+from datetime import datetime
+
+
+MANIFEST_TABLE = 'download_manifest'
+COMPLETED = ('done', 'empty')
+
+
+def _execute(conn, query, params = ()):
+    if hasattr(conn, 'exec_driver_sql'):
+        return conn.exec_driver_sql(query, params)
+    return conn.execute(query, params)
+
+
+def create_manifest(conn):
+    _execute(conn, f"""
+        CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+            source TEXT NOT NULL,
+            unit TEXT NOT NULL,
+            status TEXT NOT NULL,
+            row_count INTEGER,
+            content_hash TEXT,
+            updated_at TEXT NOT NULL,
+            message TEXT,
+            PRIMARY KEY (source, unit)
+        )""")
+
+
+def load_manifest(conn, source):
+    """
+    source의 기록을 {unit : (status, row_count, content_hash)}로 반환
+    """
+    create_manifest(conn)
+    result = _execute(conn, f"SELECT unit, status, row_count, content_hash FROM {MANIFEST_TABLE} WHERE source = ?", (source,))
+    return {row[0] : tuple(row[1:]) for row in result}
+
+
+def mark_unit(conn, source, unit, status, row_count = None, content_hash = None, message = None):
+    _execute(conn, f"""
+        INSERT INTO {MANIFEST_TABLE} (source, unit, status, row_count, content_hash, updated_at, message)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (source, unit) DO UPDATE SET
+            status = excluded.status,
+            row_count = excluded.row_count,
+            content_hash = excluded.content_hash,
+            updated_at = excluded.updated_at,
+            message = excluded.message""",
+        (source, unit, status, row_count, content_hash, datetime.now().isoformat(timespec = 'seconds'), message))
+
+
+def content_hash(data):
+    """
+    bytes는 그대로, 데이터프레임은 칼럼명과 값을 기준으로 sha256
+    """
+    if isinstance(data, (bytes, bytearray)):
+        return hashlib.sha256(data).hexdigest()
+
+    import pandas as pd
+    h = hashlib.sha256()
+    h.update("\x1f".join(map(str, data.columns)).encode())
+    h.update(pd.util.hash_pandas_object(data, index = False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def unchanged(prev, digest):
+    """
+    매니페스트 기록 prev = (status, row_count, content_hash)가 완료 상태이고 내용 해시가 같으면 True
+    """
+    return prev is not None and prev[0] in COMPLETED and prev[2] is not None and prev[2] == digest
+
+
+def recent_months(n, today = None):
+    """
+    이번 달을 포함한 최근 n개월의 'YYYYMM' 집합 (증분 갱신용)
+    """
+    today = today or datetime.now()
+    year, month = today.year, today.month
+    months = set()
+    for _ in range(n or 0):
+        months.add(f"{year}{month:02d}")
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return months
+
+
+def pending_units(manifest, units, refresh = ()):
+    """
+    다시 받아야 하는 단위만 남김 : 기록이 없거나 실패했거나, refresh에 포함된 단위
+    units와 refresh는 (unit, 연월) 쌍과 'YYYYMM' 집합
+    """
+    todo = []
+    for unit, month in units:
+        status = manifest.get(unit, (None,))[0]
+        if status not in COMPLETED or month in refresh:
+            todo.append((unit, month))
+    return todo
@@ -0,0 +1,45 @@
+"""
+python -m pytest model/download/test_api.py
+"""
+import time
+import pytest
+
+import api
+from bench_api import ApiStandIn, run_serial, run_concurrent, assert_same_results
+
+CATE = 'apt'
+LOC_LIST = [11110, 11140, 11170]
+MONTH_LIST = ['202401', '202402']
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    def start(**kwargs):
+        server = ApiStandIn(latency = 0.0, **kwargs).__enter__()
+        monkeypatch.setitem(api.category_url, CATE, server.url)
+        servers.append(server)
+        return server
+    servers = []
+    yield start
+    for server in servers:
+        server.__exit__()
+
+
+def test_stalled_request_times_out(stand_in):
+    stand_in(stall = [('11110', '202401')], stall_time = 3.0)
+    start = time.perf_counter()
+    status, df = api.get_unit(CATE, 11110, '202401', timeout = 0.2)
+    assert (status, df) == ('failed', None)
+    assert time.perf_counter() - start < 2.0
+
+
+def test_fetch_all_retries_to_serial_result(stand_in):
+    stand_in()
+    _, expected = run_serial(CATE, LOC_LIST, MONTH_LIST)
+    assert {status for status, _ in expected.values()} <= {'done', 'empty'}
+
+    server = stand_in(fail_first = 1, error_first = 1, stall = [('11140', '202402')], stall_time = 2.0)
+    _, actual = run_concurrent(CATE, LOC_LIST, MONTH_LIST, max_workers = 4, rate = 0, backoff = 0.01, timeout = 0.3)
+    assert_same_results(expected, actual)
+    # 단위마다 99, 503, 정상 응답 (멈춘 요청은 첫 번째 시도를 대신함)
+    assert server.requests >= 3 * len(expected)
@@ -0,0 +1,91 @@
+"""
+python -m pytest model/download/test_dedup.py
+"""
+import sqlite3
+import pandas as pd
+from sqlalchemy import create_engine
+
+from api import BufferedTableWriter
+from dedup import row_keys, ensure_unique_key, has_unique_key, unique_key_index
+
+
+def legacy_frame():
+    # get_df / parse_content 결과처럼 모두 문자열, 건축년도 하나는 결측
+    return pd.DataFrame({
+        '년' : ['2006', '2006'],
+        '월' : ['1', '1'],
+        '일' : ['20', '20'],
+        '시군구' : ['충청남도 당진시 송악읍 반촌리'] * 2,
+        '지번' : ['841-2', '841-2'],
+        '연립다세대' : ['대명빌리지(A동)'] * 2,
+        '전용면적' : ['75.7400', '84.9000'],
+        '대지권면적' : ['103.0000', '51.87'],
+        '거래금액' : ['4,000', '12,000'],
+        '층' : ['4', '3'],
+        '건축년도' : ['2005', None],
+    })
+
+
+def count_rows(db_path, tab_name):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM "{tab_name}"').fetchone()[0]
+
+
+def test_row_keys_ignore_storage_type():
+    raw = legacy_frame()
+    typed = raw.assign(전용면적 = [75.74, 84.9], 대지권면적 = [103.0, 51.87],
+                       거래금액 = [4000.0, 12000.0], 건축년도 = [2005.0, None])
+    assert (row_keys(raw) == row_keys(typed)).all()
+
+
+def test_migrate_then_reload_does_not_grow(tmp_path):
+    db_path = str(tmp_path / 'legacy.db')
+    tab_name = 'multi_house_sale'
+    # 타입 변환 전에 TEXT로 저장된 기존 테이블 (row_key 없음)
+    with sqlite3.connect(db_path) as conn:
+        legacy_frame().to_sql(tab_name, conn, index = False)
+
+    engine = create_engine(f'sqlite:///{db_path}')
+    for _ in range(2):
+        with BufferedTableWriter(engine, tab_name) as writer:
+            writer.append(legacy_frame())
+        assert count_rows(db_path, tab_name) == 2
+
+
+def test_rows_differing_in_any_source_column_are_kept(tmp_path):
+    db_path = str(tmp_path / 'distinct.db')
+    df = legacy_frame().iloc[[0, 0]].reset_index(drop = True)
+    df.loc[1, '대지권면적'] = '52.15'
+    engine = create_engine(f'sqlite:///{db_path}')
+    with BufferedTableWriter(engine, 'multi_house_sale') as writer:
+        writer.append(df)
+    assert count_rows(db_path, 'multi_house_sale') == 2
+
+
+def test_missing_column_keys_like_null():
+    df = legacy_frame()
+    assert (row_keys(df) == row_keys(df.assign(매수자 = None))).all()
+    assert (row_keys(df) == row_keys(df[df.columns[::-1]])).all()
+
+
+def test_existing_duplicates_are_kept_unless_requested(tmp_path):
+    db_path = str(tmp_path / 'dups.db')
+    tab_name = 'multi_house_sale'
+    with sqlite3.connect(db_path) as conn:
+        legacy_frame().iloc[[0, 0, 1]].to_sql(tab_name, conn, index = False)
+        # 이전 버전 키 인덱스가 있는 테이블도 다시 계산
+        conn.execute(f'ALTER TABLE "{tab_name}" ADD COLUMN "row_key" INTEGER')
+        conn.execute(f'CREATE UNIQUE INDEX "ux_{tab_name}_row_key" ON "{tab_name}" ("row_key")')
+        assert ensure_unique_key(conn, tab_name) == 1
+        assert has_unique_key(conn, tab_name)
+        assert conn.execute(f'SELECT COUNT(*), COUNT(row_key) FROM "{tab_name}"').fetchone() == (3, 2)
+
+    engine = create_engine(f'sqlite:///{db_path}')
+    with BufferedTableWriter(engine, tab_name) as writer:
+        writer.append(legacy_frame())
+    assert count_rows(db_path, tab_name) == 3
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(f'DROP INDEX "{unique_key_index(tab_name)}"')
+        assert ensure_unique_key(conn, tab_name, remove_duplicates = True) == 1
+    assert count_rows(db_path, tab_name) == 2
@@ -0,0 +1,119 @@
+"""
+RealEstateDataDownloader/xlsx 아카이브 → hive 파티션 Parquet 데이터셋 (my_func/xlsx_dataset.py 형식)
+-----------
+python to_parquet.py [root_dir] [out_dir] [workers]
+원본 xlsx 하나를 property/trans/year/month 파티션의 Parquet 파일 하나로 변환
+out_dir/_manifest.json에 원본별 (내용 해시, 파티션 파일, 형식 버전)을 기록해서 새로 생기거나 바뀐 파일만 다시 변환
+형식 버전(FORMAT_VERSION)이 다른 파일도 다시 변환 (칼럼 타입, 행 그룹 크기를 바꾼 경우)
+-----------
+"""
+import os
+import sys
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pyarrow.parquet as pq
+from load_xlsx import PROPERTY_TABLES, TRANS_TABLES, parse_workbook, find_workbooks, file_month, file_hash, unit_name
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from my_func.xlsx_dataset import typed_table, partition_dir
+
+MANIFEST_FILE = '_manifest.json'
+
+# 월별 파일이 수천~수만 행이므로 파일마다 행 그룹이 여러 개가 되도록 작게 잡음 (시군구 조건으로 행 그룹을 건너뛸 수 있게)
+ROW_GROUP_SIZE = 2048
+
+# 1 : 64k 행 그룹, 시군구 사전 타입 / 2 : 2048행 행 그룹, 시군구 문자열 타입
+FORMAT_VERSION = 2
+
+
+def load_dataset_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding = 'utf-8') as file:
+        return json.load(file)
+
+
+def save_dataset_manifest(out_dir, manifest):
+    """
+    임시 파일에 쓰고 교체 (중간에 멈춰도 이전 매니페스트는 그대로)
+    """
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w', encoding = 'utf-8') as file:
+        json.dump(manifest, file, ensure_ascii = False, indent = 1, sort_keys = True)
+    os.replace(path + '.tmp', path)
+
+
+def convert_workbook(path, out_dir):
+    """
+    xlsx 하나를 파싱해서 파티션 디렉터리에 Parquet로 저장 (프로세스 풀에서 실행)
+    시군구 순으로 정렬해서 저장하므로 지역 조건은 행 그룹 통계로 걸러짐
+    (파티션 파일 경로, 행 수, 내용 해시) 반환, 행이 없으면 경로는 None
+    """
+    property_type, trans_type, df, digest = parse_workbook(path)
+    if df is None or df.empty:
+        return None, 0, digest
+
+    month = file_month(path)
+    if month is None:
+        month = f"{int(df['년'].iloc[0])}{int(df['월'].iloc[0]):02d}"
+    directory = partition_dir(out_dir, PROPERTY_TABLES[property_type], TRANS_TABLES[trans_type], month[:4], month[4:])
+    os.makedirs(directory, exist_ok = True)
+
+    if '시군구' in df.columns:
+        df = df.sort_values('시군구', kind = 'stable')
+    table = typed_table(df.reset_index(drop = True))
+    name = os.path.splitext(os.path.basename(path))[0] + '.parquet'
+    target = os.path.join(directory, name)
+    # '.'으로 시작하는 임시 파일은 데이터셋을 읽을 때 무시됨
+    partial = os.path.join(directory, f".{name}.tmp")
+    pq.write_table(table, partial, compression = 'zstd', row_group_size = ROW_GROUP_SIZE)
+    os.replace(partial, target)
+    return os.path.relpath(target, out_dir), len(df), digest
+
+
+def convert_archive(root, out_dir, workers = None):
+    """
+    root 아래 xlsx 중 새로 생기거나 내용 해시가 바뀐 파일만 변환
+    바뀐 파일이 다른 파티션으로 옮겨 가면 이전 파티션 파일은 삭제
+    """
+    os.makedirs(out_dir, exist_ok = True)
+    manifest = load_dataset_manifest(out_dir)
+    todo = []
+    for path in find_workbooks(root):
+        prev = manifest.get(unit_name(path))
+        if prev is None or prev.get('format', 1) != FORMAT_VERSION or prev['content_hash'] != file_hash(path):
+            todo.append(path)
+    print(f"{len(todo)} workbooks to convert under {root}")
+
+    start = time.perf_counter()
+    n_rows = 0
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = {executor.submit(convert_workbook, path, out_dir) : path for path in todo}
+        for future in as_completed(futures):
+            unit = unit_name(futures.pop(future))
+            try:
+                target, rows, digest = future.result()
+            except Exception as e:
+                print(f"An error occurred: {str(e)} on {unit}")
+                continue
+            prev = manifest.get(unit)
+            if prev is not None and prev['file'] not in (None, target):
+                old = os.path.join(out_dir, prev['file'])
+                if os.path.exists(old):
+                    os.remove(old)
+            manifest[unit] = {'content_hash' : digest, 'file' : target, 'rows' : rows, 'format' : FORMAT_VERSION}
+            n_rows += rows
+            save_dataset_manifest(out_dir, manifest)
+
+    elapsed = time.perf_counter() - start
+    print(f"{len(todo)} files, {n_rows:,} rows converted in {elapsed:.1f}s")
+    return manifest
+
+
+if __name__ == "__main__":
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), '연립다세대')
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else '/Users/hj/Dropbox/real_estate/data/조건별 자료제공/parquet'
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    convert_archive(root, out_dir, workers)
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+# 중복 판단 칼럼 묶음 (None은 전체 칼럼, remove_duplicates_df와 같음)
+KEY_SETS = {
+    '전체' : None,
+    '거래' : ['거래일자', '지역코드', '거래금액', '전용면적'],   # remove_same_row 기준
+}
+
+
+def splitmix64(x):
+    """
+    splitmix64 섞기 (uint64 배열, 오버플로는 2^64로 나눈 나머지)
+    """
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xbf58476d1ce4e5b9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+
+def column_codes(s):
+    """
+    칼럼 값을 uint64로 : 범주형은 코드, 정수/날짜는 값 그대로, 그 외는 factorize 코드
+    """
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes = s.cat.codes.to_numpy().astype(np.int64)
+    elif (pd.api.types.is_integer_dtype(s.dtype) or pd.api.types.is_datetime64_dtype(s.dtype)) and not s.isna().any():
+        codes = s.to_numpy().astype(np.int64, copy = False)
+    else:
+        codes, _ = pd.factorize(s, use_na_sentinel = True)
+    # 결측(-1)도 하나의 값으로 봄 (drop_duplicates와 같음)
+    return codes.astype(np.int64, copy = False).view(np.uint64)
+
+
+def row_fingerprint(df, columns = None):
+    """
+    행마다 64비트 지문 (columns가 None이면 전체 칼럼)
+    칼럼별 column_codes를 (h ^ code) * 소수로 이어 붙이고 마지막에 splitmix64로 섞음
+    factorize 코드는 데이터프레임 안에서만 의미가 있으므로 같은 데이터프레임 안의 중복 판단에만 사용
+    """
+    columns = df.columns if columns is None else list(columns)
+    fingerprint = np.zeros(len(df), dtype = np.uint64)
+    prime = np.uint64(0x100000001b3)
+    with np.errstate(over = 'ignore'):
+        for col in columns:
+            fingerprint ^= column_codes(df[col])
+            fingerprint *= prime
+        return splitmix64(fingerprint)
+
+
+def keep_first_mask(df, columns = None):
+    """
+    drop_duplicates(subset=columns)로 남는 행이면 True (처음 나온 행 유지)
+    """
+    return ~pd.Series(row_fingerprint(df, columns)).duplicated().to_numpy()
+
+
+def drop_duplicate_rows(df, columns = None):
+    """
+    지문 기준 중복 제거 후 (결과, 제거된 행 수) 반환
+    """
+    keep = keep_first_mask(df, columns)
+    removed = int((~keep).sum())
+    if removed == 0:
+        return df, 0
+    return df[keep], removed
+
+
+def duplicate_report(df, key_sets = None):
+    """
+    칼럼 묶음별로 중복 제거하면 없어지는 행 수 (데이터는 그대로 둠)
+    """
+    key_sets = KEY_SETS if key_sets is None else key_sets
+    rows = []
+    for name, columns in key_sets.items():
+        if columns is not None and not set(columns) <= set(df.columns):
+            continue
+        removed = int((~keep_first_mask(df, columns)).sum())
+        rows.append({'기준' : name, '제거 전' : len(df), '제거된 행' : removed, '제거 후' : len(df) - removed})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    rng = np.random.default_rng(0)
+    n_unique = n_rows * 9 // 10
+    base = pd.DataFrame({
+        '거래일자' : (np.datetime64('2006-01-01') + rng.integers(0, 6900, n_unique).astype('timedelta64[D]')),
+        '지역코드' : rng.integers(11110, 50130, n_unique).astype(str).astype(object),
+        '거래금액' : pd.Series(rng.integers(1000, 300000, n_unique)).map('{:,}'.format).astype(object),
+        '전용면적' : rng.uniform(20, 200, n_unique).round(2).astype(str).astype(object),
+    })
+    # 임대 테이블처럼 넓은 문자열 칼럼
+    for i in range(12):
+        base[f"칼럼{i}"] = rng.integers(0, 1000, n_unique).astype(str).astype(object)
+    df = pd.concat([base, base.sample(n_rows - n_unique, random_state = 0)], ignore_index = True)
+    print(f"synthetic table : {df.shape}")
+
+    for name, columns in KEY_SETS.items():
+        start = time.perf_counter()
+        legacy = df.drop_duplicates(subset = columns)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fast, removed = drop_duplicate_rows(df, columns)
+        fast_time = time.perf_counter() - start
+
+        assert fast.index.equals(legacy.index), name
+        print(f"{name} : {removed:,}행 제거, drop_duplicates {legacy_time:.2f}s, fingerprint {fast_time:.2f}s ({legacy_time / fast_time:.1f}x)")
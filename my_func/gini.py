@@ -1,6 +1,20 @@
+import os
+import sys
 from sqlalchemy import create_engine, text
 import pandas as pd
 import numpy as np
+from pandas.api.types import union_categoricals
+
+# python my_func/gini.py로 실행해도 my_func 패키지를 찾도록 저장소 루트 추가
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from my_func.gini_kernel import group_codes, grouped_gini, finish_grouped
+from my_func.region_index import region_index
+from my_func.gini_store import GiniStore
+from my_func.gini_series import gini_series
+from my_func.gini_sketch import GiniSketch, sketch_groups
+from my_func.fingerprint import drop_duplicate_rows
+from my_func.window_load import PERIOD_EXPR
+from my_func.parse import INT_DTYPES, parse_int_column, assemble_date, apply_schema, memory_mb
 
 table_data_map = {
     'apt' : '아파트_매매',
@@ -14,6 +28,66 @@ table_data_map = {
     'multi_family_lease_raw' : '다세대_임대'
 }
 
+# 모든 테이블 공통 칼럼 타입 (지역명은 범주형, 코드는 int32, 면적은 float32)
+BASE_SCHEMA = {
+    **INT_DTYPES,
+    '시도명' : 'category',
+    '시군구명' : 'category',
+    '법정동' : 'category',
+    '지역코드' : np.int32,
+    '시군구코드' : np.int32,
+    '전용면적' : np.float32,
+    '면적' : np.float32,
+}
+
+# table_data_map의 테이블별 칼럼 타입
+table_schema_map = {
+    'apt' : {**BASE_SCHEMA, '아파트' : 'category'},
+    'office_raw' : {**BASE_SCHEMA, '단지' : 'category'},
+    'house_raw' : {**BASE_SCHEMA, '연면적' : np.float32, '주택유형' : 'category'},
+    'multi_family_raw' : {**BASE_SCHEMA, '연립다세대' : 'category'},
+
+    'apt_lease_raw' : {**BASE_SCHEMA, '아파트' : 'category'},
+    'house_lease_raw' : {**BASE_SCHEMA, '주택유형' : 'category'},
+    'office_lease_raw' : {**BASE_SCHEMA, '단지' : 'category'},
+    'multi_family_lease_raw' : {**BASE_SCHEMA, '연립다세대' : 'category'},
+}
+
+# 수집 단계 중복 제거 키와 유니크 인덱스 이름 (model/download/dedup.py의 ROW_KEY, unique_key_index와 같음)
+ROW_KEY = 'row_key'
+ROW_KEY_INDEX = 'ux_{}_row_key_v2'
+
+# preprocess / map_hdong 결과가 바뀌면 올려서 이전 캐시를 무효화
+PREPROCESS_VERSION = 4
+
+
+def region_group(region):
+    """
+    지역 단위별 그룹 칼럼
+    """
+    if region == '법정동' :
+        return ['년', '시도명', '시군구명', '법정동']
+    elif region == '시군구':
+        return ['년', '시도명', '시군구명']
+    raise ValueError(f"Unsupported region: {region}")
+
+
+def aggregate_groups(df, group):
+    """
+    그룹별 거래수, 평균, 지니계수 (finish_grouped 이전의 결과)
+    """
+    grouped = df.groupby(by = group, observed = True).agg(
+        거래수 = ('거래금액', 'size'),
+        평균거래금액 = ('거래금액', 'mean'),
+        평균평당거래금액 = ('평당거래금액', 'mean')
+        )
+
+    # 지니계수는 그룹 코드로 한 번에 계산
+    codes, ngroups = group_codes(df, group)
+    grouped.insert(2, '거래금액지니계수', grouped_gini(df['거래금액'].to_numpy(), codes, ngroups))
+    grouped['평당거래지니계수'] = grouped_gini(df['평당거래금액'].to_numpy(), codes, ngroups)
+    return grouped.reset_index()
+
 
 class RealEstateAnalyzer:
     def __init__(self) :
@@ -34,34 +108,183 @@ class RealEstateAnalyzer:
         -----------
         """
         self.db_path = '/Users/hj/Dropbox/real_estate/data/api/db/RealEstate.db'
+        self.cache_dir = os.path.join(os.path.dirname(self.db_path), 'cache')
+        self.dataset_dir = '/Users/hj/Dropbox/real_estate/data/조건별 자료제공/parquet'
         self.eng = create_engine(f'sqlite:///{self.db_path}')
         with self.eng.connect() as conn:
             result = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table' "))
             for row in result :
                 print(row)
 
-    def load_data(self, data_type, nrow = None):
+    def load_data(self, data_type, nrow = None, columns = None, years = None, sido_codes = None, rowids = None):
         """
         데이터 유형별 불러오기
+        columns, years = (시작년, 끝년), sido_codes = ['11', '41'] 를 주면 SQL에서 칼럼과 행을 걸러서 불러옴
         """
         self.data_type = data_type
+        query, params = self.build_query(data_type, nrow = nrow, columns = columns, years = years, sido_codes = sido_codes, rowids = rowids)
         with self.eng.connect() as conn:
-            if nrow is None :
-                self.df = pd.read_sql_query(f"SELECT * FROM {data_type}", con = conn)
-            else :
-                self.df = pd.read_sql_query(f"SELECT * FROM {data_type} LIMIT {nrow}", con = conn)
-            
-            self.code = pd.read_sql_query(f"SELECT * FROM conn_code", con = conn)
+            self.df = pd.read_sql_query(query, con = conn, params = params)
             
         print(f"{data_type} is loaded. 데이터의 수는 {self.df.shape}")
+        self.apply_schema()
+
+    def load_dataset(self, property_name, trans_name, start = None, end = None, columns = None, filter = None):
+        """
+        xlsx 아카이브를 변환한 Parquet 데이터셋(model/download/to_parquet.py)에서 불러오기
+        property/trans/년월 조건은 파티션 디렉터리로 고르고, filter(pyarrow 식)는 행 그룹 통계로 걸러서 읽음
+        예) load_dataset('multi_house', 'sale', start = '2019-01', end = '2019-12', filter = ds.field('거래금액') > 50000)
+        """
+        from my_func.xlsx_dataset import read_dataset
+
+        self.data_type = f"{property_name}_{trans_name}"
+        self.df = read_dataset(self.dataset_dir, property_name, trans_name, start = start, end = end, columns = columns, filter = filter)
+        print(f"{self.data_type} is loaded from dataset. 데이터의 수는 {self.df.shape}")
+
+    def schema(self):
+        return table_schema_map.get(self.data_type, BASE_SCHEMA)
+
+    def apply_schema(self):
+        """
+        테이블 스키마에 따라 칼럼을 압축 타입으로 변환하고 전후 메모리 출력
+        """
+        before = memory_mb(self.df)
+        apply_schema(self.df, self.schema())
+        print(f"{self.data_type} 메모리 : {before:,.1f}MB -> {memory_mb(self.df):,.1f}MB")
+
+    def build_query(self, data_type, nrow = None, columns = None, years = None, sido_codes = None, distinct = False, rowids = None):
+        """
+        칼럼 선택과 년/지역 조건을 SQL로 넘기는 쿼리 생성
+        distinct이면 row_key를 뺀 전체 칼럼 기준 중복 제거(remove_duplicates_df와 같음)를 칼럼 선택 전에 SQLite에서 처리
+        rowids = (시작, 끝)이면 ROWID가 시작 초과 끝 이하인 행만 ROWID 순서로 (증분 갱신용, 년월 인덱스를 써도 전체 읽기와 같은 순서)
+        """
+        source = f"{data_type}"
+        if nrow is not None :
+            source = f"(SELECT * FROM {data_type} LIMIT {int(nrow)})"
+        if distinct :
+            source_cols = ", ".join(f'"{col}"' for col in self.table_columns(data_type) if col != ROW_KEY)
+            source = f"(SELECT DISTINCT {source_cols} FROM {source})"
+
+        select = "*" if columns is None else ", ".join(f'"{col}"' for col in columns)
+        where = []
+        params = {}
+        if years is not None :
+            # 년월 키 조건 (window_load의 년월 식 인덱스가 있으면 범위 검색)
+            where.append(f"{PERIOD_EXPR} BETWEEN :start_period AND :end_period")
+            params.update(start_period = int(years[0]) * 100 + 1, end_period = int(years[1]) * 100 + 12)
+        if rowids is not None :
+            where.append("ROWID > :min_rowid AND ROWID <= :max_rowid")
+            params.update(min_rowid = int(rowids[0]), max_rowid = int(rowids[1]))
+        if sido_codes is not None :
+            names = [f":sido_{i}" for i in range(len(sido_codes))]
+            where.append(f"substr(CAST(지역코드 AS TEXT), 1, 2) IN ({', '.join(names)})")
+            params.update({f"sido_{i}" : str(code) for i, code in enumerate(sido_codes)})
+
+        query = f"SELECT {select} FROM {source}"
+        if where :
+            query += " WHERE " + " AND ".join(where)
+        if rowids is not None :
+            query += " ORDER BY ROWID"
+        return text(query), params
+
+    def needed_columns(self, data_type):
+        """
+        avg_price_year까지 필요한 칼럼 중 테이블에 있는 칼럼
+        """
+        needed = ['년', '월', '일', '지역코드', '법정동', '거래금액', '보증금액', '월세금액', '전용면적', '연면적']
+        existing = self.table_columns(data_type)
+        return [col for col in needed if col in existing]
+
+    def table_columns(self, data_type):
+        with self.eng.connect() as conn:
+            return [row[1] for row in conn.execute(text(f'PRAGMA table_info("{data_type}")'))]
+
+    def iter_chunks(self, data_type, chunksize, **kwargs):
+        """
+        build_query 결과를 chunksize 행씩 나누어 읽기
+        """
+        query, params = self.build_query(data_type, **kwargs)
+        with self.eng.connect() as conn:
+            for chunk in pd.read_sql_query(query, con = conn, params = params, chunksize = chunksize):
+                yield chunk
+
+    def load_grouped_chunks(self, data_type, region, chunksize = 200000, nrow = None, years = None, sido_codes = None):
+        """
+        필요한 칼럼만 청크 단위로 읽고 청크마다 전처리와 행정동 매핑을 한 뒤,
+        지역 키(범주형)와 거래금액/평당거래금액만 남겨서 합침
+        지니계수는 그룹의 모든 값이 필요하므로 값 두 칼럼은 유지하고 나머지 칼럼은 청크와 함께 버림
+        """
+        self.data_type = data_type
+        group = region_group(region)
+        keys = {col : [] for col in group if col != '년'}
+        values = {col : [] for col in ['년', '거래금액', '평당거래금액']}
+
+        columns = self.needed_columns(data_type)
+        n_rows = 0
+        distinct = not self.has_row_key(data_type)
+        for chunk in self.iter_chunks(data_type, chunksize, columns = columns, nrow = nrow, years = years, sido_codes = sido_codes, distinct = distinct):
+            self.df = apply_schema(chunk, self.schema())
+            self.preprocess()
+            self.lease_tranform()
+            self.map_hdong()
+            for col in keys :
+                keys[col].append(self.df[col].astype('category'))
+            for col in values :
+                values[col].append(self.df[col].to_numpy())
+            n_rows += len(self.df)
+
+        df = pd.DataFrame({col : np.concatenate(parts) if parts else [] for col, parts in values.items()})
+        for col, parts in keys.items() :
+            df[col] = union_categoricals(parts, sort_categories = True) if parts else pd.Categorical([])
+        self.df = df[group + ['거래금액', '평당거래금액']]
+        print(f"{data_type} is loaded by chunks. 데이터의 수는 {self.df.shape}")
         
-    def remove_duplicates_df(self) :
+    def load_sketches(self, data_type, region, alpha = 0.01, chunksize = 200000, nrow = None, years = None, sido_codes = None):
         """
-        판다스로 중복 데이터 제거
+        load_grouped_chunks와 같이 청크 단위로 전처리하되, 값 대신 청크별 GiniSketch를 만들어 병합
+        메모리는 행 수가 아니라 (그룹, 구간) 수에 비례하고 지니계수 절대오차는 alpha 정도
         """
+        self.data_type = data_type
+        group = region_group(region)
+        self.sketches = {}
+
+        columns = self.needed_columns(data_type)
+        distinct = not self.has_row_key(data_type)
+        for chunk in self.iter_chunks(data_type, chunksize, columns = columns, nrow = nrow, years = years, sido_codes = sido_codes, distinct = distinct):
+            self.df = apply_schema(chunk, self.schema())
+            self.preprocess()
+            self.lease_tranform()
+            self.map_hdong()
+            for col in ['거래금액', '평당거래금액'] :
+                sketch = GiniSketch.build(self.df, group, col, alpha)
+                self.sketches[col] = self.sketches[col].merge(sketch) if col in self.sketches else sketch
+        print(f"{data_type} sketches are built. 구간 수 {len(self.sketches['거래금액'].table):,}")
+
+    def has_row_key(self, data_type):
+        """
+        수집 단계에서 row_key 유니크 인덱스로 중복을 막았고 남은 중복도 없는 테이블인지
+        인덱스를 만들 때 지우지 않고 남긴 중복 행(row_key가 NULL)이 있으면 False (읽는 쪽에서 중복 제거)
+        """
+        with self.eng.connect() as conn:
+            indexes = [row[1] for row in conn.execute(text(f'PRAGMA index_list("{data_type}")'))]
+            if ROW_KEY_INDEX.format(data_type) not in indexes :
+                return False
+            # row_key 인덱스로 찾으므로 전체 스캔 없음
+            return conn.execute(text(f'SELECT 1 FROM "{data_type}" WHERE "{ROW_KEY}" IS NULL LIMIT 1')).first() is None
+
+    def remove_duplicates_df(self, columns = None) :
+        """
+        행 지문(64비트)으로 중복 데이터 제거, columns가 None이면 row_key를 뺀 전체 칼럼 (drop_duplicates와 같음)
+        row_key 유니크 인덱스가 있고 남은 중복이 없는 테이블은 건너뜀
+        """
+        if self.has_row_key(self.data_type) :
+            print(f"{self.data_type} : row_key 유니크 인덱스가 있어 중복 제거 생략")
+            return
+        if columns is None :
+            columns = [col for col in self.df.columns if col != ROW_KEY]
         print("중복 제거전 ", self.df.shape)
-        self.df.drop_duplicates(inplace = True)
-        print("중복 제거 후 ", self.df.shape)
+        self.df, removed = drop_duplicate_rows(self.df, columns)
+        print("중복 제거 후 ", self.df.shape, f"({removed}행 제거)")
 
     def preprocess(self) :
         """
@@ -70,11 +293,11 @@ class RealEstateAnalyzer:
         2. 새로운 칼럼 생성 : 거래일자, 평당거래금액
         3. 칼럼 순서 변경 및 제거
         """
-        # 거래금액 정수로 변경
+        # 거래금액 정수로 변경 (쉼표 제거 후 int32/int16)
         int_cols = ['거래금액', '월세금액', '보증금액', '건축년도', '년', '월', '일']
         for col in int_cols :
             if col in self.df.columns :
-                self.df[col] = self.df[col].str.replace(',', '').fillna('0').astype(int)
+                self.df[col] = parse_int_column(self.df[col], INT_DTYPES[col])
 
         def lease_tranform(self):
             if "보증금액" in self.df.columns :
@@ -84,14 +307,13 @@ class RealEstateAnalyzer:
         self.lease_tranform()
 
         if self.data_type == "house_raw" :
-            self.df['면적'] = self.df['연면적'].astype(float)
+            self.df['면적'] = self.df['연면적'].astype(np.float32)
 
         else :
-            self.df['면적'] = self.df['전용면적'].astype(float)
+            self.df['면적'] = self.df['전용면적'].astype(np.float32)
 
-        # 년월일을 합쳐서 거래일자 칼럼 생성
-        date_str = self.df[['년', '월', '일']].astype(str).agg('-'.join, axis = 1)
-        self.df['거래일자'] = pd.to_datetime(date_str)
+        # 년월일을 합쳐서 거래일자 칼럼 생성 (문자열 조합 없이 정수로 계산)
+        self.df['거래일자'] = assemble_date(self.df['년'], self.df['월'], self.df['일'])
 
         # 평당거래금액 
         self.df['평당거래금액'] = round(self.df['거래금액']/self.df['면적'] * 3.30579, 2)
@@ -101,7 +323,7 @@ class RealEstateAnalyzer:
         self.df = self.df[col_order]
 
         # 필요없는 칼럼 제거
-        drop_cols = ['거래유형', '매수자', '매도자', '중개사소재지', '해제사유발생일', '해제여부', '월', '일']
+        drop_cols = ['거래유형', '매수자', '매도자', '중개사소재지', '해제사유발생일', '해제여부', '월', '일', ROW_KEY]
         self.df.drop(columns = drop_cols,inplace = True, errors = 'ignore')
         print("전처리 완료")
 
@@ -113,60 +335,48 @@ class RealEstateAnalyzer:
     def map_hdong(self) :
         """
         행정동과 매핑
+        지역코드로 시군구코드 색인을 조회해서 시도명/시군구명(범주형)만 추가, 일치하지 않으면 결측
         """
-        # 코드 정리
-        self.code.drop_duplicates(subset=['시군구코드', '시군구명'], inplace = True) # conn_code의 중복제거
-        self.code = self.code[["시도명", "시군구명", "시군구코드"]]
-
-        self.df = pd.merge(self.df, self.code, left_on = '지역코드', right_on = '시군구코드', how = 'left')
+        region_index(self.eng).enrich(self.df, '지역코드', '시군구코드')
     
     def avg_price_year(self, region) :
         self.region = region
-        def gini(array):
-            array = array.flatten().astype(float)
-
-            if np.amin(array) < 0:
-                array -= np.amin(array)
-            array += 0.0000001
-            array = np.sort(array)
-            index = np.arange(1, array.shape[0] + 1)
-            n = array.shape[0]
-
-            if n > 1 :
-                result = ((np.sum((2 * index - n - 1) * array)) / (n * np.sum(array)))
-                return result
-            else :
-                return 1
-        
-        if region == '법정동' :
-            group = ['년', '시도명', '시군구명', '법정동']
-
-        elif region == '시군구':
-            group = ['년', '시도명', '시군구명']
-
-        grouped = self.df.groupby(by = group).agg(
-            거래수 = ('거래금액', 'size'),
-            평균거래금액 = ('거래금액', 'mean'),
-            거래금액지니계수 = ('거래금액', lambda x : gini(x.to_numpy())),
-            평균평당거래금액 = ('평당거래금액', 'mean'),
-            평당거래지니계수 = ('평당거래금액', lambda x : gini(x.to_numpy()))
-            ).reset_index()
-        
-        # 소수점
-        avg_cols = ['평균평당거래금액', '평균거래금액']
-        gini_cols = ['거래금액지니계수', '평당거래지니계수']
-        grouped[avg_cols] = grouped[avg_cols].round(1)
-        grouped[gini_cols] = grouped[gini_cols].round(4)
-
-        # 시도명 순서 지정
-        order = {'서울특별시' : 1, '경기도': 2}
-        grouped['시도명순서'] = grouped['시도명'].map(order).fillna(99).astype(int)
-        grouped = grouped.sort_values(by=['년', '시도명순서']).drop(columns=['시도명순서'])
+        group = region_group(region)
+
+        grouped = aggregate_groups(self.df, group)
+        grouped = finish_grouped(grouped, group)
         self.grouped = grouped
 
         print("그룹별 계산 완료!")
         return grouped
     
+    def avg_price_sketch(self, region) :
+        """
+        load_sketches 결과로 avg_price_year와 같은 형태의 근사 결과 계산 (거래수, 평균은 정확)
+        """
+        self.region = region
+        group = region_group(region)
+        self.grouped = finish_grouped(sketch_groups(self.sketches, group), group)
+        print("그룹별 근사 계산 완료!")
+        return self.grouped
+
+    def avg_price_series(self, region) :
+        """
+        지역별 월/분기/년/최근12개월 거래수, 평균, 지니계수 시계열
+        거래일자가 필요하므로 load_data 또는 캐시로 불러온 데이터에서 사용
+        """
+        self.region = region
+        self.series = gini_series(self.df, region_group(region)[1:])
+        print("시계열 계산 완료!")
+        return self.series
+
+    def save_series(self) :
+        result_name = table_data_map[self.data_type]
+        file_name = f"{result_name}_{self.region}_지니계수_시계열.csv"
+
+        self.series.to_csv(f"report/result/{file_name}", index = False)
+        print(f"{result_name} series is saved to report/result/{file_name}")
+
     def save_result(self) :
         import datetime
         today = datetime.datetime.now().strftime('%Y-%m-%d')
@@ -176,18 +386,164 @@ class RealEstateAnalyzer:
         self.grouped.to_csv(f"report/result/{file_name}", index = False)
         print(f"{result_name} is saved to report/result/{file_name}")
 
-    def main(self, dtype, region = 'bdong', nrow = None) :
+    def source_signature(self, data_type):
+        """
+        원본 테이블의 (행 수, 최대 ROWID) - 캐시 키로 사용
+        """
+        with self.eng.connect() as conn:
+            count, max_rowid = conn.execute(text(f"SELECT COUNT(*), MAX(ROWID) FROM {data_type}")).fetchone()
+        return count, max_rowid or 0
+
+    def cache_path(self, data_type):
+        count, max_rowid = self.source_signature(data_type)
+        return os.path.join(self.cache_dir, f"{data_type}_v{PREPROCESS_VERSION}_{count}_{max_rowid}.arrow")
+
+    def load_cache(self, data_type):
+        """
+        전처리와 행정동 매핑까지 끝난 데이터를 Arrow 파일에서 메모리 매핑으로 불러옴
+        원본 행 수, 최대 ROWID, PREPROCESS_VERSION 중 하나라도 다르면 캐시를 쓰지 않음
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            return False
+
+        path = self.cache_path(data_type)
+        if not os.path.exists(path):
+            return False
+
+        with pa.memory_map(path, 'r') as source:
+            self.df = pa.ipc.open_file(source).read_all().to_pandas()
+        self.data_type = data_type
+        print(f"{data_type} is loaded from cache. 데이터의 수는 {self.df.shape}")
+        return True
+
+    def save_cache(self):
+        """
+        현재 데이터프레임을 Arrow IPC(비압축) 파일로 저장, 지역명은 딕셔너리 인코딩
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            print("pyarrow가 없어서 캐시를 저장하지 않음")
+            return
+
+        os.makedirs(self.cache_dir, exist_ok = True)
+        path = self.cache_path(self.data_type)
+        df = self.df.copy()
+        for col in ['시도명', '시군구명', '법정동'] :
+            if col in df.columns :
+                df[col] = df[col].astype('category')
+
+        table = pa.Table.from_pandas(df, preserve_index = False)
+        tmp_path = path + '.tmp'
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+
+        # 같은 테이블의 이전 캐시 삭제
+        for name in os.listdir(self.cache_dir) :
+            old_path = os.path.join(self.cache_dir, name)
+            if name.startswith(f"{self.data_type}_v") and name.endswith('.arrow') and old_path != path :
+                os.remove(old_path)
+        print(f"{self.data_type} cache is saved to {path}")
+
+    def source_year_counts(self, data_type, *rowids):
+        """
+        rowids의 값마다 ROWID가 그 값 이하인 원본 행의 {년 : 행 수} (증분 저장소의 삭제 감지용, 한 번의 스캔)
+        """
+        sums = ", ".join(f"SUM(ROWID <= :rowid_{i})" for i in range(len(rowids)))
+        params = {f"rowid_{i}" : int(rowid) for i, rowid in enumerate(rowids)}
+        query = text(f'SELECT CAST("년" AS INTEGER), {sums} FROM {data_type} WHERE "년" IS NOT NULL GROUP BY 1')
+        counts = [{} for _ in rowids]
+        with self.eng.connect() as conn:
+            for row in conn.execute(query, params):
+                for i, n in enumerate(row[1:]):
+                    if n :
+                        counts[i][int(row[0])] = int(n)
+        return counts
+
+    def prepared_rows(self, dtype, dedup = False, **kwargs):
+        """
+        load_data부터 map_hdong까지 (증분 저장소에 넣을 형태)
+        dedup이면 main과 같이 모든 칼럼을 읽어서 remove_duplicates_df 후 전처리
+        """
+        if dedup :
+            self.load_data(dtype, **kwargs)
+            self.remove_duplicates_df()
+        else :
+            self.load_data(dtype, columns = self.needed_columns(dtype), **kwargs)
+        self.preprocess()
+        self.lease_tranform()
+        self.map_hdong()
+        return self.df
+
+    def update_store(self, dtype, region):
+        """
+        지난번 갱신 이후 추가된 행(ROWID 기준)만 읽어서 증분 저장소를 갱신하고 전체 결과를 저장
+        새 행이 들어간 (년, 지역) 그룹만 다시 계산하며 결과는 전체 재계산과 같음
+        달 교체(삭제 후 다시 저장)로 이미 반영한 행이 지워진 년도는 그 년도 전체를 다시 읽어서 새로 계산
+        row_key 인덱스로 중복이 없다고 확인되지 않은 테이블은 main과 같이 중복을 제거해야 하므로,
+        새 행이 있는 년도도 그 년도 전체를 다시 읽어서 중복 제거 후 계산 (전체 행 중복은 같은 년도 안에서만 생김)
+        """
+        store = GiniStore(os.path.join(self.cache_dir, 'store'), dtype, region, region_group(region))
+        _, max_rowid = self.source_signature(dtype)
+        max_rowid = max_rowid or 0
+        previous, current = self.source_year_counts(dtype, store.max_rowid, max_rowid)
+        stale = store.stale_years(previous)
+        dedup = not self.has_row_key(dtype)
+        if dedup :
+            added = [year for year in current if current[year] != previous.get(year, 0)]
+            stale = sorted(set(stale) | set(added))
+        if max_rowid > store.max_rowid or stale :
+            # 행이 모두 지워진 년도는 읽을 행 없이 파일만 없앰
+            frames = [self.prepared_rows(dtype, dedup = dedup, years = (year, year), rowids = (0, max_rowid)) for year in stale if year in current]
+            if max_rowid > store.max_rowid and not dedup :
+                new_rows = self.prepared_rows(dtype, rowids = (store.max_rowid, max_rowid))
+                frames.append(new_rows[~new_rows['년'].isin(stale)])
+            rows = pd.concat(frames, ignore_index = True) if frames else pd.DataFrame(columns = store.group + ['거래금액', '평당거래금액'])
+            store.update(rows, max_rowid = max_rowid,
+                         source_counts = current, rebuild = stale)
+            print(f"{dtype} store is updated : ROWID {store.max_rowid:,}까지 반영, 다시 계산한 년도 {stale}")
+
+        self.data_type = dtype
+        self.region = region
+        self.grouped = store.result()
+        self.save_result()
+        return self.grouped
+
+    def main(self, dtype, region = 'bdong', nrow = None, chunksize = None, use_cache = True, approx_alpha = None) :
+            # 근사 모드 : 청크별 스케치만 유지하고 병합 (값 배열을 모으지 않음)
+            if approx_alpha is not None :
+                self.load_sketches(dtype, region, alpha = approx_alpha, chunksize = chunksize or 200000, nrow = nrow)
+                self.avg_price_sketch(region)
+                self.save_result()
+                return
+
+            # 전체 데이터를 쓰는 경우 전처리 결과를 캐시에서 불러오고, 없으면 만든 뒤 저장
+            if use_cache and nrow is None and self.load_cache(dtype) :
+                self.avg_price_year(region)
+                self.save_result()
+                return
+
+            if chunksize is not None :
+                self.load_grouped_chunks(dtype, region, chunksize = chunksize, nrow = nrow)
+                self.avg_price_year(region)
+                self.save_result()
+                return
+
             self.load_data(dtype, nrow = nrow)
             self.remove_duplicates_df() 
             self.preprocess()
             self.lease_tranform()
             self.map_hdong()
+            if use_cache and nrow is None :
+                self.save_cache()
             self.avg_price_year(region)
             self.save_result()
     
 
-RA = RealEstateAnalyzer()
-
-for dtype in ['office_raw', 'house_raw', 'multi_family_raw']:
-    for region in ['시군구', '법정동']:
-        RA.main(dtype = dtype, region = region)
+if __name__ == "__main__":
+    from my_func.gini_batch import run_batch
+    run_batch(['office_raw', 'house_raw', 'multi_family_raw'], ['시군구', '법정동'])
@@ -0,0 +1,115 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from my_func.gini import RealEstateAnalyzer, aggregate_groups, region_group
+from my_func.gini_kernel import finish_grouped
+
+# 지니계수 계산에 필요한 값 칼럼
+VALUE_COLS = ['거래금액', '평당거래금액']
+
+
+def prepare_table(dtype):
+    """
+    테이블 하나를 한 번만 불러와서 전처리/행정동 매핑 결과를 Arrow 캐시로 저장 (이미 있으면 그대로 사용)
+    캐시 경로와 시도별 행 수를 돌려줌
+    """
+    import pyarrow as pa
+
+    ra = RealEstateAnalyzer()
+    path = ra.cache_path(dtype)
+    if not os.path.exists(path):
+        ra.load_data(dtype)
+        ra.remove_duplicates_df()
+        ra.preprocess()
+        ra.lease_tranform()
+        ra.map_hdong()
+        ra.save_cache()
+
+    with pa.memory_map(path, 'r') as source:
+        sido = pa.ipc.open_file(source).read_all().column('시도명').to_pandas()
+    sido_counts = sido.value_counts(sort = False)
+    return dtype, path, {name : int(count) for name, count in sido_counts.items() if count > 0}
+
+
+def aggregate_shard(path, group, sido_names = None):
+    """
+    Arrow 캐시를 메모리 매핑으로 읽고 sido_names에 속한 행만 그룹별 계산
+    그룹에 시도명이 들어 있으므로 시도로 나눈 샤드끼리는 그룹이 겹치지 않음
+    """
+    import pyarrow as pa
+
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all().select(group + VALUE_COLS)
+        if sido_names is not None :
+            mask = table.column('시도명').to_pandas().isin(sido_names).to_numpy()
+            table = table.filter(pa.array(mask))
+        df = table.to_pandas()
+    return aggregate_groups(df, group)
+
+
+def plan_shards(sido_counts, n_shards):
+    """
+    시도를 행 수가 비슷한 n_shards개 묶음으로 나눔
+    행 수가 많은 시도부터 가장 작은 묶음에 배정 (같은 입력이면 항상 같은 결과)
+    """
+    shards = [[] for _ in range(n_shards)]
+    sizes = [0] * n_shards
+    for name, count in sorted(sido_counts.items(), key = lambda item : (-item[1], item[0])) :
+        i = sizes.index(min(sizes))
+        shards[i].append(name)
+        sizes[i] += count
+    return [shard for shard in shards if shard]
+
+
+def merge_shards(parts, group):
+    """
+    샤드 결과를 합쳐서 샤드 없이 계산한 것과 같은 순서로 정리
+    그룹 키로 정렬(groupby(sort=True)와 같은 순서)한 뒤 finish_grouped로 (년, 시도명순서) 정렬
+    """
+    grouped = pd.concat(parts, ignore_index = True)
+    for col in group :
+        if isinstance(grouped[col].dtype, pd.CategoricalDtype) :
+            grouped[col] = grouped[col].astype(grouped[col].cat.categories.dtype)
+    grouped = grouped.sort_values(by = group, kind = 'stable', ignore_index = True)
+    return finish_grouped(grouped, group)
+
+
+def run_batch(dtypes, regions, workers = None, shard_rows = 2000000):
+    """
+    (테이블, 지역 단위) 작업을 프로세스 풀에서 실행
+    1. 테이블마다 한 번씩 불러와서 Arrow 캐시 생성 (지역 단위들이 같은 캐시를 공유)
+    2. shard_rows보다 큰 테이블은 시도별 샤드로 나눠서 병렬 계산
+    3. 결과는 dtypes, regions 순서대로 합쳐서 저장
+    pyarrow가 없으면 기존처럼 순서대로 main 실행
+    """
+    ra = RealEstateAnalyzer()
+    try:
+        import pyarrow
+    except ImportError:
+        for dtype in dtypes :
+            for region in regions :
+                ra.main(dtype = dtype, region = region)
+        return
+
+    workers = workers or os.cpu_count()
+    pending = {}
+    with ProcessPoolExecutor(max_workers = workers) as pool :
+        prepared = [pool.submit(prepare_table, dtype) for dtype in dtypes]
+        for future in as_completed(prepared) :
+            dtype, path, sido_counts = future.result()
+            n_rows = sum(sido_counts.values())
+            shards = [None]
+            if n_rows > shard_rows and len(sido_counts) > 1 :
+                shards = plan_shards(sido_counts, min(workers, len(sido_counts)))
+            print(f"{dtype} is prepared : {n_rows:,}행, 샤드 {len(shards)}개")
+            for region in regions :
+                group = region_group(region)
+                pending[(dtype, region)] = [pool.submit(aggregate_shard, path, group, shard) for shard in shards]
+
+        for dtype in dtypes :
+            for region in regions :
+                parts = [future.result() for future in pending[(dtype, region)]]
+                ra.data_type = dtype
+                ra.region = region
+                ra.grouped = merge_shards(parts, region_group(region))
+                ra.save_result()
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+
+def gini(array):
+    """
+    배열 하나의 지니계수 (기준 구현)
+    """
+    array = np.asarray(array).flatten().astype(float)
+
+    if np.amin(array) < 0:
+        array -= np.amin(array)
+    array += 0.0000001
+    array = np.sort(array)
+    index = np.arange(1, array.shape[0] + 1)
+    n = array.shape[0]
+
+    if n > 1 :
+        result = ((np.sum((2 * index - n - 1) * array)) / (n * np.sum(array)))
+        return result
+    else :
+        return 1
+
+
+def group_codes(df, by):
+    """
+    그룹 키를 정수 코드로 변환
+    groupby(sort=True)의 결과 순서와 같은 코드를 돌려주고, 키에 결측이 있는 행은 -1
+    """
+    gb = df.groupby(by=by, sort=True, observed=True)
+    codes = gb.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    return codes, gb.ngroups
+
+
+def sort_by_group(values, codes, ngroups=None):
+    """
+    (그룹, 값) 기준으로 한 번만 정렬한 버퍼 생성
+    -----------
+    sorted_values : 그룹별로 모이고 그룹 안에서는 오름차순인 값
+    sorted_codes : sorted_values 각 원소의 그룹 코드
+    starts, counts : 그룹별 시작 위치와 원소 수
+    """
+    values = np.asarray(values, dtype=np.float64).ravel()
+    codes = np.asarray(codes, dtype=np.int64).ravel()
+    if ngroups is None:
+        ngroups = int(codes.max()) + 1 if codes.size else 0
+
+    # 그룹 코드가 없는 행(-1)은 제외
+    valid = codes >= 0
+    if not valid.all():
+        values = values[valid]
+        codes = codes[valid]
+
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    sorted_codes = codes[order]
+
+    counts = np.bincount(sorted_codes, minlength=ngroups)
+    starts = np.zeros(ngroups, dtype=np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+    return sorted_values, sorted_codes, starts, counts
+
+
+def gini_sorted(sorted_values, sorted_codes, starts, counts, single=1.0):
+    """
+    sort_by_group 결과로 그룹별 지니계수 계산
+    gini()와 같은 규칙 : 음수가 있으면 최솟값만큼 이동, 0.0000001 더하기, 원소가 1개이면 single
+    """
+    ngroups = counts.shape[0]
+    result = np.full(ngroups, np.nan)
+    if sorted_values.size == 0:
+        return result
+
+    n = counts[sorted_codes]
+    nonempty = counts > 0
+
+    # 정렬되어 있으므로 그룹의 첫 원소가 최솟값
+    group_min = np.zeros(ngroups)
+    group_min[nonempty] = sorted_values[starts[nonempty]]
+    shift = np.where(group_min < 0, group_min, 0.0)
+    arr = sorted_values - shift[sorted_codes]
+    arr += 0.0000001
+
+    # 그룹 안에서의 순위 (1부터 시작)
+    index = np.arange(1, sorted_values.shape[0] + 1) - starts[sorted_codes]
+
+    numer = np.bincount(sorted_codes, weights=(2 * index - n - 1) * arr, minlength=ngroups)
+    total = np.bincount(sorted_codes, weights=arr, minlength=ngroups)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[nonempty] = numer[nonempty] / (counts[nonempty] * total[nonempty])
+    result[counts == 1] = single
+    return result
+
+
+def grouped_gini(values, codes, ngroups=None, single=1.0):
+    """
+    전체 칼럼과 그룹 코드를 받아 모든 그룹의 지니계수를 한 번에 계산
+    groupby().agg(lambda x : gini(x)) 대신 사용, 결과는 그룹 코드 순서
+    """
+    sorted_values, sorted_codes, starts, counts = sort_by_group(values, codes, ngroups)
+    return gini_sorted(sorted_values, sorted_codes, starts, counts, single=single)
+
+
+def grouped_summary(values, codes, ngroups=None, single=1.0):
+    """
+    정렬 버퍼 하나로 그룹별 원소 수(size)와 지니계수를 계산하고, 평균은 같은 그룹 코드로 집계
+    평균은 groupby().mean()과 비트 단위로 같음 : 결측은 제외하고 pandas의 보정 합산을 그대로 사용
+    (bincount 합계는 합산 순서와 방식이 달라 반올림한 값이 달라질 수 있음)
+    """
+    values = np.asarray(values, dtype=np.float64).ravel()
+    codes = np.asarray(codes, dtype=np.int64).ravel()
+    sorted_values, sorted_codes, starts, counts = sort_by_group(values, codes, ngroups)
+    valid = codes >= 0
+    mean = pd.Series(values[valid]).groupby(codes[valid]).mean().reindex(range(counts.shape[0])).to_numpy()
+    gini = gini_sorted(sorted_values, sorted_codes, starts, counts, single=single)
+    return counts, mean, gini
+
+
+# 결과 정렬에서 앞에 둘 시도
+SIDO_ORDER = {'서울특별시' : 1, '경기도': 2}
+
+
+def finish_grouped(grouped, group):
+    """
+    avg_price_year 결과 정리
+    범주형 지역 키를 문자열로 되돌리고, 평균은 소수점 1자리, 지니계수는 4자리로 반올림한 뒤 (년, 시도명순서)로 정렬
+    """
+    for col in group:
+        if isinstance(grouped[col].dtype, pd.CategoricalDtype):
+            grouped[col] = grouped[col].astype(grouped[col].cat.categories.dtype)
+
+    # 소수점
+    avg_cols = ['평균평당거래금액', '평균거래금액']
+    gini_cols = ['거래금액지니계수', '평당거래지니계수']
+    grouped[avg_cols] = grouped[avg_cols].round(1)
+    grouped[gini_cols] = grouped[gini_cols].round(4)
+
+    # 시도명 순서 지정
+    grouped['시도명순서'] = grouped['시도명'].map(SIDO_ORDER).fillna(99).astype(int)
+    return grouped.sort_values(by=['년', '시도명순서']).drop(columns=['시도명순서'])
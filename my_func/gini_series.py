@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+from my_func.gini_kernel import group_codes, gini_sorted, SIDO_ORDER
+
+# 주기별 개월 수 (최근12개월은 월 단위 이동 구간)
+PERIODS = {'월' : 1, '분기' : 3, '년' : 12}
+TRAILING = '최근12개월'
+
+# 값 칼럼별 (평균 칼럼, 지니계수 칼럼) - avg_price_year와 같은 이름
+VALUE_COLS = {
+    '거래금액' : ('평균거래금액', '거래금액지니계수'),
+    '평당거래금액' : ('평균평당거래금액', '평당거래지니계수'),
+}
+
+
+def month_index(dates):
+    """
+    거래일자 → 1970-01부터 센 월 번호
+    """
+    return np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+
+
+def period_label(period, months):
+    """
+    월 번호를 months 단위로 나눈 기간 번호 → 'YYYY-MM', 'YYYYQn', 'YYYY'
+    """
+    period = np.asarray(period, dtype=np.int64)
+    if months == 1:
+        return pd.Index(period.astype('datetime64[M]')).strftime('%Y-%m').to_numpy()
+    if months == 3:
+        return np.char.add(np.char.add((period // 4 + 1970).astype(str), 'Q'), (period % 4 + 1).astype(str))
+    return (period + 1970).astype(str)
+
+
+def rolling_sum(grid, length):
+    """
+    (지역, 월) 격자에서 각 월까지 length개월 합
+    밀어서 더하므로 inf/NaN인 칸은 그 칸을 포함한 구간에만 영향 (누적합 차이는 이후 모든 월로 번짐)
+    """
+    total = np.array(grid, dtype=np.float64)
+    for lag in range(1, length):
+        total[:, lag:] += grid[:, :-lag]
+    return total
+
+
+class RegionSort:
+    """
+    값 칼럼 하나를 (지역, 값) 순으로 한 번만 정렬한 결과
+    주기별 그룹 버퍼는 여기서 정수 기간 코드로 안정 정렬(값 비교 없음)만 해서 만듦
+    """
+    def __init__(self, values, region_codes, months):
+        valid = region_codes >= 0
+        values = np.asarray(values, dtype=np.float64)[valid]
+        region_codes = region_codes[valid]
+        months = months[valid]
+
+        order = np.lexsort((values, region_codes))
+        self.values = values[order]
+        self.regions = region_codes[order]
+        self.months = months[order]
+
+        # 지역 안에서 값이 바뀔 때마다 늘어나는 번호 (전체에서 단조 증가)
+        change = np.ones(self.values.shape[0], dtype=bool)
+        change[1:] = (self.values[1:] != self.values[:-1]) | (self.regions[1:] != self.regions[:-1])
+        self.value_ids = np.cumsum(change) - 1
+
+    def cells(self, periods, n_periods):
+        """
+        (지역, 기간) 칸별로 모이고 칸 안에서는 오름차순인 버퍼
+        """
+        cell = self.regions * n_periods + periods
+        sub = np.argsort(cell, kind='stable')
+        return self.values[sub], cell[sub], self.value_ids[sub]
+
+
+def buffer_stats(sorted_values, sorted_cells, n_cells, single):
+    counts = np.bincount(sorted_cells, minlength=n_cells)
+    starts = np.zeros(n_cells, dtype=np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+    sums = np.bincount(sorted_cells, weights=sorted_values, minlength=n_cells)
+    gini = gini_sorted(sorted_values, sorted_cells, starts, counts, single=single)
+    return counts, starts, sums, gini
+
+
+def trailing_gini(sorted_values, sorted_cells, value_ids, n_regions, n_months, window=12, single=1.0):
+    """
+    월별 버퍼로 window개월 이동 구간의 (거래수, 합계, 지니계수) 계산
+    -----------
+    지니계수 분자 Σ(2i-n-1)x = 구간 안 모든 쌍의 |x-y| 합
+    = 월 내부 쌍의 합 + 서로 다른 두 달 사이 쌍의 합
+    두 달 사이 합은 lag(1 ~ window-1)마다 searchsorted로 한 번에 구하고,
+    구간 합은 (지역, 월) 격자의 rolling_sum으로 계산하므로 구간마다 다시 정렬하지 않음
+    inf/NaN 값은 0으로 두고 계산한 뒤 그 값이 들어간 구간의 지니계수만 NaN (평균은 그 구간만 inf/NaN)
+    -----------
+    """
+    n_cells = n_regions * n_months
+    counts, starts, sums, _ = buffer_stats(sorted_values, sorted_cells, n_cells, single)
+
+    # 누적합은 버퍼 전체에 걸치므로 유한하지 않은 값은 0으로 바꿔서 계산 (그대로 두면 그 뒤의 모든 칸이 NaN)
+    finite = np.isfinite(sorted_values)
+    clean = np.where(finite, sorted_values, 0.0)
+    clean_sums = np.bincount(sorted_cells, weights=clean, minlength=n_cells)
+    csum = np.zeros(sorted_values.shape[0] + 1)
+    np.cumsum(clean, out=csum[1:])
+
+    # 월 내부 쌍의 합
+    rank = np.arange(sorted_values.shape[0]) - starts[sorted_cells]
+    pair_sum = np.bincount(sorted_cells, weights=(2 * rank - counts[sorted_cells] + 1) * clean, minlength=n_cells)
+    numer = rolling_sum(pair_sum.reshape(n_regions, n_months), window)
+
+    # lag개월 전 달과의 쌍의 합 : x보다 작은 값의 개수/합으로 Σ|x-y| 계산
+    n_ids = int(value_ids.max()) + 1 if value_ids.size else 1
+    keys = sorted_cells * n_ids + value_ids
+    month_of = sorted_cells % n_months
+    for lag in range(1, window):
+        ok = month_of >= lag
+        target = sorted_cells[ok] - lag
+        x = clean[ok]
+        pos = np.searchsorted(keys, target * n_ids + value_ids[ok], side='left')
+        lo = starts[target]
+        n_less = pos - lo
+        s_less = csum[pos] - csum[lo]
+        s_rest = clean_sums[target] - s_less
+        cross = x * n_less - s_less + s_rest - x * (counts[target] - n_less)
+        cross = np.bincount(sorted_cells[ok], weights=cross, minlength=n_cells)
+        numer += rolling_sum(cross.reshape(n_regions, n_months), window - lag)
+
+    n = rolling_sum(counts.reshape(n_regions, n_months), window)
+    total = rolling_sum(sums.reshape(n_regions, n_months), window)
+    clean_total = rolling_sum(clean_sums.reshape(n_regions, n_months), window)
+    not_finite = rolling_sum(np.bincount(sorted_cells, weights=~finite, minlength=n_cells).reshape(n_regions, n_months), window) > 0
+
+    # gini()와 같이 음수가 있으면 최솟값만큼 이동, 0.0000001 더하기
+    month_min = np.full(n_cells, np.inf)
+    np.minimum.at(month_min, sorted_cells, np.where(finite, sorted_values, np.inf))
+    month_min = month_min.reshape(n_regions, n_months)
+    window_min = month_min.copy()
+    for lag in range(1, window):
+        window_min[:, lag:] = np.minimum(window_min[:, lag:], month_min[:, :-lag])
+    shift = np.where(window_min < 0, window_min, 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gini = numer / (n * (clean_total - n * shift + n * 0.0000001))
+    gini[n == 1] = single
+    gini[not_finite | (n == 0)] = np.nan
+    return n.astype(np.int64), total, gini
+
+
+def gini_series(df, region_cols, window=12, single=1.0):
+    """
+    지역별 월/분기/년/최근12개월 거래수, 평균, 지니계수
+    값 칼럼마다 (지역, 값) 정렬은 한 번만 하고 모든 주기가 그 결과를 공유
+    결과 칼럼 : 주기, 기간, 지역 칼럼, 거래수, 평균거래금액, 거래금액지니계수, 평균평당거래금액, 평당거래지니계수
+    거래일자가 결측(NaT)인 행은 기간을 정할 수 없으므로 지역 키가 결측인 행과 같이 제외
+    """
+    region_codes, n_regions = group_codes(df, region_cols)
+
+    # 지역 코드 순서의 지역 키
+    _, first = np.unique(region_codes, return_index=True)
+    first = first[region_codes[first] >= 0]
+    region_keys = df[region_cols].iloc[first].reset_index(drop=True)
+    for col in region_cols:
+        if isinstance(region_keys[col].dtype, pd.CategoricalDtype):
+            region_keys[col] = region_keys[col].astype(region_keys[col].cat.categories.dtype)
+
+    dates = df['거래일자']
+    region_codes = np.where(dates.notna().to_numpy(), region_codes, -1)
+    months = month_index(dates)
+    valid = region_codes >= 0
+    first_month = int(months[valid].min())
+
+    sorts = {col : RegionSort(df[col].to_numpy(), region_codes, months) for col in VALUE_COLS}
+    frames = []
+    for period_name, size in list(PERIODS.items()) + [(TRAILING, 1)]:
+        start = first_month // size
+        columns = {}
+        for col, (mean_col, gini_col) in VALUE_COLS.items():
+            rs = sorts[col]
+            periods = rs.months // size - start
+            n_periods = int(periods.max()) + 1 if periods.size else 0
+            sorted_values, sorted_cells, value_ids = rs.cells(periods, n_periods)
+            if period_name == TRAILING:
+                counts, sums, gini = trailing_gini(sorted_values, sorted_cells, value_ids, n_regions, n_periods, window, single)
+                counts, sums, gini = counts.ravel(), sums.ravel(), gini.ravel()
+            else:
+                counts, _, sums, gini = buffer_stats(sorted_values, sorted_cells, n_regions * n_periods, single)
+            occupied = np.flatnonzero(counts > 0)
+            columns['거래수'] = counts[occupied]
+            columns[mean_col] = sums[occupied] / counts[occupied]
+            columns[gini_col] = gini[occupied]
+
+        frame = region_keys.iloc[occupied // n_periods].reset_index(drop=True)
+        frame.insert(0, '기간', period_label(occupied % n_periods + start, size))
+        frame.insert(0, '주기', period_name)
+        for name, values in columns.items():
+            frame[name] = values
+        frames.append(frame[['주기', '기간'] + region_cols + ['거래수', '평균거래금액', '거래금액지니계수', '평균평당거래금액', '평당거래지니계수']])
+
+    result = pd.concat(frames, ignore_index=True)
+    avg_cols = ['평균평당거래금액', '평균거래금액']
+    gini_cols = ['거래금액지니계수', '평당거래지니계수']
+    result[avg_cols] = result[avg_cols].round(1)
+    result[gini_cols] = result[gini_cols].round(4)
+
+    # 주기, 기간, 시도명순서로 정렬 (같은 순서 안에서는 지역 키 순서 유지)
+    result['주기순서'] = result['주기'].map({name : i for i, name in enumerate(list(PERIODS) + [TRAILING])})
+    result['시도명순서'] = result['시도명'].map(SIDO_ORDER).fillna(99).astype(int)
+    result = result.sort_values(by=['주기순서', '기간', '시도명순서'], kind='stable')
+    return result.drop(columns=['주기순서', '시도명순서']).reset_index(drop=True)
@@ -0,0 +1,168 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from my_func.gini_kernel import group_codes
+
+# 0으로 보는 절댓값 (이보다 작으면 0 구간)
+TINY = 0.000001
+
+
+class GiniSketch:
+    """
+    그룹별 로그 구간 히스토그램으로 만든 병합 가능한 분위수 스케치 (DDSketch 방식)
+    -----------
+    값 x는 구간 k = ceil(log_gamma(|x| / TINY)) 에 들어가고, gamma = (1 + alpha) / (1 - alpha)
+    같은 구간의 값은 서로 상대오차 alpha 안에 있으므로 구간별 (개수, 합계, 최솟값)만 유지
+    지니계수 절대오차는 alpha 정도, 거래수와 평균은 정확
+    스케치끼리는 같은 (그룹, 구간)의 개수/합계를 더해서 병합 (청크, 프로세스 사이 병합 가능)
+    -----------
+    table : group 칼럼 + bucket, count, sum, min
+    """
+    def __init__(self, group, alpha=0.01, table=None):
+        self.group = list(group)
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        if table is None:
+            table = pd.DataFrame({col : [] for col in self.group + ['bucket', 'count', 'sum', 'min']})
+        self.table = table
+
+    def buckets(self, values):
+        """
+        값 → 값 순서와 같은 순서의 구간 번호 (음수는 부호를 뒤집은 구간, 0 근처는 0)
+        """
+        values = np.asarray(values, dtype=np.float64)
+        magnitude = np.abs(values)
+        keys = np.zeros(values.shape[0], dtype=np.int64)
+        nonzero = magnitude >= TINY
+        keys[nonzero] = np.ceil(np.log(magnitude[nonzero] / TINY) / np.log(self.gamma)).astype(np.int64) + 1
+        return np.where(values < 0, -keys, keys)
+
+    @classmethod
+    def build(cls, df, group, value_col, alpha=0.01):
+        """
+        데이터프레임 한 조각(청크, 샤드)의 스케치
+        """
+        sketch = cls(group, alpha)
+        codes, _ = group_codes(df, sketch.group)
+        valid = codes >= 0
+        values = df[value_col].to_numpy(dtype=np.float64)[valid]
+        parts = pd.DataFrame({'code' : codes[valid], 'bucket' : sketch.buckets(values), 'value' : values})
+        table = parts.groupby(['code', 'bucket'], sort=False).agg(
+            count = ('value', 'size'),
+            sum = ('value', 'sum'),
+            min = ('value', 'min'),
+            ).reset_index()
+
+        # 그룹 코드 → 그룹 키 값 (다른 조각과 병합할 수 있도록)
+        _, first = np.unique(codes, return_index=True)
+        first = first[codes[first] >= 0]
+        keys = df[sketch.group].iloc[first].reset_index(drop=True)
+        for col in sketch.group:
+            if isinstance(keys[col].dtype, pd.CategoricalDtype):
+                keys[col] = keys[col].astype(keys[col].cat.categories.dtype)
+        table = pd.concat([keys.iloc[table['code'].to_numpy()].reset_index(drop=True), table.drop(columns=['code'])], axis=1)
+        sketch.table = table
+        return sketch
+
+    def merge(self, *others):
+        """
+        여러 스케치를 합친 새 스케치 (alpha와 그룹 칼럼이 같아야 함)
+        """
+        for other in others:
+            if other.alpha != self.alpha or other.group != self.group:
+                raise ValueError("alpha와 그룹 칼럼이 같은 스케치만 병합할 수 있음")
+        table = pd.concat([self.table] + [other.table for other in others], ignore_index=True)
+        table = table.groupby(self.group + ['bucket'], sort=False).agg(
+            count = ('count', 'sum'),
+            sum = ('sum', 'sum'),
+            min = ('min', 'min'),
+            ).reset_index()
+        return GiniSketch(self.group, self.alpha, table)
+
+    def result(self, single=1.0):
+        """
+        그룹별 거래수, 합계, 지니계수
+        구간을 값 순서로 정렬하고 각 구간을 구간 평균값 count개로 보고 지니계수 계산
+        gini()와 같이 음수가 있으면 최솟값만큼 이동, 0.0000001 더하기, 원소가 1개이면 single
+        """
+        table = self.table.sort_values(self.group + ['bucket'], kind='stable', ignore_index=True)
+        gb = table.groupby(self.group, sort=False)
+        count = table['count'].to_numpy(dtype=np.float64)
+        total = gb['count'].transform('sum').to_numpy(dtype=np.float64)
+        before = gb['count'].cumsum().to_numpy(dtype=np.float64) - count
+        after = total - before - count
+
+        # 구간 사이 쌍의 |x-y| 합 = Σ 구간합 × (앞 구간 개수 - 뒤 구간 개수)
+        table['numer'] = table['sum'].to_numpy() * (before - after)
+        grouped = table.groupby(self.group, sort=True).agg(
+            거래수 = ('count', 'sum'),
+            합계 = ('sum', 'sum'),
+            최솟값 = ('min', 'min'),
+            분자 = ('numer', 'sum'),
+            ).reset_index()
+
+        n = grouped['거래수'].to_numpy(dtype=np.float64)
+        shift = np.minimum(grouped['최솟값'].to_numpy(), 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gini = grouped['분자'].to_numpy() / (n * (grouped['합계'].to_numpy() - n * shift + n * 0.0000001))
+        gini[n == 1] = single
+        grouped['지니계수'] = gini
+        grouped['거래수'] = grouped['거래수'].astype(np.int64)
+        return grouped.drop(columns=['최솟값', '분자'])
+
+
+def sketch_groups(sketches, group):
+    """
+    {값 칼럼 : GiniSketch}로 aggregate_groups와 같은 형태의 결과 생성 (finish_grouped 이전)
+    """
+    amount = sketches['거래금액'].result()
+    per_py = sketches['평당거래금액'].result()
+    grouped = amount[group + ['거래수']].copy()
+    grouped['평균거래금액'] = amount['합계'] / amount['거래수']
+    grouped['거래금액지니계수'] = amount['지니계수']
+    grouped['평균평당거래금액'] = per_py['합계'] / per_py['거래수']
+    grouped['평당거래지니계수'] = per_py['지니계수']
+    return grouped
+
+
+if __name__ == "__main__":
+    import time
+    from my_func.gini import aggregate_groups
+    from my_func.gini_kernel import finish_grouped
+
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000000
+    n_chunks = 10
+    group = ['년', '시도명', '시군구명']
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        '년' : rng.integers(2006, 2025, n_rows).astype(np.int16),
+        '시도명' : pd.Categorical(rng.choice(['서울특별시', '경기도', '부산광역시', '대구광역시'], n_rows)),
+        '시군구명' : pd.Categorical(rng.integers(0, 50, n_rows).astype(str)),
+        '거래금액' : rng.lognormal(10, 0.6, n_rows).round().astype(np.int32),
+    })
+    df['평당거래금액'] = (df['거래금액'] / rng.uniform(30, 150, n_rows) * 3.30579).round(2)
+    print(f"synthetic table : {df.shape}")
+
+    start = time.perf_counter()
+    exact = finish_grouped(aggregate_groups(df, group), group)
+    exact_time = time.perf_counter() - start
+
+    for alpha in [0.05, 0.01, 0.001]:
+        start = time.perf_counter()
+        chunks = np.array_split(np.arange(n_rows), n_chunks)
+        sketches = {}
+        for col in ['거래금액', '평당거래금액']:
+            parts = [GiniSketch.build(df.iloc[idx], group, col, alpha) for idx in chunks]
+            sketches[col] = parts[0].merge(*parts[1:])
+        approx = finish_grouped(sketch_groups(sketches, group), group)
+        approx_time = time.perf_counter() - start
+
+        merged = exact.merge(approx, on = group, suffixes = ('', '_approx'))
+        assert len(merged) == len(exact) and (merged['거래수'] == merged['거래수_approx']).all()
+        errors = [(merged[col] - merged[f"{col}_approx"]).abs().max() for col in ['거래금액지니계수', '평당거래지니계수']]
+        bucket_rows = len(sketches['거래금액'].table)
+        print(f"alpha {alpha} : {approx_time:.2f}s (exact {exact_time:.2f}s), "
+              f"max gini error {max(errors):.4f}, {bucket_rows:,} buckets for {n_rows:,} rows")
@@ -0,0 +1,300 @@
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from my_func.gini_kernel import sort_by_group, gini_sorted, finish_grouped
+
+# 그룹별 상태를 유지하는 값 칼럼
+VALUE_COLS = ['거래금액', '평당거래금액']
+
+# 년도 파일 형식이 바뀌면 올림 (state.json의 format이 다르면 모든 년도를 다시 계산)
+STORE_FORMAT = 2
+
+
+def group_means(values, codes, ngroups):
+    """
+    그룹별 평균, groupby().mean()과 같은 보정 합산을 같은 순서(원본 행 순서)로 하므로 전체 재계산과 비트 단위로 같음
+    (정렬 순서나 bincount로 더하면 반올림한 평균이 달라질 수 있음, gini_kernel.grouped_summary 참고)
+    """
+    means = np.full(ngroups, np.nan)
+    if values.size:
+        mean = pd.Series(values).groupby(codes).mean()
+        means[mean.index.to_numpy()] = mean.to_numpy()
+    return means
+
+
+class YearState:
+    """
+    (data_type, 지역 단위, 년) 하나의 그룹별 상태
+    -----------
+    keys : 지역 키 데이터프레임 (정렬된 그룹 순서)
+    counts : 그룹별 원소 수
+    buffers[col] : 그룹 순서로 모이고 그룹 안에서 오름차순인 값 (지니계수용)
+    values[col] : 그룹 순서로 모이고 그룹 안에서는 원본 행 순서인 값 (평균용, 원래 dtype)
+    means[col], ginis[col] : 그룹별 평균과 지니계수
+    -----------
+    """
+    def __init__(self, keys, counts, buffers, values, means, ginis):
+        self.keys = keys
+        self.counts = counts
+        self.buffers = buffers
+        self.values = values
+        self.means = means
+        self.ginis = ginis
+
+    @classmethod
+    def empty(cls, key_cols):
+        keys = pd.DataFrame({col : pd.Series([], dtype=object) for col in key_cols})
+        zeros = np.zeros(0)
+        return cls(keys, np.zeros(0, dtype=np.int64),
+                   {col : zeros for col in VALUE_COLS},
+                   {col : zeros for col in VALUE_COLS},
+                   {col : zeros for col in VALUE_COLS},
+                   {col : zeros for col in VALUE_COLS})
+
+    @property
+    def starts(self):
+        starts = np.zeros(self.counts.shape[0], dtype=np.int64)
+        np.cumsum(self.counts[:-1], out=starts[1:])
+        return starts
+
+    def update(self, new_keys, new_values):
+        """
+        새 행(new_keys, new_values[col])을 더해서 새 YearState를 돌려줌
+        새 행이 들어간 그룹만 다시 정렬하고 평균/지니계수를 계산
+        새 행은 기존 행보다 ROWID가 큰 행이어야 함 (그룹 안에서 기존 값 뒤에 붙여서 원본 행 순서 유지)
+        """
+        key_cols = list(self.keys.columns)
+        old_index = pd.MultiIndex.from_frame(self.keys)
+        new_index = pd.MultiIndex.from_frame(new_keys)
+
+        # 기존 그룹과 새 그룹을 합쳐서 정렬한 그룹 순서 (groupby(sort=True)와 같음)
+        union = pd.MultiIndex.from_frame(
+            pd.concat([self.keys, new_keys.drop_duplicates()], ignore_index=True)
+            .drop_duplicates().sort_values(key_cols))
+        ngroups = len(union)
+        old_to_union = union.get_indexer(old_index)
+        row_codes = union.get_indexer(new_index)
+
+        counts = np.zeros(ngroups, dtype=np.int64)
+        counts[old_to_union] = self.counts
+        touched = np.zeros(ngroups, dtype=bool)
+        touched[row_codes] = True
+        counts += np.bincount(row_codes, minlength=ngroups)
+
+        # 기존 버퍼 원소의 새 그룹 코드, 건드린 그룹의 원소만 다시 정렬
+        old_codes = np.repeat(old_to_union, self.counts)
+        old_touched = touched[old_codes]
+
+        buffers, raw_values, means, ginis = {}, {}, {}, {}
+        for col in VALUE_COLS:
+            new = np.asarray(new_values[col])
+
+            # 원본 행 순서 버퍼 : 그룹 코드로 안정 정렬하면 그룹 안에서 기존 값, 새 값 순서가 유지됨
+            old_raw = self.values[col]
+            raw = np.concatenate([old_raw, new]) if old_raw.size else new
+            raw_codes = np.concatenate([old_codes, row_codes])
+            raw_values[col] = raw[np.argsort(raw_codes, kind='stable')]
+            raw_touched = touched[raw_codes]
+            sub_means = group_means(raw[raw_touched], raw_codes[raw_touched], ngroups)
+
+            old_buffer = self.buffers[col]
+            values = np.concatenate([old_buffer[old_touched], new.astype(np.float64)])
+            codes = np.concatenate([old_codes[old_touched], row_codes])
+
+            # 건드린 그룹만 (그룹, 값)으로 정렬
+            sorted_values, sorted_codes, starts, sub_counts = sort_by_group(values, codes, ngroups)
+            sub_ginis = gini_sorted(sorted_values, sorted_codes, starts, sub_counts)
+
+            # 건드리지 않은 그룹의 원소와 합쳐서 그룹 순서로 재배치 (그룹 안의 순서는 유지)
+            merged_values = np.concatenate([old_buffer[~old_touched], sorted_values])
+            merged_codes = np.concatenate([old_codes[~old_touched], sorted_codes])
+            buffers[col] = merged_values[np.argsort(merged_codes, kind='stable')]
+
+            means[col] = np.full(ngroups, np.nan)
+            ginis[col] = np.full(ngroups, np.nan)
+            means[col][old_to_union] = self.means[col]
+            ginis[col][old_to_union] = self.ginis[col]
+            means[col][touched] = sub_means[touched]
+            ginis[col][touched] = sub_ginis[touched]
+
+        return YearState(union.to_frame(index=False), counts, buffers, raw_values, means, ginis)
+
+    def save(self, path):
+        arrays = {f"key_{i}" : self.keys[col].astype(str).to_numpy(dtype=str) for i, col in enumerate(self.keys.columns)}
+        arrays['counts'] = self.counts
+        for i, col in enumerate(VALUE_COLS):
+            arrays[f"buffer_{i}"] = self.buffers[col]
+            arrays[f"value_{i}"] = self.values[col]
+            arrays[f"mean_{i}"] = self.means[col]
+            arrays[f"gini_{i}"] = self.ginis[col]
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, key_cols):
+        with np.load(path) as data:
+            keys = pd.DataFrame({col : data[f"key_{i}"].astype(object) for i, col in enumerate(key_cols)})
+            buffers = {col : data[f"buffer_{i}"] for i, col in enumerate(VALUE_COLS)}
+            values = {col : data[f"value_{i}"] for i, col in enumerate(VALUE_COLS)}
+            means = {col : data[f"mean_{i}"] for i, col in enumerate(VALUE_COLS)}
+            ginis = {col : data[f"gini_{i}"] for i, col in enumerate(VALUE_COLS)}
+            return cls(keys, data['counts'], buffers, values, means, ginis)
+
+
+class GiniStore:
+    """
+    지역×년 평균/지니계수의 증분 저장소
+    {root}/{data_type}/{region}/CURRENT 가 가리키는 버전 디렉터리 v{n}에
+    년도별 YearState({년}.npz)와 state.json(반영한 최대 ROWID, 원본의 년도별 행 수)을 함께 저장
+    갱신할 때는 새 버전 디렉터리를 다 만든 뒤 CURRENT만 교체하므로 중간에 멈춰도 이전 버전이 그대로 남음
+    새 달 데이터가 들어오면 해당 년도 파일만 읽어서 새 행이 들어간 그룹만 다시 계산하고,
+    삭제/교체로 원본 행 수가 줄어든 년도는 처음부터 다시 계산 (stale_years)
+    """
+    def __init__(self, root, data_type, region, group):
+        self.dir = os.path.join(root, data_type, region)
+        self.group = group
+        self.key_cols = [col for col in group if col != '년']
+        os.makedirs(self.dir, exist_ok=True)
+
+    @property
+    def current_dir(self):
+        """
+        현재 버전 디렉터리 (CURRENT가 없으면 버전 디렉터리 이전 형식인 self.dir)
+        """
+        pointer = os.path.join(self.dir, 'CURRENT')
+        if not os.path.exists(pointer):
+            return self.dir
+        with open(pointer) as f:
+            return os.path.join(self.dir, f.read().strip())
+
+    def year_path(self, year, directory=None):
+        return os.path.join(directory or self.current_dir, f"{int(year)}.npz")
+
+    @property
+    def state_path(self):
+        return os.path.join(self.current_dir, 'state.json')
+
+    def state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    @property
+    def max_rowid(self):
+        """
+        저장소에 반영된 원본 테이블의 최대 ROWID (없으면 0)
+        """
+        return self.state().get('max_rowid', 0)
+
+    def years(self):
+        return sorted(int(name[:-4]) for name in os.listdir(self.current_dir) if name.endswith('.npz'))
+
+    def load_year(self, year):
+        path = self.year_path(year)
+        if os.path.exists(path):
+            return YearState.load(path, self.key_cols)
+        return YearState.empty(self.key_cols)
+
+    def stale_years(self, counts):
+        """
+        counts : 지금 원본 테이블에서 ROWID가 저장소의 max_rowid 이하인 행의 {년 : 행 수}
+        마지막 갱신 때 기록한 행 수와 다른 년도 (그 사이 행이 삭제되거나 다른 ROWID로 교체됨)
+        ROWID는 늘어나기만 하므로 삭제가 있었던 년도는 반드시 행 수가 줄어듦
+        행 수 기록이 없거나 년도 파일 형식(STORE_FORMAT)이 다른 이전 형식이면 저장된 년도 전부
+        """
+        if self.max_rowid == 0:
+            return []
+        recorded = self.state().get('source_counts')
+        if recorded is None or self.state().get('format') != STORE_FORMAT:
+            return sorted(set(self.years()) | set(counts))
+        recorded = {int(year) : n for year, n in recorded.items()}
+        return sorted(year for year in set(recorded) | set(counts) if recorded.get(year, 0) != counts.get(year, 0))
+
+    def update(self, df, max_rowid=None, source_counts=None, rebuild=()):
+        """
+        새 행만 담긴 df로 저장소 갱신, 새 행이 있는 년도만 읽고 씀
+        rebuild의 년도는 기존 상태를 버리고 df의 행(그 년도 전체 행)으로 다시 만듦
+        source_counts : ROWID가 max_rowid 이하인 원본 행의 {년 : 행 수} (다음 갱신 때 stale_years에서 비교)
+        지역 키가 결측인 행은 groupby와 같이 제외
+        """
+        current = self.current_dir
+        state = self.state()
+        rebuild = {int(year) for year in rebuild}
+        self.cleanup(current)
+        staging = tempfile.mkdtemp(prefix='.tmp_', dir=self.dir)
+
+        df = df.dropna(subset=self.group)
+        updated = set()
+        for year, part in df.groupby('년', sort=True):
+            year = int(year)
+            keys = part[self.key_cols].astype(str).reset_index(drop=True)
+            values = {col : part[col].to_numpy() for col in VALUE_COLS}
+            base = YearState.empty(self.key_cols) if year in rebuild else self.load_year(year)
+            base.update(keys, values).save(self.year_path(year, staging))
+            updated.add(year)
+
+        # 바뀌지 않은 년도는 이전 버전 파일을 하드링크 (다시 계산한 년도에 남은 행이 없으면 파일도 없음)
+        for year in self.years():
+            if year in updated or year in rebuild:
+                continue
+            try:
+                os.link(self.year_path(year, current), self.year_path(year, staging))
+            except OSError:
+                shutil.copy2(self.year_path(year, current), self.year_path(year, staging))
+
+        if max_rowid is not None:
+            state = {'max_rowid' : int(max_rowid), 'format' : STORE_FORMAT}
+            # 행 수 없이 ROWID만 옮기면 삭제를 감지할 수 없으므로 기록을 비워서 다음에 전체 재계산
+            if source_counts is not None:
+                state['source_counts'] = {str(int(year)) : int(n) for year, n in source_counts.items()}
+        with open(os.path.join(staging, 'state.json'), 'w') as f:
+            json.dump(state, f)
+
+        # 새 버전 디렉터리 이름을 정한 뒤 CURRENT 교체가 커밋 지점
+        name = f"v{int(os.path.basename(current)[1:]) + 1}" if current != self.dir else 'v1'
+        os.rename(staging, os.path.join(self.dir, name))
+        pointer = os.path.join(self.dir, 'CURRENT')
+        with open(pointer + '.tmp', 'w') as f:
+            f.write(name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer + '.tmp', pointer)
+        self.cleanup(os.path.join(self.dir, name))
+
+    def cleanup(self, keep):
+        """
+        keep 이외의 버전 디렉터리, 중단된 임시 디렉터리, 이전 형식 파일 삭제
+        """
+        for name in os.listdir(self.dir):
+            path = os.path.join(self.dir, name)
+            if path == keep or name in ('CURRENT', 'CURRENT.tmp'):
+                continue
+            if os.path.isdir(path) and (name.startswith('.tmp_') or name[:1] == 'v' and name[1:].isdigit()):
+                shutil.rmtree(path)
+            elif keep != self.dir and (name.endswith('.npz') or name == 'state.json'):
+                os.remove(path)
+
+    def result(self, years=None):
+        """
+        저장된 상태로 avg_price_year와 같은 형태의 결과 생성
+        """
+        frames = []
+        for year in self.years() if years is None else years:
+            state = self.load_year(year)
+            mean = state.means
+            frame = state.keys.copy()
+            frame.insert(0, '년', year)
+            frame['거래수'] = state.counts
+            frame['평균거래금액'] = mean['거래금액']
+            frame['거래금액지니계수'] = state.ginis['거래금액']
+            frame['평균평당거래금액'] = mean['평당거래금액']
+            frame['평당거래지니계수'] = state.ginis['평당거래금액']
+            frames.append(frame)
+        grouped = pd.concat(frames, ignore_index=True)
+        return finish_grouped(grouped, self.group)
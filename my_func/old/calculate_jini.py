@@ -1,6 +1,13 @@
 import pandas as pd
 import numpy as np
 from sqlalchemy import create_engine, text
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from my_func.gini_kernel import group_codes, grouped_gini, grouped_summary
+from my_func.region_index import region_index
+from my_func.parse import parse_int_column, parse_float_column, assemble_date
 
 class RealEstateDataAnalyzer:
     def __init__(self, db_path):
@@ -10,10 +17,8 @@ class RealEstateDataAnalyzer:
             'apt_coded' :'행정동코드'
         }
 
-        with self.engine.connect() as conn:
-            code = pd.read_sql_query(text(f"SELECT * FROM conn_code"), conn)
-            unique_conn_code = code.drop_duplicates(subset=['행정동코드'])
-            self.code = unique_conn_code 
+        # conn_code 색인은 프로세스마다 한 번만 생성
+        self.region_index = region_index(self.engine)
     
     def load_data(self, table_name):
         with self.engine.connect() as conn:
@@ -26,14 +31,14 @@ class RealEstateDataAnalyzer:
     
     def preprocess_data(self, df, code_column):
         # '거래금액' 열의 쉼표 제거 및 숫자형으로 변환
-        df['거래금액'] = df['거래금액'].str.replace(',', '').astype(int)
-        df['전용면적'] = df['전용면적'].astype(float)
+        df['거래금액'] = parse_int_column(df['거래금액'])
+        df['전용면적'] = parse_float_column(df['전용면적'])
 
         # 평당금액 칼럼 신설
         df['평당거래금액'] = round(df['거래금액']/df['전용면적'] * 3.306, 2) # 1 평 = 3.306 제곱미터
 
         # 년, 월 칼럼을 날짜 형식으로 통합
-        df['연월'] = pd.to_datetime(df['년'] + '-' + df['월'] + '-01')
+        df['연월'] = assemble_date(parse_int_column(df['년'], fill=None), parse_int_column(df['월'], fill=None), np.ones(len(df), dtype=np.int64))
 
         # 칼럼 이름을 통일
         df.rename(columns={code_column: '행정동코드'}, inplace=True)
@@ -48,24 +53,10 @@ class RealEstateDataAnalyzer:
         return avg_prices
     
     def calculate_gini_coefficient(self, df, col_name):
-        def gini(arr):
-            # 모든 값을 동일하게 처리하고 배열을 1차원으로 변환:
-            arr = np.array(arr, dtype=np.float64)
-            if np.amin(arr) < 0:
-                # 값이 음수일 수 없음:
-                arr -= np.amin(arr)
-            # 값이 0일 수 없음:
-            arr += 0.0000001
-            # 값을 정렬:
-            arr = np.sort(arr)
-            # 배열 요소당 인덱스:
-            index = np.arange(1, arr.shape[0] + 1)
-            # 배열 요소 수:
-            n = arr.shape[0]
-            # 지니계수:
-            return ((np.sum((2 * index - n - 1) * arr)) / (n * np.sum(arr)))
-        
-        gini_by_region_and_month = df.groupby(['행정동코드', '년'])[col_name].apply(gini).reset_index()
+        # 한 번의 정렬로 모든 그룹의 지니계수 계산 (원소가 1개인 그룹은 0)
+        gini_by_region_and_month = df.groupby(['행정동코드', '년']).size().reset_index(name=col_name)
+        codes, ngroups = group_codes(df, ['행정동코드', '년'])
+        gini_by_region_and_month[col_name] = grouped_gini(df[col_name].to_numpy(), codes, ngroups, single=0.0)
         if col_name == "거래금액" :
             gini_by_region_and_month.rename(columns={col_name: '지니계수_거래금액'}, inplace=True)
             gini_by_region_and_month['지니계수_거래금액'] = gini_by_region_and_month['지니계수_거래금액'].round(3)
@@ -78,6 +69,67 @@ class RealEstateDataAnalyzer:
     def calculate_transaction_count(self, df):
         return df.groupby(['행정동코드', '년']).size().reset_index(name='거래수')
     
+    def aggregate_metrics(self, df):
+        """
+        (행정동코드, 년) 그룹을 한 번만 코드로 만들고 평균/지니계수/거래수를 한 번에 계산
+        calculate_* 다섯 개와 merge 네 번을 한 것과 같은 칼럼 구성
+        """
+        keys = ['행정동코드', '년']
+        codes, ngroups = group_codes(df, keys)
+
+        # 그룹 코드 순서대로 각 그룹의 첫 행에서 키 값을 가져옴
+        _, first = np.unique(codes, return_index = True)
+        first = first[codes[first] >= 0]
+        combined = df[keys].iloc[first].reset_index(drop = True)
+
+        count, mean, gini = grouped_summary(df['거래금액'].to_numpy(), codes, ngroups, single = 0.0)
+        _, mean_py, gini_py = grouped_summary(df['평당거래금액'].to_numpy(), codes, ngroups, single = 0.0)
+
+        combined['평균거래금액'] = mean.round(1)
+        combined['지니계수_거래금액'] = gini.round(3)
+        combined['평균평당거래금액'] = mean_py.round(1)
+        combined['지니계수_평당거래금액'] = gini_py.round(3)
+        combined['거래수'] = count
+        return combined
+
+    def legacy_metrics(self, df):
+        """
+        그룹별 계산을 따로 하고 merge로 합치는 기존 방식 (벤치마크 비교용)
+        """
+        avg_prices = self.calculate_average_price_by_region_and_month(df,'거래금액')
+        avg_prices_per_py = self.calculate_average_price_by_region_and_month(df, '평당거래금액')
+        gini_coefficients = self.calculate_gini_coefficient(df, col_name = '거래금액')
+        gini_coefficients_per_py = self.calculate_gini_coefficient(df, col_name = '평당거래금액')
+        transaction_counts = self.calculate_transaction_count(df)
+
+        combined = pd.merge(avg_prices, gini_coefficients, on=['행정동코드', '년'])
+        combined = pd.merge(combined, avg_prices_per_py, on=['행정동코드', '년'])
+        combined = pd.merge(combined, gini_coefficients_per_py, on=['행정동코드', '년'])
+        combined = pd.merge(combined, transaction_counts, on=['행정동코드', '년'])
+        return combined
+
+    def benchmark(self, table_name = 'apt_coded', repeat = 3):
+        """
+        aggregate_metrics와 legacy_metrics의 시간 비교, 반올림한 결과가 정확히 같은지 확인
+        """
+        import time
+        df = self.preprocess_data(self.load_data(table_name), self.column_mapping[table_name])
+
+        def best(func):
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = func(df)
+                times.append(time.perf_counter() - start)
+            return min(times), result
+
+        fast_time, fast = best(self.aggregate_metrics)
+        legacy_time, legacy = best(self.legacy_metrics)
+        pd.testing.assert_frame_equal(fast, legacy[fast.columns], check_dtype = False, check_exact = True)
+        print(f"{table_name} {df.shape} : {len(fast)} groups")
+        print(f"legacy : {legacy_time:.2f}s")
+        print(f"single pass : {fast_time:.2f}s ({legacy_time / fast_time:.1f}x)")
+
     def process_all_types(self):
         results = {}
         
@@ -93,28 +145,11 @@ class RealEstateDataAnalyzer:
              # Filter data to include only records before 2024-04
             #df = df[df['연월'] < '2024-05-01']
 
-            avg_prices = self.calculate_average_price_by_region_and_month(df,'거래금액')
-            avg_prices_per_py = self.calculate_average_price_by_region_and_month(df, '평당거래금액')
-            gini_coefficients = self.calculate_gini_coefficient(df, col_name = '거래금액')
-            gini_coefficients_per_py = self.calculate_gini_coefficient(df, col_name = '평당거래금액')
-            transaction_counts = self.calculate_transaction_count(df)
-
-            combined = pd.merge(avg_prices, gini_coefficients, on=['행정동코드', '년'])
-            combined = pd.merge(combined, avg_prices_per_py, on=['행정동코드', '년'])
-            combined = pd.merge(combined, gini_coefficients_per_py, on=['행정동코드', '년'])
-            combined = pd.merge(combined, transaction_counts, on=['행정동코드', '년'])
-            combined = pd.merge(combined, self.code[["행정동코드", '읍면동명']], on=['행정동코드'])
-            
-
-            # Merge with code_df to get the 시군구명
-            ##combined = pd.merge(combined, code_df, left_on='행정동코드', right_on='시군구코드', how='left')
-            ##combined.drop(columns=['시군구코드'], inplace=True)
-
-            # Rename columns
-            combined.rename(columns={'거래금액': '평균거래금액'}, inplace=True)
-            # Format '연월' to 'YYYY-MM'
-            #combined['연월'] = combined['연월'].dt.strftime('%Y-%m')
+            combined = self.aggregate_metrics(df)
 
+            # 행정동코드로 읍면동명 조회, conn_code에 없는 코드는 제외 (inner merge와 같음)
+            found = self.region_index.enrich(combined, '행정동코드', '행정동코드', names = ['읍면동명'])
+            combined = combined[found]
 
             # Reorder columns to have 법정동코드 and 시군구명 first
             columns_order = ['행정동코드', '읍면동명', '거래수'] + [col for col in combined.columns if col not in ['행정동코드', '읍면동명', '거래수']]
@@ -157,5 +192,8 @@ def main():
         print(stats)
 
 if __name__ == "__main__":
-    main()
+    if '--bench' in sys.argv:
+        RealEstateDataAnalyzer('/Users/hj/Dropbox/real_estate/data/api/db/RealEstate.db').benchmark()
+    else:
+        main()
 
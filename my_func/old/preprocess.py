@@ -2,6 +2,7 @@ import sys
 import os
 
 sys.path.append('/Users/hj/Dropbox/real_estate/model/my_func')
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from sqlalchemy import create_engine, inspect
 from sqlalchemy.sql import text
 import api
@@ -12,6 +13,10 @@ import numpy as np
 import seaborn as sns
 from matplotlib import rc
 import time
+from my_func.fingerprint import drop_duplicate_rows
+from my_func.gini_kernel import group_codes
+from my_func.sampling import sample_table
+from my_func.parse import parse_int_column, assemble_date
 
 
 # 한글 폰트 설정
@@ -79,18 +84,19 @@ def column_list(table_name):
 #column_list('apt_raw')
 
 
-def preprocess(table):
-    query = f"SELECT * FROM {table} ORDER BY RANDOM() LIMIT 2000000"
-    df = pd.read_sql(query, engine)
+def preprocess(table, n = 2000000, seed = 0, stratify = False):
+    # ORDER BY RANDOM() 전체 정렬 대신 seed로 재현 가능한 표본 (stratify이면 광역시, 거래년 비례 층화)
+    df = sample_table(engine, table, n, seed = seed, stratify = stratify)
 
     # 년, 월, 일 칼럼을 문자열로 변환 후 합쳐서 거래일자 칼럼 생성
-    df['거래일자'] = pd.to_datetime(df['년'].astype(str) + '-' + df['월'].astype(str) + '-' + df['일'].astype(str))
+    df['거래일자'] = pd.to_datetime(assemble_date(parse_int_column(df['년'], fill=None), parse_int_column(df['월'], fill=None), parse_int_column(df['일'], fill=None)))
     df['거래월'] = df['거래일자'].dt.to_period('M')
     df['거래년'] = df['거래일자'].dt.year
     
-    # 전용면적과 거래금액을 숫자형으로 변환
-    df['전용면적'] = pd.to_numeric(df['전용면적'].str.replace(',', ''), errors='coerce')
-    df['거래금액'] = pd.to_numeric(df['거래금액'].str.replace(',', ''), errors='coerce')
+    # 전용면적과 거래금액을 숫자형으로 변환 (타입이 있는 raw 테이블이면 그대로)
+    for col in ['전용면적', '거래금액'] :
+        if not pd.api.types.is_numeric_dtype(df[col].dtype) :
+            df[col] = pd.to_numeric(df[col].str.replace(',', ''), errors='coerce')
     
     # 평당금액 칼럼 생성
     df['평당금액'] = df['거래금액'] / df['전용면적']
@@ -143,15 +149,12 @@ def remove_same_row(df, col_list):
     # 중복 제거 전 데이터프레임의 길이
     initial_count = len(df)
     
-    # 중복 데이터 제거
+    # 중복 데이터 제거 (행 지문 기준)
     col_list = ['거래일자', '지역코드', '거래금액', '전용면적']
-    df = df.drop_duplicates(subset=col_list)
+    df, duplicates_removed = drop_duplicate_rows(df, col_list)
     
     # 중복 제거 후 데이터프레임의 길이
     final_count = len(df)
-    
-    # 제거된 중복 데이터의 수
-    duplicates_removed = initial_count - final_count
     print(f"제거된 중복 데이터 수: {duplicates_removed}, {initial_count}개에서 {final_count}개로")
     return df
 
@@ -190,42 +193,82 @@ def remove_outliers_using_log_iqr(group, column):
     return filtered_group, round(original_lower_bound), round(original_upper_bound)
 
 
-def remove_outliers(table):
+def grouped_outlier_bounds(df, group_cols, column, log = True):
+    """
+    그룹별 IQR(log이면 log1p 스케일) 경계를 한 번의 grouped quantile로 계산하고 행마다 펼침
+    -----------
+    codes : 행별 그룹 코드 (groupby(sort=True) 순서, 키가 결측이면 -1)
+    keep : 경계 안에 있어서 남는 행 (log이면 0 이하도 제거)
+    bounds : 그룹별 lower_bound, upper_bound (log이면 원래 스케일)
+    -----------
+    """
+    codes, ngroups = group_codes(df, group_cols)
+    values = df[column]
+    if log :
+        valid = (values > 0).to_numpy()
+        scaled = np.log1p(values.where(values > 0)).to_numpy(dtype = float)
+    else :
+        valid = np.ones(len(df), dtype = bool)
+        scaled = values.to_numpy(dtype = float)
+
+    in_group = codes >= 0
+    quantiles = pd.Series(scaled[in_group]).groupby(codes[in_group]).quantile([0.25, 0.75]).unstack()
+    quantiles = quantiles.reindex(range(ngroups))
+    q1 = quantiles[0.25].to_numpy()
+    q3 = quantiles[0.75].to_numpy()
+    iqr = q3 - q1
+    lower = q1 - 1.5 * iqr
+    upper = q3 + 1.5 * iqr
+
+    # 그룹 경계를 행으로 펼쳐서 마스크 하나로 필터링
+    row_lower = np.full(len(df), np.nan)
+    row_upper = np.full(len(df), np.nan)
+    row_lower[in_group] = lower[codes[in_group]]
+    row_upper[in_group] = upper[codes[in_group]]
+    keep = in_group & valid & (scaled >= row_lower) & (scaled <= row_upper)
+
+    bounds = pd.DataFrame({'lower_bound' : lower, 'upper_bound' : upper})
+    if log :
+        # 기존 루프의 round()와 같이 원래 스케일 경계는 정수 (경계가 없는 그룹이 있으면 nullable 정수)
+        bounds = np.round(np.expm1(bounds))
+        bounds = bounds.astype('Int64' if bounds.isna().any().any() else np.int64)
+    return codes, keep, bounds
+
+
+def remove_outliers_grouped(df, group_cols, column, log = True):
+    """
+    remove_outliers_using_iqr / remove_outliers_using_log_iqr를 그룹마다 반복하고 concat한 것과 같은 결과
+    (filtered_df, outlier_counts_df)를 반환하며 filtered_df는 그룹 순서로 정렬
+    """
+    codes, keep, bounds = grouped_outlier_bounds(df, group_cols, column, log = log)
+    in_group = codes >= 0
+    ngroups = len(bounds)
+
+    initial = np.bincount(codes[in_group], minlength = ngroups)
+    final = np.bincount(codes[keep], minlength = ngroups)
+
+    # 그룹 키 (그룹 코드 순서)
+    _, first = np.unique(codes, return_index = True)
+    first = first[codes[first] >= 0]
+    outlier_counts_df = df[group_cols].iloc[first].reset_index(drop = True)
+    outlier_counts_df['아웃라이어 수'] = initial - final
+    outlier_counts_df = pd.concat([outlier_counts_df, bounds], axis = 1)
+
+    # 남는 행을 그룹 순서로 (그룹 안에서는 원래 순서)
+    kept = np.flatnonzero(keep)
+    kept = kept[np.argsort(codes[kept], kind = 'stable')]
+    filtered_df = df.iloc[kept].reset_index(drop = True)
+    return filtered_df, outlier_counts_df
+
+
+def remove_outliers(table, log = True):
     df = preprocess(table)
-    
-    # 그룹별로 아웃라이어 제거
-    grouped = df.groupby(['광역시', '거래년'])
-
-    # 아웃라이어를 제거한 데이터프레임과 제거된 아웃라이어 수를 기록할 데이터프레임 생성
-    filtered_df = pd.DataFrame()
-    outlier_counts = []
-    total_outliers_removed = 0
-
-    for name, group in grouped:
-        initial_count = len(group)
-        group_no_outliers, lower_bound, upper_bound = remove_outliers_using_log_iqr(group, '평당금액')
-        final_count = len(group_no_outliers)
-        outliers_removed = initial_count - final_count
-        
-        # 그룹별 아웃라이어 수 및 경계값 기록
-        outlier_counts.append({
-            '광역시': name[0], 
-            '거래년': name[1], 
-
-            '아웃라이어 수': outliers_removed,
-            'lower_bound': lower_bound,
-            'upper_bound': upper_bound
-        })
-        
-        # 총 제거된 아웃라이어 수 갱신
-        total_outliers_removed += outliers_removed
-        
-        filtered_df = pd.concat([filtered_df, group_no_outliers], ignore_index=True)
-    
-    # 제거된 아웃라이어 수를 담은 데이터프레임 생성
-    outlier_counts_df = pd.DataFrame(outlier_counts)
+
+    # (광역시, 거래년) 그룹별 경계를 한 번에 계산해서 아웃라이어 제거
+    filtered_df, outlier_counts_df = remove_outliers_grouped(df, ['광역시', '거래년'], '평당금액', log = log)
 
     # 총 제거된 아웃라이어 수 출력
+    total_outliers_removed = int(outlier_counts_df['아웃라이어 수'].sum())
     print(f"제거된 총 아웃라이어 수: {total_outliers_removed}")
 
     return filtered_df, outlier_counts_df
@@ -1,10 +1,22 @@
 import pandas as pd
 import numpy as np
 from sqlalchemy import create_engine, text
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from my_func.gini_kernel import group_codes, grouped_gini
+from my_func.parse import parse_int_column, assemble_date
+from my_func.window_load import iter_window
 
 class RealEstateDataAnalyzer:
-    def __init__(self, db_path):
+    def __init__(self, db_path, start=None, end='2024-04', max_rows=1000000):
         self.db_path = db_path
+        # 분석할 년월 구간 (양 끝 포함, None은 제한 없음)
+        self.start = start
+        self.end = end
+        # 구간 안에서 최근 년월부터 최대 행 수 (None이면 구간 전체, 메모리 사용량 제한)
+        self.max_rows = max_rows
         self.engine = create_engine(f"sqlite:///{db_path}")
         self.column_mapping = {
             'apt_raw': '법정동시군구코드',
@@ -13,17 +25,25 @@ class RealEstateDataAnalyzer:
             'commerical_raw': '지역코드'
         }
     
-    def load_data(self, table_name):
-        with self.engine.connect() as conn:
-            query = text(f"SELECT * FROM {table_name} ORDER BY ROWID DESC LIMIT 1000000")
-            df = pd.read_sql_query(query, conn)
-        return df
+    def load_data(self, table_name, start=None, end=None, chunksize=200000):
+        # 년월 구간을 SQL 조건(년월 식 인덱스)으로 넘기고 최근 년월부터 keyset 커서로 나누어 읽기
+        # max_rows개를 채우면 멈춤 (이전의 최근 1,000,000행 제한과 같은 역할)
+        start = self.start if start is None else start
+        end = self.end if end is None else end
+        chunks, n_rows = [], 0
+        for chunk in iter_window(self.engine, table_name, start=start, end=end, chunksize=chunksize, descending=True):
+            if self.max_rows is not None and n_rows + len(chunk) >= self.max_rows:
+                chunks.append(chunk.iloc[:self.max_rows - n_rows])
+                break
+            chunks.append(chunk)
+            n_rows += len(chunk)
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
     
     def preprocess_data(self, df, code_column):
-        # '거래금액' 열의 쉼표 제거 및 숫자형으로 변환
-        df['거래금액'] = df['거래금액'].str.replace(',', '').astype(int)
+        # '거래금액' 열의 쉼표 제거 및 숫자형으로 변환 (INTEGER 칼럼이면 그대로)
+        df['거래금액'] = parse_int_column(df['거래금액'])
         # 년, 월 칼럼을 날짜 형식으로 통합
-        df['연월'] = pd.to_datetime(df['년'] + '-' + df['월'] + '-01')
+        df['연월'] = assemble_date(parse_int_column(df['년'], fill=None), parse_int_column(df['월'], fill=None), np.ones(len(df), dtype=np.int64))
         # 칼럼 이름을 통일
         df.rename(columns={code_column: '법정동코드'}, inplace=True)
         # 시도코드 생성
@@ -36,24 +56,10 @@ class RealEstateDataAnalyzer:
         return avg_prices
 
     def calculate_gini_coefficient(self, df, group_by_cols):
-        def gini(arr):
-            # 모든 값을 동일하게 처리하고 배열을 1차원으로 변환:
-            arr = np.array(arr, dtype=np.float64)
-            if np.amin(arr) < 0:
-                # 값이 음수일 수 없음:
-                arr -= np.amin(arr)
-            # 값이 0일 수 없음:
-            arr += 0.0000001
-            # 값을 정렬:
-            arr = np.sort(arr)
-            # 배열 요소당 인덱스:
-            index = np.arange(1, arr.shape[0] + 1)
-            # 배열 요소 수:
-            n = arr.shape[0]
-            # 지니계수:
-            return ((np.sum((2 * index - n - 1) * arr)) / (n * np.sum(arr)))
-        
-        gini_by_region = df.groupby(group_by_cols)['거래금액'].apply(gini).reset_index()
+        # 한 번의 정렬로 모든 그룹의 지니계수 계산 (원소가 1개인 그룹은 0)
+        gini_by_region = df.groupby(group_by_cols).size().reset_index(name='거래금액')
+        codes, ngroups = group_codes(df, group_by_cols)
+        gini_by_region['거래금액'] = grouped_gini(df['거래금액'].to_numpy(), codes, ngroups, single=0.0)
         gini_by_region.rename(columns={'거래금액': '지니계수'}, inplace=True)
         gini_by_region['지니계수'] = gini_by_region['지니계수'].round(3)
         return gini_by_region
@@ -123,9 +129,6 @@ class RealEstateDataAnalyzer:
             df = self.load_data(house_type)
             df = self.preprocess_data(df, code_column)
 
-            # Filter data to include only records before 2024-04
-            df = df[df['연월'] < '2024-05-01']
-
             results_monthly[house_type] = self.process_monthly(df, code_df)
             results_yearly[house_type] = self.process_yearly(df, code_df)
         
@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+
+# 칼럼별 정수 타입 (거래금액은 만원 단위라 int32로 충분)
+INT_DTYPES = {
+    '거래금액' : np.int32,
+    '월세금액' : np.int32,
+    '보증금액' : np.int32,
+    '건축년도' : np.int16,
+    '년' : np.int16,
+    '월' : np.int16,
+    '일' : np.int16,
+}
+
+
+def nullable_int(dtype):
+    """
+    np.int16 → 'Int16' 처럼 결측을 가질 수 있는 같은 크기의 정수 타입
+    """
+    return f"Int{np.dtype(dtype).itemsize * 8}"
+
+
+def parse_int_column(s, dtype = np.int64, fill = 0):
+    """
+    '120,000' 같은 문자열 칼럼을 정수로 변환 (.str.replace(',', '').fillna('0').astype(int)와 같은 결과)
+    고유값만 변환한 뒤 코드로 펼치므로 년/월/일처럼 값 종류가 적은 칼럼일수록 빠름
+    문자열 칼럼의 결측은 fill로 채우고, fill = None이면 NA로 남김 (nullable 정수)
+    숫자형 칼럼(타입이 있는 raw 테이블의 INTEGER 칼럼)은 파싱 없이 변환하고 결측은 NA로 남김
+    """
+    if pd.api.types.is_numeric_dtype(s.dtype):
+        if s.isna().any():
+            return s.astype(nullable_int(dtype))
+        return s.astype(dtype)
+
+    codes, uniques = pd.factorize(s, use_na_sentinel = True)
+    uniques = pd.Series(np.asarray(uniques, dtype = object))
+    parsed = uniques.str.replace(',', '', regex = False).astype(np.int64).to_numpy()
+
+    if fill is None and (codes < 0).any():
+        values = pd.array(np.append(parsed, 0)[codes], dtype = nullable_int(dtype))
+        values[codes < 0] = pd.NA
+        return pd.Series(values, index = s.index, name = s.name)
+
+    # 결측(-1 코드)은 fill
+    parsed = np.append(parsed, 0 if fill is None else fill)
+    values = parsed[codes].astype(dtype)
+    return pd.Series(values, index = s.index, name = s.name)
+
+
+def parse_float_column(s, dtype = np.float64):
+    """
+    문자열 칼럼을 실수로 변환 (고유값만 변환)
+    """
+    if pd.api.types.is_numeric_dtype(s.dtype):
+        return s.astype(dtype)
+
+    codes, uniques = pd.factorize(s, use_na_sentinel = True)
+    parsed = np.append(np.asarray(uniques, dtype = object).astype(np.float64), np.nan)
+    return pd.Series(parsed[codes].astype(dtype), index = s.index, name = s.name)
+
+
+def _date_part(values):
+    """
+    정수 배열과 결측 위치 (nullable 정수나 NaN이 있는 실수, 결측 자리는 1로 채움)
+    """
+    if not isinstance(values, pd.Series):
+        values = pd.Series(values)
+    missing = values.isna().to_numpy()
+    if missing.any():
+        values = values.fillna(1)
+    return values.to_numpy(dtype = np.int64), missing
+
+
+def assemble_date(year, month, day):
+    """
+    정수 년/월/일로 datetime64 생성 (문자열 조합과 파싱 없이 계산)
+    년/월/일 중 결측(NA, NaN)이 있는 행은 NaT (문자열을 합쳐서 pd.to_datetime 하던 결과와 같음)
+    존재하지 않는 날짜가 있으면 pd.to_datetime과 같이 ValueError
+    """
+    year, year_na = _date_part(year)
+    month, month_na = _date_part(month)
+    day, day_na = _date_part(day)
+    missing = year_na | month_na | day_na
+
+    months = ((year - 1970) * 12 + (month - 1)).astype('datetime64[M]')
+    month_start = months.astype('datetime64[D]')
+    days_in_month = ((months + 1).astype('datetime64[D]') - month_start).astype(np.int64)
+
+    invalid = ((month < 1) | (month > 12) | (day < 1) | (day > days_in_month)) & ~missing
+    if invalid.any():
+        i = np.flatnonzero(invalid)[0]
+        raise ValueError(f"잘못된 날짜 : {year[i]}-{month[i]}-{day[i]}")
+
+    dates = (month_start + (day - 1).astype('timedelta64[D]')).astype('datetime64[ns]')
+    if missing.any():
+        dates[missing] = np.datetime64('NaT')
+    return dates
+
+
+def apply_schema(df, schema):
+    """
+    schema = {칼럼 : 타입}을 데이터프레임에 적용 (schema에 없는 칼럼은 그대로)
+    'category'는 범주형, 정수는 쉼표 제거 후 변환, 실수는 고유값만 변환
+    이미 숫자형인데 결측이 있는 칼럼(left merge 결과 등)은 정수로 바꾸지 않음
+    """
+    for col, dtype in schema.items() :
+        if col not in df.columns or df[col].dtype == dtype :
+            continue
+        s = df[col]
+        if dtype == 'category' :
+            df[col] = s.astype('category')
+        elif np.issubdtype(dtype, np.integer) :
+            if pd.api.types.is_numeric_dtype(s.dtype) and s.isna().any() :
+                continue
+            df[col] = parse_int_column(s, dtype)
+        else :
+            df[col] = parse_float_column(s, dtype)
+    return df
+
+
+def memory_mb(df):
+    """
+    문자열 내용까지 포함한 데이터프레임 메모리 (MB)
+    """
+    return df.memory_usage(index = False, deep = True).sum() / 1024 ** 2
+
+
+def _legacy_parse(df, int_cols):
+    """
+    기존 preprocess의 변환 방식 (벤치마크 비교용)
+    """
+    for col in int_cols :
+        df[col] = df[col].str.replace(',', '').fillna('0').astype(int)
+    date_str = df[['년', '월', '일']].astype(str).agg('-'.join, axis = 1)
+    df['거래일자'] = pd.to_datetime(date_str)
+    return df
+
+
+def _fast_parse(df, int_cols):
+    for col in int_cols :
+        df[col] = parse_int_column(df[col], INT_DTYPES.get(col, np.int64))
+    df['거래일자'] = assemble_date(df['년'], df['월'], df['일'])
+    return df
+
+
+def synthetic_table(n_rows, seed = 0):
+    rng = np.random.default_rng(seed)
+    amounts = rng.integers(1000, 300000, n_rows)
+    return pd.DataFrame({
+        '거래금액' : pd.Series(amounts).map('{:,}'.format).astype(object),
+        '건축년도' : rng.integers(1970, 2024, n_rows).astype(str).astype(object),
+        '년' : rng.integers(2006, 2025, n_rows).astype(str).astype(object),
+        '월' : rng.integers(1, 13, n_rows).astype(str).astype(object),
+        '일' : rng.integers(1, 29, n_rows).astype(str).astype(object),
+    })
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000000
+    int_cols = ['거래금액', '건축년도', '년', '월', '일']
+    df = synthetic_table(n_rows)
+    print(f"synthetic table : {df.shape}")
+
+    start = time.perf_counter()
+    fast = _fast_parse(df.copy(), int_cols)
+    fast_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy = _legacy_parse(df.copy(), int_cols)
+    legacy_time = time.perf_counter() - start
+
+    for col in int_cols :
+        assert (fast[col].to_numpy() == legacy[col].to_numpy()).all(), col
+    assert (fast['거래일자'].to_numpy() == legacy['거래일자'].to_numpy()).all()
+
+    legacy_mb = legacy[int_cols].memory_usage(index = False).sum() / 1024 ** 2
+    fast_mb = fast[int_cols].memory_usage(index = False).sum() / 1024 ** 2
+    print(f"legacy : {legacy_time:.2f}s, {legacy_mb:.1f}MB")
+    print(f"fast   : {fast_time:.2f}s, {fast_mb:.1f}MB ({legacy_time / fast_time:.1f}x)")
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+# 코드 칼럼별로 붙일 지역명 칼럼
+REGION_LEVELS = {
+    '시군구코드' : ['시도명', '시군구명'],
+    '행정동코드' : ['시도명', '시군구명', '읍면동명'],
+}
+
+# DB별로 한 번만 만든 색인 (RealEstateAnalyzer, RealEstateDataAnalyzer가 같이 사용)
+_INDEX_CACHE = {}
+
+
+def to_int_keys(values):
+    """
+    지역 코드 칼럼을 int64 배열로 변환, 숫자가 아니거나 결측이면 -1
+    """
+    values = pd.Series(values) if not isinstance(values, pd.Series) else values
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return values.to_numpy(dtype = np.int64)
+    keys = pd.to_numeric(values, errors = 'coerce')
+    return keys.fillna(-1).to_numpy(dtype = np.int64)
+
+
+class RegionIndex:
+    """
+    conn_code를 정수 코드 → 지역명 범주 코드 배열로 색인
+    -----------
+    keys[level] : 정렬된 지역 코드 (level = 시군구코드, 행정동코드)
+    name_codes[level][name] : keys[level]과 같은 순서의 지역명 범주 코드
+    categories[name] : 지역명 범주 (모든 level이 공유)
+    -----------
+    같은 코드가 여러 번 나오면 첫 행의 이름을 사용
+    """
+    def __init__(self, code):
+        self.categories = {}
+        for names in REGION_LEVELS.values():
+            for name in names:
+                if name in code.columns and name not in self.categories:
+                    self.categories[name] = pd.Index(code[name].dropna().unique()).sort_values()
+
+        self.keys = {}
+        self.name_codes = {}
+        for level, names in REGION_LEVELS.items():
+            if level not in code.columns:
+                continue
+            names = [name for name in names if name in code.columns]
+            table = code[[level] + names].copy()
+            table[level] = to_int_keys(table[level])
+            table = table[table[level] >= 0].drop_duplicates(subset = [level])
+            table = table.sort_values(level, kind = 'stable')
+
+            self.keys[level] = table[level].to_numpy(dtype = np.int64)
+            self.name_codes[level] = {
+                name : self.categories[name].get_indexer(table[name]).astype(np.int32) for name in names
+            }
+
+    def positions(self, level, values):
+        """
+        values 각 원소의 keys[level] 위치와 일치 여부
+        """
+        keys = self.keys[level]
+        values = to_int_keys(values)
+        pos = np.searchsorted(keys, values)
+        pos[pos == keys.shape[0]] = 0
+        found = keys[pos] == values if keys.size else np.zeros(values.shape[0], dtype = bool)
+        return pos, found
+
+    def lookup(self, level, values, names = None):
+        """
+        지역 코드 배열 → {지역명 칼럼 : Categorical}, 일치하지 않는 코드는 결측
+        """
+        pos, found = self.positions(level, values)
+        names = list(self.name_codes[level]) if names is None else names
+        result = {}
+        for name in names:
+            codes = self.name_codes[level][name][pos]
+            codes[~found] = -1
+            result[name] = pd.Categorical.from_codes(codes, categories = self.categories[name])
+        return result, found
+
+    def enrich(self, df, key_col, level, names = None):
+        """
+        df[key_col]로 지역명 칼럼을 df에 바로 추가 (merge 없이 배열 조회만)
+        일치 여부 마스크를 돌려줌
+        """
+        result, found = self.lookup(level, df[key_col], names)
+        for name, values in result.items():
+            df[name] = values
+        return found
+
+
+def region_index(engine, code = None):
+    """
+    engine의 DB에 대한 RegionIndex (프로세스마다 한 번만 생성)
+    code를 주면 conn_code를 다시 읽지 않고 그 데이터프레임으로 생성
+    """
+    key = str(engine.url)
+    if key not in _INDEX_CACHE:
+        if code is None:
+            with engine.connect() as conn:
+                code = pd.read_sql_query(text("SELECT * FROM conn_code"), conn)
+        _INDEX_CACHE[key] = RegionIndex(code)
+    return _INDEX_CACHE[key]
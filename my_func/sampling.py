@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from my_func.fingerprint import splitmix64
+
+# 층화 기준 (이름 : SQL 식) - old/preprocess의 광역시, 거래년과 같음
+STRATA = {
+    '광역시' : "substr(CAST(지역코드 AS TEXT), 1, 2)",
+    '거래년' : "CAST(년 AS INTEGER)",
+}
+
+
+def random_keys(rowids, seed):
+    """
+    (seed, ROWID)로 정해지는 64비트 난수 키
+    청크 크기나 읽는 순서와 관계없이 같은 seed면 같은 키
+    """
+    rowids = np.asarray(rowids, dtype = np.int64).view(np.uint64)
+    with np.errstate(over = 'ignore'):
+        salt = splitmix64(np.array([seed], dtype = np.uint64))[0]
+        return splitmix64(rowids ^ salt)
+
+
+def iter_rowids(conn, table, chunksize, strata = None):
+    """
+    ROWID(와 층화 칼럼)를 ROWID 순서로 chunksize씩 읽기 (keyset 페이지, 메모리는 청크 크기만큼)
+    """
+    select = ", ".join(['ROWID'] + [f'{expr} AS "{name}"' for name, expr in (strata or {}).items()])
+    last_rowid = None
+    while True:
+        where = "" if last_rowid is None else f"WHERE ROWID > {int(last_rowid)}"
+        chunk = pd.read_sql_query(text(f'SELECT {select} FROM "{table}" {where} ORDER BY ROWID LIMIT {int(chunksize)}'), conn)
+        if chunk.empty:
+            return
+        chunk.columns = ['rowid'] + list(strata or {})
+        yield chunk
+        last_rowid = chunk['rowid'].iloc[-1]
+
+
+def allocate(counts, n):
+    """
+    층별 행 수에 비례해서 n개를 나눔 (최대 나머지 방식, 합계가 정확히 n)
+    """
+    counts = np.asarray(counts, dtype = np.int64)
+    total = counts.sum()
+    if total <= n:
+        return counts
+    quota = counts * n / total
+    alloc = np.floor(quota).astype(np.int64)
+    remainder = n - alloc.sum()
+    order = np.lexsort((np.arange(len(counts)), -(quota - alloc)))
+    alloc[order[:remainder]] += 1
+    return np.minimum(alloc, counts)
+
+
+def sample_rowids(engine, table, n, seed = 0, stratify = False, strata = None, chunksize = 500000):
+    """
+    bottom-k 표본 : 행마다 random_keys를 주고 키가 가장 작은 n개(층화면 층별 할당 수)를 유지
+    ORDER BY RANDOM()과 같은 비복원 단순 임의 표본이지만 전체 정렬 없이 청크 단위로 처리하고 seed로 재현 가능
+    층별 키 순위로 고르므로 청크 크기와 관계없이 같은 결과, 정렬된 ROWID 배열 반환
+    """
+    strata = (STRATA if strata is None else strata) if stratify else None
+    with engine.connect() as conn:
+        if strata:
+            names = list(strata)
+            select = ", ".join(f'{expr} AS "{name}"' for name, expr in strata.items())
+            counts = pd.read_sql_query(text(f'SELECT {select}, COUNT(*) AS n FROM "{table}" GROUP BY {", ".join(strata.values())}'), conn)
+            counts['할당'] = allocate(counts['n'].to_numpy(), n)
+            quota = counts.drop(columns = ['n'])
+
+        reservoir = None
+        for chunk in iter_rowids(conn, table, chunksize, strata):
+            chunk['key'] = random_keys(chunk['rowid'].to_numpy(), seed)
+            pool = chunk if reservoir is None else pd.concat([reservoir, chunk], ignore_index = True)
+            if strata:
+                # 층 안에서 (키, ROWID) 순위가 할당 수보다 작은 행만 유지
+                pool = pool.sort_values(['key', 'rowid'], kind = 'stable', ignore_index = True)
+                rank = pool.groupby(names, sort = False, dropna = False).cumcount().to_numpy()
+                limit = pool[names].merge(quota, on = names, how = 'left')['할당'].fillna(0).to_numpy()
+                reservoir = pool[rank < limit]
+            elif len(pool) > n:
+                keep = np.argpartition(pool['key'].to_numpy(), n - 1)[:n] if n > 0 else []
+                reservoir = pool.iloc[keep]
+            else:
+                reservoir = pool
+    if reservoir is None:
+        return np.zeros(0, dtype = np.int64)
+    return np.sort(reservoir['rowid'].to_numpy(dtype = np.int64))
+
+
+def read_rows(engine, table, rowids):
+    """
+    ROWID 목록의 행을 ROWID 순서로 읽기 (임시 테이블과 조인)
+    """
+    with engine.connect() as conn:
+        conn.exec_driver_sql("CREATE TEMP TABLE IF NOT EXISTS sample_rowids (rid INTEGER PRIMARY KEY)")
+        conn.exec_driver_sql("DELETE FROM sample_rowids")
+        if len(rowids):
+            conn.exec_driver_sql("INSERT INTO sample_rowids (rid) VALUES (?)", [(int(rid),) for rid in rowids])
+        df = pd.read_sql_query(text(f'SELECT t.* FROM sample_rowids s JOIN "{table}" t ON t.ROWID = s.rid ORDER BY s.rid'), conn)
+        conn.exec_driver_sql("DROP TABLE sample_rowids")
+    return df
+
+
+def sample_table(engine, table, n, seed = 0, stratify = False, strata = None, chunksize = 500000):
+    """
+    SELECT * FROM table ORDER BY RANDOM() LIMIT n 대신 사용하는 재현 가능한 표본
+    stratify이면 STRATA(광역시, 거래년) 층별 행 수에 비례해서 추출
+    """
+    rowids = sample_rowids(engine, table, n, seed = seed, stratify = stratify, strata = strata, chunksize = chunksize)
+    return read_rows(engine, table, rowids)
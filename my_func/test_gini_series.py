@@ -0,0 +1,49 @@
+"""
+python -m pytest my_func/test_gini_series.py
+"""
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from my_func.gini_series import gini_series, TRAILING
+
+REGIONS = ['시도명', '시군구명']
+
+
+def sample(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        '시도명' : rng.choice(['서울특별시', '경기도', '부산광역시'], n),
+        '시군구명' : rng.choice(list('abcde'), n),
+        '거래일자' : pd.to_datetime('2020-01-01') + pd.to_timedelta(rng.integers(0, 365 * 3, n), 'D'),
+        '거래금액' : rng.integers(1000, 300000, n).astype(np.int32),
+        '평당거래금액' : np.round(rng.random(n) * 10000, 2),
+    })
+
+
+def test_missing_dates_are_excluded():
+    df = sample()
+    with_nat = df.copy()
+    with_nat.loc[[3, 10, 200], '거래일자'] = pd.NaT
+    pdt.assert_frame_equal(gini_series(with_nat, REGIONS), gini_series(with_nat.dropna(subset=['거래일자']), REGIONS))
+
+
+def test_non_finite_value_stays_in_its_windows():
+    df = sample()
+    bad = df.copy()
+    row = bad.index[(bad['시도명'] == '경기도') & (bad['시군구명'] == 'a')][0]
+    bad.loc[row, '평당거래금액'] = np.inf
+    month = bad.loc[row, '거래일자'].to_period('M')
+
+    clean = gini_series(df, REGIONS)
+    result = gini_series(bad, REGIONS)
+    pdt.assert_frame_equal(result[['주기', '기간'] + REGIONS], clean[['주기', '기간'] + REGIONS])
+
+    # 그 값이 들어간 최근12개월 구간만 달라짐
+    trailing = result['주기'] == TRAILING
+    end = pd.PeriodIndex(result['기간'].where(trailing, '2000-01'), freq='M')
+    affected = trailing & (result['시도명'] == '경기도') & (result['시군구명'] == 'a') \
+        & (end >= month) & (end < month + 12)
+    assert result.loc[affected, '평당거래지니계수'].isna().all()
+    assert np.isinf(result.loc[affected, '평균평당거래금액']).all()
+    pdt.assert_frame_equal(result[trailing & ~affected], clean[trailing & ~affected])
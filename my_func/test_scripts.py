@@ -0,0 +1,26 @@
+"""
+python -m pytest my_func/test_scripts.py
+my_func의 스크립트를 저장소 밖 디렉터리에서 파일 경로로 실행해도 my_func를 찾는지
+"""
+import os
+import sys
+import subprocess
+
+MY_FUNC = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_script(tmp_path, *args):
+    env = {key : value for key, value in os.environ.items() if key != 'PYTHONPATH'}
+    return subprocess.run([sys.executable, *args], cwd=tmp_path, env=env, capture_output=True, text=True)
+
+
+def test_gini_imports_as_script(tmp_path):
+    # __main__은 실제 DB가 필요하므로 모듈만 실행
+    code = f"import runpy; runpy.run_path({os.path.join(MY_FUNC, 'gini.py')!r}, run_name='gini_script')"
+    result = run_script(tmp_path, '-c', code)
+    assert result.returncode == 0, result.stderr
+
+
+def test_gini_sketch_runs_as_script(tmp_path):
+    result = run_script(tmp_path, os.path.join(MY_FUNC, 'gini_sketch.py'), '20000')
+    assert result.returncode == 0, result.stderr
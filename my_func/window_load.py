@@ -0,0 +1,150 @@
+import pandas as pd
+from sqlalchemy import text
+
+# 거래 년월 키 (YYYYMM 정수) - 같은 식으로 만든 식 인덱스를 SQLite가 사용
+PERIOD_EXPR = 'CAST("년" AS INTEGER) * 100 + CAST("월" AS INTEGER)'
+
+
+def period_index_name(table):
+    return f"ix_{table}_period"
+
+
+def has_period_index(conn, table):
+    return any(row[1] == period_index_name(table) for row in conn.exec_driver_sql(f'PRAGMA index_list("{table}")'))
+
+
+def ensure_period_index(conn, table):
+    """
+    년월 키 식 인덱스 생성 (있으면 그대로, 인덱스는 ROWID를 포함하므로 (년월, ROWID) 순서로 읽을 수 있음)
+    쓰기 권한이 필요하므로 읽기 함수에서는 create_index = True일 때만 호출
+    (수집 단계에서는 model/download/dedup.py의 prepare_table이 같은 인덱스를 만듦)
+    """
+    conn.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS "{period_index_name(table)}" ON "{table}" ({PERIOD_EXPR})')
+    conn.commit()
+
+
+def period_key(value):
+    """
+    'YYYY-MM', 'YYYYMM', (년, 월), YYYYMM 정수 → YYYYMM 정수
+    """
+    if isinstance(value, (tuple, list)):
+        return int(value[0]) * 100 + int(value[1])
+    if isinstance(value, str):
+        digits = value.replace('-', '').replace('.', '')
+        return int(digits[:4]) * 100 + int(digits[4:6])
+    return int(value)
+
+
+def shift_period(key, months):
+    """
+    YYYYMM 정수를 months개월 이동
+    """
+    index = (key // 100) * 12 + key % 100 - 1 + months
+    return (index // 12) * 100 + index % 12 + 1
+
+
+def latest_period(conn, table):
+    """
+    테이블에 있는 가장 최근 년월 키 (인덱스로 한 번에 찾음)
+    """
+    return conn.execute(text(f'SELECT MAX({PERIOD_EXPR}) FROM "{table}"')).scalar()
+
+
+def window_bounds(conn, table, start = None, end = None, months = None):
+    """
+    (시작, 끝) 년월 키 (양 끝 포함, None은 제한 없음)
+    months를 주면 끝(없으면 최근 년월)에서 months개월 이전까지
+    """
+    end = None if end is None else period_key(end)
+    start = None if start is None else period_key(start)
+    if months is not None:
+        end = latest_period(conn, table) if end is None else end
+        if end is not None:
+            start = shift_period(end, -(int(months) - 1))
+    return start, end
+
+
+def iter_window(engine, table, start = None, end = None, months = None, columns = None, chunksize = 200000, where = None, params = None, descending = False,
+                create_index = False):
+    """
+    년월 구간 [start, end]의 행을 (년월, ROWID) keyset 커서로 chunksize씩 읽기
+    -----------
+    년월 조건은 식 인덱스 범위 검색으로 SQL에서 처리하고, 페이지마다 마지막 (년월, ROWID) 다음부터 읽으므로
+    OFFSET이나 전체 정렬 없이 필요한 구간의 행만 읽음
+    인덱스가 없으면 페이지마다 전체를 훑지 않도록 정렬한 쿼리 하나를 chunksize씩 나누어 읽음
+    descending이면 최근 년월부터 (ORDER BY ROWID DESC LIMIT 대체)
+    where/params : 추가 SQL 조건 (예: 'substr(CAST(지역코드 AS TEXT), 1, 2) = :sido')
+    create_index : 인덱스가 없으면 만들고 커밋 (읽기 전용 DB에서는 False로 둠)
+    -----------
+    """
+    select = "*" if columns is None else ", ".join(f'"{col}"' for col in columns)
+    op, order = ('<', 'DESC') if descending else ('>', 'ASC')
+    with engine.connect() as conn:
+        if create_index:
+            ensure_period_index(conn, table)
+        indexed = has_period_index(conn, table)
+        start, end = window_bounds(conn, table, start, end, months)
+
+        conditions = []
+        base_params = dict(params or {})
+        if start is not None:
+            conditions.append(f"{PERIOD_EXPR} >= :start_period")
+            base_params['start_period'] = start
+        if end is not None:
+            conditions.append(f"{PERIOD_EXPR} <= :end_period")
+            base_params['end_period'] = end
+        if where:
+            conditions.append(f"({where})")
+
+        if not indexed:
+            query = f'SELECT {select} FROM "{table}"'
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            query += f" ORDER BY {PERIOD_EXPR} {order}, ROWID {order}"
+            yield from pd.read_sql_query(text(query), conn, params = base_params, chunksize = chunksize)
+            return
+
+        cursor = None
+        while True:
+            page = list(conditions)
+            page_params = dict(base_params)
+            if cursor is not None:
+                # 년월 단독 조건은 인덱스 탐색 시작 위치, 행 값 비교는 같은 년월 안의 ROWID 커서
+                page.append(f"{PERIOD_EXPR} {op}= :last_period")
+                page.append(f"({PERIOD_EXPR}, ROWID) {op} (:last_period, :last_rowid)")
+                page_params.update(last_period = cursor[0], last_rowid = cursor[1])
+            query = f'SELECT {PERIOD_EXPR} AS "_period", ROWID AS "_rowid", {select} FROM "{table}"'
+            if page:
+                query += " WHERE " + " AND ".join(page)
+            query += f" ORDER BY {PERIOD_EXPR} {order}, ROWID {order} LIMIT {int(chunksize)}"
+
+            chunk = pd.read_sql_query(text(query), conn, params = page_params)
+            if chunk.empty:
+                return
+            cursor = (int(chunk['_period'].iloc[-1]), int(chunk['_rowid'].iloc[-1]))
+            yield chunk.drop(columns = ['_period', '_rowid'])
+            if len(chunk) < chunksize:
+                return
+
+
+def load_window(engine, table, start = None, end = None, months = None, columns = None, chunksize = 200000, where = None, params = None, descending = False,
+                create_index = False):
+    """
+    iter_window 결과를 하나의 데이터프레임으로
+    """
+    chunks = list(iter_window(engine, table, start, end, months, columns, chunksize, where, params, descending, create_index))
+    if not chunks:
+        return pd.DataFrame(columns = columns)
+    return pd.concat(chunks, ignore_index = True)
+
+
+def query_plan(engine, table, start, end, create_index = False):
+    """
+    년월 구간 조건의 쿼리 계획 (식 인덱스 사용 여부 확인용)
+    """
+    with engine.connect() as conn:
+        if create_index:
+            ensure_period_index(conn, table)
+        rows = conn.execute(text(f'EXPLAIN QUERY PLAN SELECT ROWID FROM "{table}" WHERE {PERIOD_EXPR} BETWEEN :s AND :e '
+                                 f'ORDER BY {PERIOD_EXPR}, ROWID'), {'s' : period_key(start), 'e' : period_key(end)}).fetchall()
+    return [row[-1] for row in rows]
@@ -0,0 +1,127 @@
+"""
+xlsx 아카이브를 변환한 Parquet 데이터셋 (model/download/to_parquet.py로 생성)
+-----------
+{root}/property={apt|multi_house|...}/trans={sale|rent}/year=YYYY/month=M/{원본 파일명}.parquet
+property, trans는 load_xlsx의 테이블명 앞/뒤 부분, 파일 하나가 원본 xlsx 하나
+칼럼 타입은 DATASET_SCHEMA를 따르고 없는 칼럼은 문자열
+-----------
+read_dataset은 property/trans/year/month 조건으로 디렉터리를 고르고(partition pruning),
+나머지 조건은 Parquet 행 그룹 통계로 걸러서(predicate pushdown) 필요한 칼럼만 읽음
+"""
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+
+# 칼럼 타입 (정수 칼럼은 쉼표 제거 후 변환, 변환할 수 없는 값은 결측)
+DATASET_SCHEMA = {
+    '년' : pa.int16(),
+    '월' : pa.int8(),
+    '일' : pa.int8(),
+    '거래금액' : pa.int32(),
+    '보증금액' : pa.int32(),
+    '월세금액' : pa.int32(),
+    '층' : pa.int16(),
+    '건축년도' : pa.int16(),
+    '전용면적' : pa.float32(),
+    '대지권면적' : pa.float32(),
+    '계약면적' : pa.float32(),
+    '연면적' : pa.float32(),
+    '대지면적' : pa.float32(),
+    # 정렬 키라서 행 그룹 통계로 거를 수 있게 문자열로 저장 (pyarrow는 사전 타입 칼럼의 통계로는 거르지 않음)
+    # Parquet 페이지는 그대로 사전 인코딩되고, read_dataset에서 category로 변환
+    '시군구' : pa.string(),
+    '법정동' : DICT_STRING,
+    '주택유형' : DICT_STRING,
+    '거래유형' : DICT_STRING,
+    '중개사소재지' : DICT_STRING,
+    '매수자' : DICT_STRING,
+    '매도자' : DICT_STRING,
+}
+
+
+def typed_table(df):
+    """
+    문자열 데이터프레임 → DATASET_SCHEMA 타입의 Arrow 테이블
+    """
+    arrays = {}
+    for col in df.columns:
+        kind = DATASET_SCHEMA.get(col, pa.string())
+        values = df[col]
+        if pa.types.is_integer(kind) or pa.types.is_floating(kind):
+            values = pd.to_numeric(values.astype('string').str.replace(',', '', regex = False), errors = 'coerce')
+            if pa.types.is_integer(kind):
+                values = values.round().astype('Int64')
+            arrays[col] = pa.array(values, from_pandas = True).cast(kind)
+        else:
+            arrays[col] = pa.array(values.astype(object).where(values.notna(), None), type = pa.string()).cast(kind)
+    return pa.table(arrays)
+
+
+def partition_dir(root, property_name, trans_name, year, month):
+    return os.path.join(root, f"property={property_name}", f"trans={trans_name}", f"year={int(year)}", f"month={int(month)}")
+
+
+PARTITIONING = ds.partitioning(pa.schema([
+    ('property', pa.string()), ('trans', pa.string()), ('year', pa.int16()), ('month', pa.int8()),
+    ]), flavor = 'hive')
+
+
+def open_dataset(root, partition_filter = None):
+    """
+    hive 파티션 데이터셋, 파일마다 칼럼이 달라도 합친 스키마로 읽음 (없는 칼럼은 결측)
+    스키마는 partition_filter로 고른 파티션의 파일 메타데이터만 읽어서 만듦
+    """
+    partitioning = PARTITIONING
+    dataset = ds.dataset(root, format = 'parquet', partitioning = partitioning)
+    schemas = [fragment.physical_schema for fragment in dataset.get_fragments(filter = partition_filter)]
+    if not schemas:
+        return dataset
+    schema = pa.unify_schemas(schemas + [partitioning.schema])
+    return ds.dataset(root, schema = schema, format = 'parquet', partitioning = partitioning)
+
+
+def period_filter(start = None, end = None):
+    """
+    'YYYY-MM' 또는 (년, 월) 구간 [start, end]의 year/month 파티션 조건
+    """
+    expr = None
+    for bound, op in [(start, 'ge'), (end, 'le')]:
+        if bound is None:
+            continue
+        if isinstance(bound, str):
+            year, month = int(bound[:4]), int(bound[5:7] if '-' in bound else bound[4:6])
+        else:
+            year, month = int(bound[0]), int(bound[1])
+        if op == 'ge':
+            cond = (ds.field('year') > year) | ((ds.field('year') == year) & (ds.field('month') >= month))
+        else:
+            cond = (ds.field('year') < year) | ((ds.field('year') == year) & (ds.field('month') <= month))
+        expr = cond if expr is None else expr & cond
+    return expr
+
+
+def read_dataset(root, property_name = None, trans_name = None, start = None, end = None, columns = None, filter = None):
+    """
+    조건에 맞는 행만 데이터프레임으로 (사전 인코딩 칼럼은 category)
+    property_name/trans_name : 'multi_house', 'sale' 처럼 파티션 값 (목록도 가능)
+    filter : 추가 조건 식 (예: ds.field('거래금액') > 50000)
+    """
+    partition_expr = period_filter(start, end)
+    for name, value in [('property', property_name), ('trans', trans_name)]:
+        if value is None:
+            continue
+        cond = ds.field(name).isin(list(value)) if isinstance(value, (list, tuple, set)) else ds.field(name) == value
+        partition_expr = cond if partition_expr is None else partition_expr & cond
+    expr = partition_expr
+    if filter is not None:
+        expr = filter if expr is None else expr & filter
+
+    dataset = open_dataset(root, partition_expr)
+    table = dataset.to_table(columns = columns, filter = expr)
+    df = table.to_pandas()
+    if '시군구' in df.columns:
+        df['시군구'] = df['시군구'].astype('category')
+    return df